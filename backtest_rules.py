@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Back-test insight rules against stored Comprehend analyses.
+
+Uso:
+    python backtest_rules.py [archivo_de_reglas]
+
+Opciones:
+    --analysis-file: Archivo de análisis (default: comprehend_analysis.json)
+    --samples: Sesiones de ejemplo por regla (default: 5)
+    --diff: Comparar con los insights almacenados actualmente
+"""
+import argparse
+import json
+import sys
+
+from src.insight_rules import InsightRuleEngine
+from src.config import CONFIG
+from src.colors import print_header, print_info, print_success, print_warning, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Back-test de reglas de insights')
+    parser.add_argument('rules_file', nargs='?', default=CONFIG["insight_rules_file"], help='Archivo JSON de reglas')
+    parser.add_argument('--analysis-file', default='comprehend_analysis.json', help='Archivo de análisis almacenados')
+    parser.add_argument('--samples', type=int, default=5, help='Sesiones de ejemplo por regla')
+    parser.add_argument('--diff', action='store_true', help='Comparar con los insights almacenados')
+
+    args = parser.parse_args()
+
+    print_header("Insight Rules Back-test")
+
+    try:
+        engine = InsightRuleEngine.from_file(args.rules_file)
+        with open(args.analysis_file, 'r', encoding='utf-8') as f:
+            analyses = list(json.load(f).get('conversations', {}).values())
+    except Exception as e:
+        print_warning(f"Error: {e}")
+        sys.exit(1)
+
+    print_info(f"Rules: {len(engine.rules)} ({args.rules_file})")
+    report = engine.backtest(analyses, samples=args.samples)
+    print_info(f"Analyses evaluated: {report['analyses']}")
+
+    rows = [
+        [rule['id'], rule['type'], rule['hits'], f"{rule['hit_rate'] * 100:.1f}%", ", ".join(rule['sample_sessions'][:2])]
+        for rule in report['rules']
+    ]
+    print_table(rows, headers=["Rule", "Type", "Hits", "Rate", "Samples"])
+
+    if args.diff:
+        changed = 0
+        for analysis in analyses:
+            stored = set(analysis.get('conversation_insights', []))
+            new = set(engine.evaluate(analysis))
+            if stored != new:
+                changed += 1
+                print(f"\n📊 Session: {analysis.get('session_id')}")
+                for insight in sorted(new - stored):
+                    print(f"  + {insight}")
+                for insight in sorted(stored - new):
+                    print(f"  - {insight}")
+        print_success(f"Sessions whose insights would change: {changed}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Simulación de hedged requests contra un stub con latencia de cola larga.
+
+El stub responde con latencia log-normal y, con probabilidad --tail-prob, una
+latencia --tail-factor veces mayor (el "converse lento ocasional"). Se corre
+la misma carga sin hedging y con hedging y se comparan los percentiles y el
+costo extra (llamadas adicionales).
+
+Uso:
+    python benchmarks/hedging_sim.py
+    python benchmarks/hedging_sim.py --calls 5000 --tail-prob 0.02 --max-rate 0.05
+
+Opciones:
+    --calls: Llamadas por escenario (default: 2000)
+    --workers: Clientes concurrentes (default: 16)
+    --median-ms: Mediana de la latencia normal del stub (default: 20)
+    --tail-prob: Probabilidad de una llamada lenta (default: 0.03)
+    --tail-factor: Multiplicador de latencia de las llamadas lentas (default: 20)
+    --percentile: Percentil de latencia que dispara el hedge (default: 0.9)
+    --max-rate: Proporción máxima de llamadas con hedge (default: 0.1)
+    --seed: Semilla del generador de latencias (default: 7)
+"""
+import argparse
+import contextlib
+import io
+import math
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.hedging import Hedger
+
+
+class LongTailStub:
+    """Stub de converse con latencia log-normal y una cola de llamadas lentas."""
+
+    def __init__(self, median_seconds: float, tail_prob: float, tail_factor: float, seed: int):
+        self.median_seconds = median_seconds
+        self.tail_prob = tail_prob
+        self.tail_factor = tail_factor
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def converse(self):
+        with self._lock:
+            self.calls += 1
+            latency = self.median_seconds * math.exp(self._random.gauss(0, 0.3))
+            if self._random.random() < self.tail_prob:
+                latency *= self.tail_factor
+        time.sleep(latency)
+        return {"output": {"message": {"role": "assistant", "content": [{"text": "ok"}]}}}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(args, hedger=None):
+    stub = LongTailStub(args.median_ms / 1000, args.tail_prob, args.tail_factor, args.seed)
+    latencies = []
+    lock = threading.Lock()
+
+    def one_call(_):
+        started = time.perf_counter()
+        if hedger:
+            hedger.call("stub", stub.converse)
+        else:
+            stub.converse()
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    # Sin el log de cada hedge
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(one_call, range(args.calls)))
+    return latencies, stub.calls, time.perf_counter() - started
+
+
+def report(name, latencies, stub_calls, elapsed, calls):
+    print(f"{name:<12} p50={1000 * percentile(latencies, 0.5):7.1f} ms  "
+          f"p90={1000 * percentile(latencies, 0.9):7.1f} ms  "
+          f"p99={1000 * percentile(latencies, 0.99):7.1f} ms  "
+          f"max={1000 * max(latencies):7.1f} ms  "
+          f"llamadas extra={stub_calls - calls} ({(stub_calls - calls) / calls:.1%})  "
+          f"tiempo={elapsed:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulación de hedged requests con latencia de cola larga")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--median-ms", type=float, default=20.0)
+    parser.add_argument("--tail-prob", type=float, default=0.03)
+    parser.add_argument("--tail-factor", type=float, default=20.0)
+    parser.add_argument("--percentile", type=float, default=0.9)
+    parser.add_argument("--max-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"Stub: mediana {args.median_ms} ms, {args.tail_prob:.1%} de llamadas x{args.tail_factor:g}; "
+          f"{args.calls} llamadas con {args.workers} clientes\n")
+
+    latencies, stub_calls, elapsed = run(args)
+    report("sin hedging", latencies, stub_calls, elapsed, args.calls)
+
+    hedger = Hedger(
+        percentile=args.percentile,
+        default_delay=5 * args.median_ms / 1000,
+        max_hedge_rate=args.max_rate,
+        max_workers=2 * args.workers,
+    )
+    latencies, stub_calls, elapsed = run(args, hedger)
+    report("con hedging", latencies, stub_calls, elapsed, args.calls)
+
+    stats = hedger.get_stats()
+    print(f"\nhedges={stats['hedged']} ganados={stats['hedge_wins']} limitados={stats['rate_limited']} "
+          f"tasa={stats['hedge_rate']:.1%} retraso final={stats['delay_ms'].get('stub', 0):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga de punta a punta para `POST /api/chat`.
+
+Sesiones sintéticas concurrentes recorren conversaciones de varios turnos
+(saludo y FAQ, productos, apertura de cuenta con todos sus datos, quejas y
+consulta de casos) contra el servidor web. Cada sesión usa su propia
+conexión HTTP/1.1 con keep-alive.
+
+Sin --url se levanta `src.web_server.app` en un proceso aparte con los stubs
+de AWS (`AWS_STUB_MODE`) y en un directorio temporal con una copia de `data/`,
+así la memoria, los casos del CRM y los análisis de la prueba no tocan los
+archivos del repositorio.
+
+Se reportan throughput, latencias p50/p95/p99, tasa de error y los tiempos
+por etapa del servidor (header `Server-Timing`). Los resultados se guardan en
+JSON; con --compare se muestran las diferencias contra una corrida anterior.
+
+Uso:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --users 50 --conversations 500 --median-ms 300
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --users 10
+    python benchmarks/load_test.py --compare benchmarks/results/load_test_20250101_120000.json
+
+Opciones:
+    --url: Servidor ya levantado (default: se levanta uno local con stubs)
+    --users: Sesiones concurrentes (default: 20)
+    --conversations: Conversaciones en total (default: 100)
+    --think-ms: Pausa media entre turnos de una sesión (default: 0)
+    --timeout: Timeout por request en segundos (default: 60)
+    --median-ms: Mediana de latencia del stub de Bedrock (default: 400)
+    --comprehend-median-ms: Mediana de latencia del stub de Comprehend (default: 60)
+    --error-rate: Proporción de errores del stub de Bedrock (default: 0)
+    --throttle-rate: Proporción de throttling del stub de Bedrock (default: 0)
+    --seed: Semilla de scripts y datos de las sesiones (default: 7)
+    --output: Archivo JSON de resultados (default: benchmarks/results/load_test_<fecha>.json)
+    --compare: JSON de una corrida anterior para comparar
+    --verbose: Muestra la salida del servidor local
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Conversaciones sintéticas; `weight` es la frecuencia relativa de cada una
+SCRIPTS = [
+    {
+        "name": "faq",
+        "weight": 3,
+        "turns": [
+            "Hola",
+            "¿Cuál es el horario de atención?",
+            "¿Cuánto cobran por transferir a otro banco?",
+            "Muchas gracias",
+        ],
+    },
+    {
+        "name": "productos",
+        "weight": 3,
+        "turns": [
+            "Buenas tardes, quiero información sobre tarjetas de crédito",
+            "¿Cuál me recomiendas si viajo mucho?",
+            "¿Qué requisitos necesito para solicitarla?",
+            "Perfecto, gracias",
+        ],
+    },
+    {
+        "name": "apertura_cuenta",
+        "weight": 2,
+        "turns": [
+            "Quiero abrir una cuenta de ahorros",
+            "Mi nombre es {nombre}, cédula {cedula}",
+            "Nací el {fecha_nacimiento} y vivo en {direccion}",
+            "Mi teléfono es {telefono} y mi correo es {correo}",
+        ],
+    },
+    {
+        "name": "queja",
+        "weight": 1,
+        "turns": [
+            "Estoy muy molesto, me cobraron una comisión que no reconozco",
+            "Ya llamé dos veces y nadie me resuelve",
+            "¿Pueden revisar ese cargo hoy?",
+        ],
+    },
+    {
+        "name": "estado_caso",
+        "weight": 1,
+        "turns": [
+            "¿Cuál es el estado de mi caso {caso}?",
+            "¿Cuánto tiempo más va a tardar?",
+        ],
+    },
+]
+
+_NAMES = ["Ana Pérez", "Luis Herrera", "María González", "Carlos Rodríguez", "Sofía Castillo", "Jorge Batista"]
+_STREETS = ["Calle 50, Bella Vista", "Vía España, San Francisco", "Avenida Balboa, Marbella", "Calle 72, San Francisco"]
+
+
+def session_data(rng: random.Random) -> Dict[str, str]:
+    """Datos personales sintéticos para los placeholders de los scripts."""
+    nombre = rng.choice(_NAMES)
+    return {
+        "nombre": nombre,
+        "cedula": f"{rng.randint(1, 9)}-{rng.randint(100, 999)}-{rng.randint(100, 9999)}",
+        "fecha_nacimiento": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1960, 2004)}",
+        "direccion": rng.choice(_STREETS),
+        "telefono": f"6{rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+        "correo": f"{nombre.split()[0].lower()}{rng.randint(1, 9999)}@example.com",
+        "caso": f"{rng.getrandbits(32):08x}",
+    }
+
+
+class HTTPClient:
+    """Cliente HTTP/1.1 mínimo sobre asyncio, con una conexión keep-alive."""
+
+    def __init__(self, url: str, timeout: float):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = parts.scheme == "https"
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self._reader = self._writer = None
+
+    async def request(self, method: str, path: str, body: Any = None) -> Tuple[int, Dict[str, str], bytes]:
+        """Envía el request y devuelve (status, headers, cuerpo)."""
+        reused = self._writer is not None
+        if not reused:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        try:
+            return await asyncio.wait_for(self._roundtrip(method, path, body), self.timeout)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            await self.close()
+            if not reused:
+                raise
+            # El servidor cerró la conexión ociosa: se reintenta una vez con una nueva
+            return await self.request(method, path, body)
+        except BaseException:
+            await self.close()
+            raise
+
+    async def _roundtrip(self, method: str, path: str, body: Any) -> Tuple[int, Dict[str, str], bytes]:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else b""
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nContent-Length: {len(payload)}\r\n"
+        if body is not None:
+            head += "Content-Type: application/json\r\n"
+        self._writer.write(head.encode("ascii") + b"\r\n" + payload)
+        await self._writer.drain()
+
+        status_line = await self._reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            data = b""
+            while True:
+                size = int((await self._reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                chunk = await self._reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                data += chunk[:-2]
+        else:
+            data = await self._reader.readexactly(int(headers.get("content-length", 0)))
+
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, headers, data
+
+
+def parse_server_timing(value: str) -> Dict[str, float]:
+    """`etapa;dur=12.3, otra;dur=4` -> {"etapa": 12.3, "otra": 4.0}."""
+    timings = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        name, *params = entry.split(";")
+        for param in params:
+            key, _, number = param.strip().partition("=")
+            if key == "dur":
+                timings[name.strip()] = float(number)
+    return timings
+
+
+async def run_user(url: str, args, rng: random.Random, counter: Dict[str, int], run_id: str, records: List[Dict[str, Any]]):
+    """Una sesión concurrente: toma conversaciones hasta completar el total."""
+    client = HTTPClient(url, args.timeout)
+    weights = [script["weight"] for script in SCRIPTS]
+    try:
+        while counter["next"] < args.conversations:
+            conversation = counter["next"]
+            counter["next"] += 1
+            script = rng.choices(SCRIPTS, weights)[0]
+            data = session_data(rng)
+            session_id = f"load-{run_id}-{conversation}"
+
+            for turn, template in enumerate(script["turns"]):
+                if turn and args.think_ms:
+                    await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think_ms / 1000)
+                record = {"script": script["name"], "turn": turn, "status": None, "source": None, "error": None, "timings": {}}
+                started = time.perf_counter()
+                try:
+                    status, headers, body = await client.request(
+                        "POST", "/api/chat", {"message": template.format(**data), "session_id": session_id}
+                    )
+                    record["status"] = status
+                    record["timings"] = parse_server_timing(headers.get("server-timing", ""))
+                    if status == 200:
+                        record["source"] = json.loads(body).get("source")
+                    else:
+                        record["error"] = f"HTTP {status}"
+                except Exception as e:
+                    record["error"] = f"{type(e).__name__}: {e}"
+                record["latency_ms"] = 1000 * (time.perf_counter() - started)
+                records.append(record)
+                if record["error"]:
+                    # Sin respuesta la conversación no tiene sentido
+                    break
+    finally:
+        await client.close()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 2),
+        "p50": round(percentile(values, 0.5), 2),
+        "p95": round(percentile(values, 0.95), 2),
+        "p99": round(percentile(values, 0.99), 2),
+        "max": round(max(values), 2),
+    }
+
+
+def summarize(records: List[Dict[str, Any]], elapsed: float, conversations: int) -> Dict[str, Any]:
+    """Métricas globales, por script, por origen de la respuesta y por etapa del servidor."""
+    errors = [record for record in records if record["error"]]
+    by_script = defaultdict(list)
+    by_source = defaultdict(list)
+    stages = defaultdict(list)
+    for record in records:
+        by_script[record["script"]].append(record)
+        if not record["error"]:
+            by_source[record["source"] or "unknown"].append(record["latency_ms"])
+        for stage, ms in record["timings"].items():
+            stages[stage].append(ms)
+
+    return {
+        "summary": {
+            "requests": len(records),
+            "errors": len(errors),
+            "error_rate": round(len(errors) / len(records), 4) if records else 0.0,
+            "conversations": conversations,
+            "duration_seconds": round(elapsed, 2),
+            "throughput_rps": round(len(records) / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": latency_summary([record["latency_ms"] for record in records if not record["error"]]),
+        },
+        "by_script": {
+            name: {
+                "requests": len(items),
+                "errors": sum(1 for item in items if item["error"]),
+                "latency_ms": latency_summary([item["latency_ms"] for item in items if not item["error"]]),
+            }
+            for name, items in sorted(by_script.items())
+        },
+        "by_source": {source: latency_summary(values) for source, values in sorted(by_source.items())},
+        "server_timings_ms": {stage: latency_summary(values) for stage, values in sorted(stages.items())},
+        "error_samples": sorted({record["error"] for record in errors})[:10],
+    }
+
+
+async def fetch_agent_stats(url: str, timeout: float) -> Optional[Dict[str, Any]]:
+    client = HTTPClient(url, timeout)
+    try:
+        status, _, body = await client.request("GET", "/api/agent/stats")
+        return json.loads(body).get("data") if status == 200 else None
+    except Exception:
+        return None
+    finally:
+        await client.close()
+
+
+async def run_load(url: str, args) -> Dict[str, Any]:
+    run_id = datetime.now().strftime("%H%M%S")
+    counter = {"next": 0}
+    records: List[Dict[str, Any]] = []
+    users = [run_user(url, args, random.Random(args.seed + user), counter, run_id, records) for user in range(args.users)]
+    started = time.perf_counter()
+    await asyncio.gather(*users)
+    results = summarize(records, time.perf_counter() - started, counter["next"])
+    results["agent_stats"] = await fetch_agent_stats(url, args.timeout)
+    return results
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_local_server(args) -> Tuple[subprocess.Popen, str, str]:
+    """Levanta el servidor con stubs de AWS en un proceso y directorio aparte."""
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    shutil.copytree(os.path.join(REPO_ROOT, "data"), os.path.join(workdir, "data"))
+    port = free_port()
+    command = [
+        sys.executable, os.path.abspath(__file__), "--serve", str(port),
+        "--median-ms", str(args.median_ms), "--comprehend-median-ms", str(args.comprehend_median_ms),
+        "--error-rate", str(args.error_rate), "--throttle-rate", str(args.throttle_rate), "--seed", str(args.seed),
+    ]
+    env = dict(os.environ)
+    env.pop("MOCK_MODE", None)
+    output = None if args.verbose else subprocess.DEVNULL
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=output)
+
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+            sys.exit(f"El servidor local terminó al iniciar (código {process.returncode})")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process, url, workdir
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit("El servidor local no respondió en 60 segundos")
+
+
+def serve(args):
+    """Modo interno (--serve): el servidor web con los stubs de AWS."""
+    from src.config import CONFIG
+
+    # Después de cargar .env, para que nunca se llame a AWS real durante la prueba
+    CONFIG.update({
+        "aws_stub_mode": True,
+        "stub_bedrock_median_ms": args.median_ms,
+        "stub_comprehend_median_ms": args.comprehend_median_ms,
+        "stub_error_rate": args.error_rate,
+        "stub_throttle_rate": args.throttle_rate,
+        "stub_seed": args.seed,
+    })
+
+    import uvicorn
+    from src.web_server import app
+
+    uvicorn.run(app, host="127.0.0.1", port=args.serve, log_level="warning", access_log=False)
+
+
+def print_report(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    summary = results["summary"]
+    latency = summary["latency_ms"]
+    print(f"\nRequests: {summary['requests']}  errores: {summary['errors']} ({summary['error_rate']:.1%})  "
+          f"conversaciones: {summary['conversations']}  tiempo: {summary['duration_seconds']}s  "
+          f"throughput: {summary['throughput_rps']} req/s")
+    if latency:
+        print(f"Latencia: p50={latency['p50']:.1f} ms  p95={latency['p95']:.1f} ms  "
+              f"p99={latency['p99']:.1f} ms  max={latency['max']:.1f} ms")
+
+    print("\nPor script:")
+    for name, item in results["by_script"].items():
+        p95 = item["latency_ms"].get("p95", 0)
+        print(f"  {name:<16} requests={item['requests']:<6} errores={item['errors']:<4} p95={p95:.1f} ms")
+
+    print("\nPor origen de la respuesta:")
+    for source, item in results["by_source"].items():
+        print(f"  {source:<16} requests={item['count']:<6} p50={item['p50']:.1f} ms  p95={item['p95']:.1f} ms")
+
+    if results["server_timings_ms"]:
+        print("\nEtapas del servidor (ms):")
+        for stage, item in results["server_timings_ms"].items():
+            print(f"  {stage:<16} n={item['count']:<6} media={item['mean']:<9.2f} p50={item['p50']:<9.2f} "
+                  f"p95={item['p95']:<9.2f} p99={item['p99']:.2f}")
+
+    for error in results["error_samples"]:
+        print(f"  ⚠️ {error}")
+
+    if baseline:
+        print(f"\nComparación con {baseline.get('started_at', 'la corrida anterior')}:")
+        before, after = baseline["summary"], summary
+        rows = [("throughput_rps", before["throughput_rps"], after["throughput_rps"]),
+                ("error_rate", before["error_rate"], after["error_rate"])]
+        rows += [(f"latencia {key}", before["latency_ms"].get(key), after["latency_ms"].get(key)) for key in ("p50", "p95", "p99")]
+        for stage, item in results["server_timings_ms"].items():
+            previous = baseline.get("server_timings_ms", {}).get(stage)
+            if previous:
+                rows.append((f"etapa {stage} p95", previous["p95"], item["p95"]))
+        for name, old, new in rows:
+            if old is None or new is None:
+                continue
+            change = f"{(new - old) / old:+.1%}" if old else "n/a"
+            print(f"  {name:<24} {old:>10.2f} -> {new:>10.2f}  ({change})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de punta a punta para /api/chat")
+    parser.add_argument("--url")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--think-ms", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--median-ms", type=float, default=400.0)
+    parser.add_argument("--comprehend-median-ms", type=float, default=60.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    process = workdir = None
+    url = args.url
+    if not url:
+        process, url, workdir = start_local_server(args)
+        print(f"Servidor local con stubs de AWS en {url} (Bedrock {args.median_ms:g} ms, Comprehend {args.comprehend_median_ms:g} ms)")
+    print(f"{args.conversations} conversaciones con {args.users} sesiones concurrentes contra {url}")
+
+    started_at = datetime.now()
+    try:
+        results = asyncio.run(run_load(url, args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    results = {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "target": args.url or "local (AWS_STUB_MODE)",
+        "config": {key: value for key, value in vars(args).items() if key not in ("serve", "output", "compare", "verbose")},
+        **results,
+    }
+    print_report(results, baseline)
+
+    output = args.output or os.path.join(REPO_ROOT, "benchmarks", "results", f"load_test_{started_at:%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
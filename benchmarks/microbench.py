@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmarks de los helpers de cada turno, con curvas de escalamiento.
+
+Cada benchmark se mide con `timeit` en varios tamaños (conversaciones en
+memoria, tamaño de la respuesta del modelo, filas de los CSV, casos del CRM,
+análisis de sentimiento guardados). Con los tiempos se estima el exponente de
+crecimiento, la pendiente en escala log-log (~0 constante, ~1 lineal, ~2
+cuadrático), y se marca ⚠️ cuando supera el de la implementación actual.
+Así un helper que pasa a recorrer todo el almacén se nota antes de producción.
+
+Todo corre en un directorio temporal con una copia de `data/` y archivos
+sintéticos; los archivos del repositorio no se modifican.
+
+Uso:
+    python benchmarks/microbench.py
+    python benchmarks/microbench.py --quick
+    python benchmarks/microbench.py --only crm --check
+    python benchmarks/microbench.py --compare benchmarks/results/microbench_20250101_120000.json
+
+Opciones:
+    --quick: Tamaños reducidos (el CRM llega a 100k casos en vez de 1M)
+    --only: Solo los benchmarks cuyo nombre contiene el texto (se puede repetir)
+    --repeat: Repeticiones de timeit por tamaño; se reporta la mejor (default: 5)
+    --check: Termina con código 1 si algún exponente supera el esperado
+    --output: Archivo JSON de resultados (default: benchmarks/results/microbench_<fecha>.json)
+    --compare: JSON de una corrida anterior para comparar
+"""
+import argparse
+import atexit
+import contextlib
+import csv
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Margen sobre el exponente esperado antes de marcar una regresión
+EXPONENT_TOLERANCE = 0.35
+# Tiempo máximo aproximado de medición por tamaño
+SECONDS_PER_SIZE = 10.0
+
+_WORDS = (
+    "cuenta ahorro tarjeta crédito préstamo transferencia saldo comisión sucursal horario "
+    "banca en línea requisitos documento interés plazo fijo seguro vehículo hipoteca"
+).split()
+
+CRM_FIELDS = [
+    "id", "fecha_creacion", "estado", "tipo", "cliente_nombre", "documento_id", "fecha_nacimiento", "direccion",
+    "comprobante_ingresos", "registro_mercantil", "telefono", "email", "session_id", "notas", "fecha_modificacion",
+]
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+# --- Memoria de conversaciones ---
+
+def build_memory(size: int):
+    """Memoria con `size` conversaciones de 10 mensajes cada una."""
+    from src.memory import ConversationMemory
+
+    rng = random.Random(size)
+    store = ConversationMemory(max_conversations=size + 10)
+    store.memory_file = os.path.abspath("bench_memory.json")
+    # Sin resúmenes en segundo plano durante la medición
+    store.summary_trigger_messages = 10 ** 9
+    now = datetime.now().isoformat()
+    for index in range(size):
+        messages = []
+        for turn in range(5):
+            messages.append({"timestamp": now, "role": "user", "content": sentence(rng, 12), "source": "bedrock"})
+            messages.append({"timestamp": now, "role": "assistant", "content": sentence(rng, 40), "source": "bedrock"})
+        store.conversations[f"session-{index:07d}"] = {
+            "messages": messages,
+            "metadata": {
+                "created_at": now, "last_activity": now, "analyzed_by_comprehend": False,
+                "analysis_timestamp": None, "message_count": len(messages),
+            },
+        }
+    return store
+
+
+def bench_memory_add_message(size: int) -> Callable[[], Any]:
+    store = build_memory(size)
+    sessions = list(store.conversations)
+    state = {"next": 0}
+
+    def run():
+        session_id = sessions[state["next"] % len(sessions)]
+        state["next"] += 1
+        store.add_message(session_id, "¿Cuál es el horario de atención?", "De lunes a viernes de 8:00 AM a 4:00 PM.", "bench")
+    return run
+
+
+def bench_memory_context_summary(size: int) -> Callable[[], Any]:
+    store = build_memory(size)
+    session_id = f"session-{size // 2:07d}"
+    return lambda: store.get_context_summary(session_id)
+
+
+# --- Agente ---
+
+def bench_extract_tool_calls(size: int) -> Callable[[], Any]:
+    """Respuesta de `size` caracteres con el bloque <tool_calls> al final."""
+    from src.agent import Agent
+
+    agent = Agent()
+    rng = random.Random(size)
+    prose = []
+    length = 0
+    while length < size:
+        prose.append(sentence(rng, 20) + ". ")
+        length += len(prose[-1])
+    tool_block = '<tool_calls>[{"name": "consultar_caso", "arguments": {"case_id": "4b28b0db"}}]</tool_calls>'
+    message = "".join(prose)[:size] + "\n" + tool_block
+    return lambda: agent._extract_tool_calls(message)
+
+
+# --- Catálogo y FAQ ---
+
+def bench_faq_text(size: int) -> Callable[[], Any]:
+    from src.faq_loader import get_faq_text
+
+    rng = random.Random(size)
+    with open("data/faq.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["pregunta", "respuesta", "categoria"])
+        for _ in range(size):
+            writer.writerow([f"¿{sentence(rng, 8)}?", sentence(rng, 30), rng.choice(_WORDS).title()])
+    return get_faq_text
+
+
+def bench_banesco_context(size: int) -> Callable[[], Any]:
+    from src.context_loader import load_banesco_context
+
+    rng = random.Random(size)
+    with open("data/banesco_context.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["categoria", "producto", "descripcion", "requisitos", "beneficios", "tarifa"])
+        for index in range(size):
+            writer.writerow([
+                f"Categoría {index // 10}", f"Producto {index}", sentence(rng, 15),
+                sentence(rng, 8), sentence(rng, 10), sentence(rng, 4),
+            ])
+    return load_banesco_context
+
+
+def bench_product_recommendations(size: int) -> Callable[[], Any]:
+    from src.context_loader import get_product_recommendations, load_banesco_context
+
+    rng = random.Random(size)
+    message = (sentence(rng, max(1, size // 8)) + " quiero ahorrar para el futuro")[-size:]
+    context = load_banesco_context()
+    return lambda: get_product_recommendations(message, context)
+
+
+# --- CRM (CSV local) ---
+
+def write_crm_cases(size: int):
+    rng = random.Random(size)
+    started = datetime(2024, 1, 1)
+    with open("data/crm_cases.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CRM_FIELDS)
+        for index in range(size):
+            created = (started + timedelta(seconds=37 * index)).strftime("%Y-%m-%d %H:%M:%S")
+            writer.writerow([
+                f"{index:08x}", created, rng.choice(["Nuevo", "En proceso", "Cerrado"]), "Apertura de Cuenta",
+                "Cliente Sintético", f"8-{rng.randint(100, 999)}-{rng.randint(100, 9999)}", "01/01/1990",
+                "Calle 50, Ciudad de Panamá", "", "", f"6{rng.randint(1000000, 9999999)}",
+                f"cliente{index}@example.com", f"session_{index}", "Caso creado automáticamente por el bot", "",
+            ])
+
+
+def bench_crm_get_case(size: int) -> Callable[[], Any]:
+    from src.crm_adapter import get_case
+
+    write_crm_cases(size)
+    # Peor caso: el último caso del archivo
+    last_id = f"{size - 1:08x}"
+    return lambda: get_case(last_id)
+
+
+def bench_crm_list_cases(size: int) -> Callable[[], Any]:
+    from src.crm_adapter import list_cases
+
+    write_crm_cases(size)
+    return lambda: list_cases(50)
+
+
+def bench_crm_update_case(size: int) -> Callable[[], Any]:
+    from src.crm_adapter import update_case
+
+    write_crm_cases(size)
+    case_id = f"{size // 2:08x}"
+    if not update_case(case_id, {"estado": "En proceso"})["success"]:
+        raise RuntimeError("update_case no actualizó el caso sintético")
+    return lambda: update_case(case_id, {"estado": "En proceso"})
+
+
+# --- Comprehend ---
+
+def bench_sentiment_summary(size: int) -> Callable[[], Any]:
+    from src.comprehend_analyzer import comprehend_analyzer
+
+    rng = random.Random(size)
+    sentiments = ["POSITIVE", "NEGATIVE", "NEUTRAL", "MIXED"]
+    comprehend_analyzer.analysis_data["sentiment_history"] = [
+        {"sentiment": rng.choice(sentiments), "confidence": rng.random(), "timestamp": datetime.now().isoformat()}
+        for _ in range(size)
+    ]
+    return comprehend_analyzer.get_sentiment_summary
+
+
+# Nombre, función, tamaños, tamaños con --quick, unidad del tamaño y exponente de la implementación actual
+BENCHMARKS = [
+    ("memory.add_message", bench_memory_add_message, [10, 100, 1000, 5000], [10, 100, 1000], "conversaciones", 1.0),
+    ("memory.get_context_summary", bench_memory_context_summary, [10, 100, 1000, 5000], [10, 100, 1000], "conversaciones", 0.0),
+    ("agent._extract_tool_calls", bench_extract_tool_calls, [1_000, 10_000, 100_000, 1_000_000], [1_000, 10_000, 100_000], "caracteres", 1.0),
+    ("faq_loader.get_faq_text", bench_faq_text, [10, 100, 1000, 10_000], [10, 100, 1000], "filas", 1.0),
+    ("context_loader.load_banesco_context", bench_banesco_context, [10, 100, 1000, 10_000], [10, 100, 1000], "filas", 1.0),
+    ("context_loader.get_product_recommendations", bench_product_recommendations, [100, 1000, 10_000, 100_000], [100, 1000, 10_000], "caracteres", 1.0),
+    ("crm.get_case", bench_crm_get_case, [10_000, 100_000, 1_000_000], [1000, 10_000, 100_000], "casos", 1.0),
+    ("crm.list_cases", bench_crm_list_cases, [10_000, 100_000, 1_000_000], [1000, 10_000, 100_000], "casos", 1.0),
+    ("crm.update_case", bench_crm_update_case, [10_000, 100_000, 1_000_000], [1000, 10_000, 100_000], "casos", 1.0),
+    ("comprehend.get_sentiment_summary", bench_sentiment_summary, [100, 1000, 10_000, 100_000], [100, 1000, 10_000], "análisis", 1.0),
+]
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> float:
+    """Mejor tiempo por llamada en segundos."""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    samples = [elapsed / number]
+    # Las llamadas lentas (CRM con 1M casos) se repiten menos
+    repeat = max(1, min(repeat, int(SECONDS_PER_SIZE / max(elapsed, 1e-9))))
+    samples += [total / number for total in timer.repeat(repeat=repeat, number=number)]
+    return min(samples)
+
+
+def growth_exponent(points: List[Dict[str, float]]) -> float:
+    """Pendiente de mínimos cuadrados de log(tiempo) contra log(tamaño)."""
+    xs = [math.log(point["size"]) for point in points]
+    ys = [math.log(point["seconds"]) for point in points]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance if variance else 0.0
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.3f} s"
+    if seconds >= 1e-3:
+        return f"{1e3 * seconds:.3f} ms"
+    return f"{1e6 * seconds:.2f} µs"
+
+
+def run_benchmark(name, factory, sizes, unit, expected, repeat) -> Dict[str, Any]:
+    print(f"\n{name} ({unit}; esperado ~n^{expected:g})")
+    points = []
+    for size in sizes:
+        # Los helpers imprimen su log en cada llamada
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            fn = factory(size)
+            seconds = measure(fn, repeat)
+        growth = ""
+        if points:
+            growth = f"x{seconds / points[-1]['seconds']:.1f} con x{size / points[-1]['size']:g} de tamaño"
+        print(f"  {size:>10,}  {format_seconds(seconds):>12}  {growth}")
+        points.append({"size": size, "seconds": seconds})
+
+    exponent = growth_exponent(points) if len(points) > 1 else 0.0
+    regression = exponent > expected + EXPONENT_TOLERANCE
+    print(f"  exponente ≈ {exponent:.2f} {'⚠️ crece más rápido de lo esperado' if regression else '✅'}")
+    return {"unit": unit, "expected_exponent": expected, "exponent": round(exponent, 3), "regression": regression, "points": points}
+
+
+def print_comparison(results: Dict[str, Any], baseline: Dict[str, Any]):
+    print(f"\nComparación con {baseline.get('started_at', 'la corrida anterior')} (tiempo nuevo / anterior):")
+    for name, item in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if not previous:
+            continue
+        before = {point["size"]: point["seconds"] for point in previous["points"]}
+        ratios = [
+            f"{point['size']:,}: x{point['seconds'] / before[point['size']]:.2f}"
+            for point in item["points"] if point["size"] in before
+        ]
+        if ratios:
+            print(f"  {name:<44} exponente {previous['exponent']:.2f} -> {item['exponent']:.2f}  {'  '.join(ratios)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks de los helpers de cada turno")
+    parser.add_argument("--quick", action="store_true")
+    parser.add_argument("--only", action="append", default=[])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    selected = [bench for bench in BENCHMARKS if not args.only or any(text in bench[0] for text in args.only)]
+    if not selected:
+        sys.exit(f"Ningún benchmark coincide con {args.only}")
+
+    started_at = datetime.now()
+    output = os.path.abspath(args.output or os.path.join(REPO_ROOT, "benchmarks", "results", f"microbench_{started_at:%Y%m%d_%H%M%S}.json"))
+    workdir = tempfile.mkdtemp(prefix="microbench_")
+    shutil.copytree(os.path.join(REPO_ROOT, "data"), os.path.join(workdir, "data"))
+    # Registrado antes de importar src: corre después del guardado final de los rollups (atexit es LIFO)
+    atexit.register(shutil.rmtree, workdir, ignore_errors=True)
+    # Los módulos leen y escriben rutas relativas (data/, memoria, análisis) al importarse y en cada llamada
+    os.chdir(workdir)
+
+    from src.config import CONFIG
+    CONFIG["aws_stub_mode"] = True
+
+    benchmarks = {}
+    for name, factory, sizes, quick_sizes, unit, expected in selected:
+        benchmarks[name] = run_benchmark(name, factory, quick_sizes if args.quick else sizes, unit, expected, args.repeat)
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    results = {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "config": {"quick": args.quick, "repeat": args.repeat, "python": sys.version.split()[0]},
+        "benchmarks": benchmarks,
+    }
+    if baseline:
+        print_comparison(results, baseline)
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en {output}")
+
+    regressions = [name for name, item in benchmarks.items() if item["regression"]]
+    if regressions:
+        print(f"⚠️ Crecimiento mayor al esperado: {', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
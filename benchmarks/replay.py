@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Replay de conversaciones grabadas a través de `Agent.handle_message`.
+
+Lee las sesiones de `conversation_memory.json` (formato actual o el antiguo de
+lista de turnos) y vuelve a enviar cada mensaje del usuario al agente, con su
+pipeline completo: sentimiento, slots, router de intents, caché, prompt,
+modelo y herramientas. Por turno reporta el origen de la respuesta, el tamaño
+estimado del prompt, las llamadas al modelo y a herramientas y la latencia.
+Es un benchmark representativo para comparar cambios de prompt o de pipeline.
+
+Modelo:
+- `stub` (default): el stub local de Bedrock (`AWS_STUB_MODE`), con sus reglas
+  de herramientas y latencia configurable.
+- `recorded`: cada llamada devuelve la respuesta grabada para ese turno.
+
+Comprehend siempre usa el stub. La corrida ocurre en un directorio temporal
+con una copia de `data/`: la memoria, los casos y los análisis del replay no
+tocan los archivos del repositorio.
+
+Tiempo: con --speed 0 los turnos se envían sin esperas; con --speed 1 se
+respetan los intervalos originales entre mensajes y con --speed 10 van diez
+veces más rápido. Las pausas largas se acortan a --max-gap-seconds.
+
+Uso:
+    python benchmarks/replay.py
+    python benchmarks/replay.py --model recorded --limit 10
+    python benchmarks/replay.py --speed 5 --workers 4
+    python benchmarks/replay.py --compare benchmarks/results/replay_20250101_120000.json
+
+Opciones:
+    --memory-file: Conversaciones grabadas (default: conversation_memory.json)
+    --sessions: IDs de sesión a reproducir (default: todas)
+    --limit: Máximo de sesiones
+    --model: stub | recorded (default: stub)
+    --model-latency-ms: Mediana de latencia del modelo (default: STUB_BEDROCK_MEDIAN_MS con stub, 0 con recorded)
+    --speed: Factor de velocidad; 0 sin esperas (default: 0)
+    --max-gap-seconds: Pausa máxima entre mensajes, en tiempo original (default: 60)
+    --workers: Sesiones reproducidas en paralelo (default: 1)
+    --output: Archivo JSON de resultados (default: benchmarks/results/replay_<fecha>.json)
+    --compare: JSON de una corrida anterior para comparar
+    --verbose: Muestra el log del agente
+"""
+import argparse
+import atexit
+import contextlib
+import contextvars
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+_TOOL_CALLS_RE = re.compile(r"<tool_calls>\[(.*?)\]</tool_calls>", re.DOTALL)
+
+# Métricas del turno en curso; converse corre en hilos del executor de resilience.py, que copian el contexto
+_current_turn: contextvars.ContextVar = contextvars.ContextVar("replay_turn")
+
+
+def load_sessions(memory_file: str, session_ids: List[str], limit: Optional[int]) -> List[Dict[str, Any]]:
+    """Sesiones con sus turnos: mensaje del usuario, respuesta grabada y timestamp."""
+    from src.memory import normalize_conversation
+
+    with open(memory_file, "r", encoding="utf-8") as f:
+        stored = json.load(f)
+
+    sessions = []
+    for session_id, conversation in stored.items():
+        if session_ids and session_id not in session_ids:
+            continue
+        messages = normalize_conversation(conversation)["messages"]
+        turns = []
+        for index, message in enumerate(messages):
+            if message.get("role") != "user" or not (message.get("content") or "").strip():
+                continue
+            reply = messages[index + 1] if index + 1 < len(messages) and messages[index + 1].get("role") == "assistant" else {}
+            turns.append({
+                "text": message["content"],
+                "recorded_response": reply.get("content", ""),
+                "recorded_source": message.get("source", "unknown"),
+                "timestamp": message.get("timestamp"),
+            })
+        if turns:
+            sessions.append({"session_id": session_id, "turns": turns})
+    return sessions[:limit] if limit else sessions
+
+
+def schedule(sessions: List[Dict[str, Any]], max_gap: float):
+    """Agrega a cada turno `offset`: segundos desde el primer mensaje, con las pausas acotadas."""
+    stamped = []
+    for session in sessions:
+        for turn in session["turns"]:
+            try:
+                stamped.append((datetime.fromisoformat(turn["timestamp"]).timestamp(), turn))
+            except (TypeError, ValueError):
+                turn["offset"] = None
+    stamped.sort(key=lambda item: item[0])
+    offset = 0.0
+    previous = None
+    for moment, turn in stamped:
+        if previous is not None:
+            offset += min(moment - previous, max_gap)
+        turn["offset"] = offset
+        previous = moment
+
+
+class ReplayBedrockClient:
+    """Cliente de Bedrock que mide cada `converse` del turno en curso.
+
+    Con `inner` delega en ese cliente (el stub); sin él devuelve la respuesta
+    grabada del turno (`set_turn`).
+    """
+
+    def __init__(self, inner=None, latency=None):
+        self.inner = inner
+        self.latency = latency
+
+    def set_turn(self, recorded_response: str):
+        _current_turn.set({
+            "recorded": recorded_response, "model_calls": 0, "prompt_tokens": 0,
+            "input_tokens": 0, "output_tokens": 0, "model_tool_calls": 0,
+        })
+
+    def turn_stats(self) -> Dict[str, Any]:
+        stats = dict(_current_turn.get())
+        stats.pop("recorded")
+        return stats
+
+    def converse(self, **request):
+        from src.prompt_planner import estimate_tokens
+
+        turn = _current_turn.get()
+        text = [block["text"] for block in request.get("system", []) if "text" in block]
+        for message in request.get("messages", []):
+            text += [block["text"] for block in message["content"] if "text" in block]
+            text += [json.dumps(block["toolResult"], ensure_ascii=False) for block in message["content"] if "toolResult" in block]
+        prompt_tokens = estimate_tokens("\n".join(text))
+
+        if self.inner is not None:
+            response = self.inner.converse(**request)
+        else:
+            if self.latency is not None:
+                time.sleep(self.latency.sample())
+            reply = turn["recorded"]
+            response = {
+                "output": {"message": {"role": "assistant", "content": [{"text": reply}]}},
+                "stopReason": "end_turn",
+                "usage": {"inputTokens": prompt_tokens, "outputTokens": estimate_tokens(reply)},
+            }
+
+        content = response["output"]["message"].get("content", [])
+        tool_calls = sum(1 for block in content if "toolUse" in block)
+        match = _TOOL_CALLS_RE.search("".join(block.get("text", "") for block in content))
+        if match:
+            try:
+                tool_calls += len(json.loads("[" + match.group(1) + "]"))
+            except json.JSONDecodeError:
+                pass
+
+        usage = response.get("usage", {})
+        turn["model_calls"] += 1
+        turn["prompt_tokens"] += prompt_tokens
+        turn["input_tokens"] += usage.get("inputTokens", 0)
+        turn["output_tokens"] += usage.get("outputTokens", 0)
+        turn["model_tool_calls"] += tool_calls
+        return response
+
+    def converse_stream(self, **request):
+        return self.inner.converse_stream(**request)
+
+
+def replay_session(agent, client: ReplayBedrockClient, session: Dict[str, Any], args, started: float) -> List[Dict[str, Any]]:
+    """Envía los turnos de una sesión en orden y devuelve sus métricas."""
+    results = []
+    replay_id = f"replay-{session['session_id']}"
+    for index, turn in enumerate(session["turns"]):
+        if args.speed and turn.get("offset") is not None:
+            wait = started + turn["offset"] / args.speed - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+
+        client.set_turn(turn["recorded_response"])
+        turn_started = time.perf_counter()
+        error = None
+        try:
+            response = agent.handle_message({"text": turn["text"], "session_id": replay_id})
+        except Exception as e:
+            response = {}
+            error = f"{type(e).__name__}: {e}"
+        latency_ms = 1000 * (time.perf_counter() - turn_started)
+
+        stats = client.turn_stats()
+        source = response.get("source")
+        # La apertura con slots completos ejecuta abrir_cuenta sin pasar por el modelo
+        stats["tool_calls"] = stats.pop("model_tool_calls") + (1 if source == "slots" else 0)
+        results.append({
+            "session_id": session["session_id"],
+            "turn": index,
+            "text": turn["text"][:80],
+            "source": source,
+            "recorded_source": turn["recorded_source"],
+            "model_id": response.get("model_id"),
+            "latency_ms": round(latency_ms, 2),
+            **stats,
+            "timings_ms": response.get("timings_ms", {}),
+            "error": error,
+        })
+    return results
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(turns: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    latencies = [turn["latency_ms"] for turn in turns if not turn["error"]]
+    model_turns = [turn for turn in turns if turn["model_calls"]]
+    summary = {
+        "sessions": len({turn["session_id"] for turn in turns}),
+        "turns": len(turns),
+        "errors": sum(1 for turn in turns if turn["error"]),
+        "duration_seconds": round(elapsed, 2),
+        "sources": dict(Counter(turn["source"] or "error" for turn in turns)),
+        "model_calls": sum(turn["model_calls"] for turn in turns),
+        "tool_calls": sum(turn["tool_calls"] for turn in turns),
+        "input_tokens": sum(turn["input_tokens"] for turn in turns),
+        "output_tokens": sum(turn["output_tokens"] for turn in turns),
+        "mean_prompt_tokens": round(sum(turn["prompt_tokens"] for turn in model_turns) / len(model_turns), 1) if model_turns else 0.0,
+        "latency_ms": {},
+    }
+    if latencies:
+        summary["latency_ms"] = {
+            "mean": round(sum(latencies) / len(latencies), 2),
+            "p50": round(percentile(latencies, 0.5), 2),
+            "p95": round(percentile(latencies, 0.95), 2),
+            "p99": round(percentile(latencies, 0.99), 2),
+            "max": round(max(latencies), 2),
+        }
+    return summary
+
+
+def print_report(turns: List[Dict[str, Any]], summary: Dict[str, Any], baseline: Optional[Dict[str, Any]]):
+    print(f"\n{'sesión':<24} {'#':>2}  {'origen':<14} {'prompt':>7} {'llam.':>5} {'herr.':>5} {'ms':>9}  mensaje")
+    for turn in turns:
+        print(f"{turn['session_id'][-24:]:<24} {turn['turn']:>2}  {(turn['source'] or 'error'):<14} "
+              f"{turn['prompt_tokens']:>7} {turn['model_calls']:>5} {turn['tool_calls']:>5} {turn['latency_ms']:>9.1f}  {turn['text'][:40]}")
+
+    latency = summary["latency_ms"]
+    print(f"\nSesiones: {summary['sessions']}  turnos: {summary['turns']}  errores: {summary['errors']}  "
+          f"tiempo: {summary['duration_seconds']}s")
+    print(f"Orígenes: {', '.join(f'{source}={count}' for source, count in sorted(summary['sources'].items()))}")
+    print(f"Llamadas al modelo: {summary['model_calls']}  herramientas: {summary['tool_calls']}  "
+          f"prompt medio: {summary['mean_prompt_tokens']} tokens (estimados)  "
+          f"tokens entrada/salida: {summary['input_tokens']}/{summary['output_tokens']}")
+    if latency:
+        print(f"Latencia: p50={latency['p50']:.1f} ms  p95={latency['p95']:.1f} ms  p99={latency['p99']:.1f} ms  max={latency['max']:.1f} ms")
+
+    if baseline:
+        print(f"\nComparación con {baseline.get('started_at', 'la corrida anterior')}:")
+        before = baseline["summary"]
+        rows = [(key, before.get(key), summary.get(key)) for key in ("model_calls", "tool_calls", "mean_prompt_tokens", "input_tokens", "output_tokens")]
+        rows += [(f"latencia {key}", before.get("latency_ms", {}).get(key), latency.get(key)) for key in ("p50", "p95", "p99")]
+        for name, old, new in rows:
+            if old is None or new is None:
+                continue
+            change = f"{(new - old) / old:+.1%}" if old else "n/a"
+            print(f"  {name:<20} {old:>10} -> {new:>10}  ({change})")
+
+        previous = {(turn["session_id"], turn["turn"]): turn for turn in baseline.get("turns", [])}
+        changed = [
+            (turn, previous[(turn["session_id"], turn["turn"])]) for turn in turns
+            if (turn["session_id"], turn["turn"]) in previous
+            and (turn["source"] != previous[(turn["session_id"], turn["turn"])]["source"]
+                 or turn["model_calls"] != previous[(turn["session_id"], turn["turn"])]["model_calls"])
+        ]
+        for turn, old in changed[:20]:
+            print(f"  ↪ {turn['session_id']} #{turn['turn']}: {old['source']} ({old['model_calls']} llamadas) -> "
+                  f"{turn['source']} ({turn['model_calls']} llamadas)  {turn['text'][:40]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay de conversaciones grabadas a través del agente")
+    parser.add_argument("--memory-file", default="conversation_memory.json")
+    parser.add_argument("--sessions", nargs="*", default=[])
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--model", choices=["stub", "recorded"], default="stub")
+    parser.add_argument("--model-latency-ms", type=float)
+    parser.add_argument("--speed", type=float, default=0.0)
+    parser.add_argument("--max-gap-seconds", type=float, default=60.0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    memory_file = os.path.abspath(args.memory_file)
+    if not os.path.exists(memory_file):
+        sys.exit(f"No existe {memory_file}")
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    started_at = datetime.now()
+    output_file = os.path.abspath(args.output or os.path.join(REPO_ROOT, "benchmarks", "results", f"replay_{started_at:%Y%m%d_%H%M%S}.json"))
+    workdir = tempfile.mkdtemp(prefix="replay_")
+    shutil.copytree(os.path.join(REPO_ROOT, "data"), os.path.join(workdir, "data"))
+    # Registrado antes de importar src: corre después del guardado final de los rollups (atexit es LIFO)
+    atexit.register(shutil.rmtree, workdir, ignore_errors=True)
+    # Memoria, casos y análisis del replay quedan en el directorio temporal
+    os.chdir(workdir)
+    os.environ.pop("MOCK_MODE", None)
+
+    from src.config import CONFIG
+
+    CONFIG["aws_stub_mode"] = True
+    if args.model == "stub" and args.model_latency_ms is not None:
+        CONFIG["stub_bedrock_median_ms"] = args.model_latency_ms
+
+    sessions = load_sessions(memory_file, args.sessions, args.limit)
+    if not sessions:
+        sys.exit("No hay sesiones con mensajes de usuario para reproducir")
+    schedule(sessions, args.max_gap_seconds)
+    total_turns = sum(len(session["turns"]) for session in sessions)
+    print(f"Replay de {len(sessions)} sesiones ({total_turns} turnos) con modelo '{args.model}', "
+          f"velocidad {'sin esperas' if not args.speed else f'x{args.speed:g}'}, {args.workers} en paralelo")
+
+    from src.agent import Agent
+    from src.aws_clients import aws_clients
+    from src.aws_stubs import LatencyModel
+
+    if args.model == "stub":
+        client = ReplayBedrockClient(inner=aws_clients.bedrock())
+    else:
+        latency = LatencyModel(args.model_latency_ms, CONFIG["stub_latency_sigma"]) if args.model_latency_ms else None
+        client = ReplayBedrockClient(latency=latency)
+    agent = Agent(bedrock_client=client)
+
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            per_session = list(pool.map(lambda session: replay_session(agent, client, session, args, started), sessions))
+    elapsed = time.perf_counter() - started
+
+    turns = [turn for session_turns in per_session for turn in session_turns]
+    summary = summarize(turns, elapsed)
+    print_report(turns, summary, baseline)
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    results = {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "memory_file": memory_file,
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "verbose", "memory_file")},
+        "summary": summary,
+        "turns": turns,
+    }
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en {output_file}")
+
+
+if __name__ == "__main__":
+    main()
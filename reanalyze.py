@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bulk (re)analysis of conversations with Amazon Comprehend.
+
+Uso:
+    python reanalyze.py                      # conversaciones sin analizar en memoria
+    python reanalyze.py --all                # todas las conversaciones en memoria
+    python reanalyze.py --input archivo.jsonl
+
+Opciones:
+    --input: Archivo archivado (.json con formato de conversation_memory.json o
+             .jsonl con un objeto {"session_id", "messages"} por línea)
+    --workers: Número de workers en paralelo (default: 8)
+    --pool: thread o process (default: thread)
+    --flush-every: Conversaciones por escritura en bloque (default: 1000)
+    --checkpoint: Archivo de checkpoint para reanudar (default: reanalysis.checkpoint)
+    --results: Archivo donde se agregan los resultados de cada bloque (default: reanalysis.results.jsonl)
+    --limit: Máximo de conversaciones a procesar
+
+Cada bloque se agrega a `--results` (sin reescribir nada) y al terminar, o al
+interrumpir, se incorporan todos de una vez a comprehend_analysis.json, la
+memoria y los rollups. El servidor debe estar detenido: ambos reescriben esos
+archivos, y el script se niega a correr mientras el servidor los tiene tomados.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Set
+
+from src.aws_clients import aws_clients
+from src.comprehend_analyzer import comprehend_analyzer, BATCH_MAX_DOCUMENTS
+from src.memory import memory, normalize_conversation
+from src.analytics_rollups import rollups
+from src.data_lock import acquire_data_lock, lock_owner
+from src.colors import print_header, print_info, print_success, print_warning, print_error
+
+
+def iter_memory_conversations(include_analyzed: bool) -> Iterator[Dict[str, Any]]:
+    """Yield conversations from the in-memory store."""
+    session_ids = list(memory.conversations) if include_analyzed else memory.get_unanalyzed_conversations()
+    for session_id in session_ids:
+        yield memory.get_conversation_for_analysis(session_id)
+
+
+def iter_archive_conversations(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield conversations from an archive file; JSONL files are streamed line by line."""
+    if path.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    conversation = normalize_conversation(record.get('messages', record))
+                    yield {"session_id": record.get('session_id'), "messages": conversation["messages"]}
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        for session_id, conversation in stored.items():
+            yield {"session_id": session_id, "messages": normalize_conversation(conversation)["messages"]}
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """Session ids already written by a previous run."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def append_checkpoint(path: str, session_ids: List[str]):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.writelines(f"{session_id}\n" for session_id in session_ids)
+
+
+def chunked(iterable, size: int) -> Iterator[List[Any]]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def analyze_chunk(conversations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Worker entry point: one batch-API round trip per metric for up to 25 conversations."""
+    return comprehend_analyzer.analyze_conversations_bulk(conversations)
+
+
+def _init_process_worker():
+    """Give each worker process its own Comprehend client (clients are not fork-safe)."""
+    aws_clients.reset()
+
+
+def flush(results: List[Dict[str, Any]], checkpoint: str, results_file: str):
+    """Append a block of results and its session ids to the checkpoint (no file is rewritten)."""
+    if not results:
+        return
+    with open(results_file, 'a', encoding='utf-8') as f:
+        f.writelines(json.dumps(result, ensure_ascii=False) + "\n" for result in results)
+    append_checkpoint(checkpoint, [result["session_id"] for result in results])
+
+
+def merge(results_file: str, from_memory: bool):
+    """Fold every appended result into the stores: one analysis file write, one memory write."""
+    if not os.path.exists(results_file):
+        return
+    results: Dict[str, Dict[str, Any]] = {}
+    with open(results_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                result = json.loads(line)
+                results[result["session_id"]] = result
+    if results:
+        print_info(f"Merging {len(results)} results into {comprehend_analyzer.analysis_file}")
+        comprehend_analyzer.store_analyses(list(results.values()))
+        if from_memory:
+            memory.mark_conversations_analyzed(list(results))
+        rollups.flush()
+    os.remove(results_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-análisis masivo de conversaciones con Comprehend')
+    parser.add_argument('--input', help='Archivo de conversaciones archivadas (.json o .jsonl)')
+    parser.add_argument('--all', action='store_true', help='Incluir conversaciones ya analizadas')
+    parser.add_argument('--workers', type=int, default=8, help='Workers en paralelo')
+    parser.add_argument('--pool', choices=['thread', 'process'], default='thread', help='Tipo de pool')
+    parser.add_argument('--flush-every', type=int, default=1000, help='Conversaciones por escritura en bloque')
+    parser.add_argument('--checkpoint', default='reanalysis.checkpoint', help='Archivo de checkpoint')
+    parser.add_argument('--results', default='reanalysis.results.jsonl', help='Archivo de resultados por bloque')
+    parser.add_argument('--limit', type=int, help='Máximo de conversaciones a procesar')
+
+    args = parser.parse_args()
+
+    print_header("Bulk Conversation Re-analysis")
+
+    if not acquire_data_lock("reanalyze"):
+        print_error(f"Data files are in use by {lock_owner()}; stop the server before re-analyzing")
+        sys.exit(2)
+
+    done = load_checkpoint(args.checkpoint)
+    if done:
+        print_info(f"Resuming: {len(done)} conversations already processed ({args.checkpoint})")
+
+    source = iter_archive_conversations(args.input) if args.input else iter_memory_conversations(args.all)
+    pending = (c for c in source if c.get('session_id') and c['session_id'] not in done)
+    if args.limit:
+        pending = islice(pending, args.limit)
+
+    if args.pool == 'process':
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_process_worker)
+    else:
+        executor = ThreadPoolExecutor(max_workers=args.workers)
+
+    started = time.monotonic()
+    processed = errors = 0
+    buffer: List[Dict[str, Any]] = []
+
+    try:
+        with executor:
+            # Submit a bounded window of chunks so huge inputs are streamed, not materialized
+            window = args.workers * 2
+            chunks = chunked(pending, BATCH_MAX_DOCUMENTS)
+            futures = [executor.submit(analyze_chunk, chunk) for chunk in islice(chunks, window)]
+            while futures:
+                results = futures.pop(0).result()
+                next_chunk = next(chunks, None)
+                if next_chunk:
+                    futures.append(executor.submit(analyze_chunk, next_chunk))
+
+                for result in results:
+                    processed += 1
+                    if 'error' in result:
+                        errors += 1
+                        print_error(f"{result.get('session_id')}: {result['error']}")
+                    else:
+                        buffer.append(result)
+
+                if len(buffer) >= args.flush_every:
+                    flush(buffer, args.checkpoint, args.results)
+                    buffer = []
+                    elapsed = time.monotonic() - started
+                    print_info(f"{processed} conversations, {processed / elapsed:.1f} sessions/s, {errors} errors")
+    except KeyboardInterrupt:
+        print_warning("Interrupted - writing completed results; rerun to resume from the checkpoint")
+    finally:
+        flush(buffer, args.checkpoint, args.results)
+        merge(args.results, not args.input)
+
+    elapsed = max(time.monotonic() - started, 1e-9)
+    print_success(f"Processed {processed} conversations in {elapsed:.1f}s ({processed / elapsed:.1f} sessions/s), {errors} errors")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
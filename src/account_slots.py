@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+Extracción local de datos para apertura de cuenta.
+
+Los clientes entregan sus datos (nombre, documento, fecha de nacimiento,
+dirección, teléfono, correo) a lo largo de varios mensajes. Este módulo
+mantiene un almacén de slots por sesión y los llena con expresiones regulares
+precompiladas (correo, teléfono y cédula de Panamá, fechas), de modo que el
+agente solo tenga que pedir los datos faltantes y pueda crear el caso en el
+CRM sin otra llamada al modelo cuando el formulario está completo.
+"""
+import re
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, List, Optional, Set, Tuple
+
+# Campos de la herramienta abrir_cuenta, en el orden en que se piden
+REQUIRED_FIELDS = (
+    "nombre",
+    "documento_identidad",
+    "fecha_nacimiento",
+    "direccion_residencia",
+    "telefono",
+    "correo_electronico",
+)
+OPTIONAL_FIELDS = ("comprobante_ingresos", "registro_mercantil")
+
+FIELD_LABELS = {
+    "nombre": "nombre completo",
+    "documento_identidad": "documento de identidad (cédula o pasaporte)",
+    "fecha_nacimiento": "fecha de nacimiento",
+    "direccion_residencia": "dirección de residencia",
+    "telefono": "teléfono",
+    "correo_electronico": "correo electrónico",
+    "comprobante_ingresos": "comprobante de ingresos",
+    "registro_mercantil": "registro mercantil",
+}
+
+# Abreviaturas de direcciones y tratamientos: su punto no termina el valor ("Ave. Balboa")
+_ABBREVIATIONS = (
+    "Av", "Ave", "Avda", "Blvd", "Bo", "Cl", "Corr", "Dist", "Dr", "Ed", "Edif", "Apto", "Apt",
+    "No", "Nro", "Num", "Núm", "Prov", "Res", "Sr", "Sra", "Sta", "Sto", "Urb",
+)
+# ... ni el de una inicial ("P.H. Torre Mar")
+_NOT_ABBREVIATION = "".join(rf"(?<!\b{abbreviation})" for abbreviation in _ABBREVIATIONS) + r"(?<!\b[A-Za-z])"
+# Fin de un valor libre: coma seguida de otro dato, punto seguido de una oración nueva
+# (espacio y mayúscula) o al final del texto, punto y coma o fin de línea
+_VALUE_END = (
+    r"(?=,\s*(?:y\s+)?(?:mi|tu|el|la|tel[eé]fono|celular|correo|email|fecha|documento|c[eé]dula|pasaporte|direcci[oó]n|comprobante|registro)\b"
+    r"|" + _NOT_ABBREVIATION + r"\.(?:\s+[A-ZÁÉÍÓÚÑ]|\s*$)|[;\n]|$)"
+)
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+# Cédula panameña: 8-123-456, 8-AV-12-345, PE-12-345, E-8-123456, N-19-1234
+_CEDULA_RE = re.compile(
+    r"\b(?:(?:1[0-3]|[1-9])(?:-?(?:AV|PI))?|PE|E|N)-\d{1,4}-\d{1,6}\b",
+    re.IGNORECASE,
+)
+_DOCUMENT_LABELED_RE = re.compile(
+    r"(?:documento(?:\s+de\s+identidad)?|c[eé]dula|pasaporte)(?:\s+es)?\s*:?\s*((?=[A-Z-]*\d)[A-Z0-9][A-Z0-9-]{4,})",
+    re.IGNORECASE,
+)
+# Celular (6xxx-xxxx) con prefijo +507 opcional
+_MOBILE_RE = re.compile(r"(?:\+?507[\s-]?)?\b(6\d{3})[\s-]?(\d{4})\b")
+# Con etiqueta también se aceptan teléfonos fijos de 7 dígitos
+_PHONE_LABELED_RE = re.compile(
+    r"(?:tel[eé]fono|celular|m[oó]vil|n[uú]mero(?:\s+de\s+(?:tel[eé]fono|contacto))?)(?:\s+es)?\s*:?\s*"
+    r"((?:\+?507[\s-]?)?\d{3,4}[\s-]?\d{4})\b",
+    re.IGNORECASE,
+)
+_EMAIL_LABELED_RE = re.compile(r"(?:correo|e-?mail)", re.IGNORECASE)
+_BIRTH_DATE_LABELED_RE = re.compile(r"nac[ií]|nacimiento", re.IGNORECASE)
+_DATE_NUMERIC_RE = re.compile(r"\b(\d{1,2})[/-](\d{1,2})[/-](\d{4})\b|\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+_DATE_TEXT_RE = re.compile(
+    r"\b(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre)\s+(?:de(?:l)?\s+)?(\d{4})\b",
+    re.IGNORECASE,
+)
+_MONTHS = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7, "agosto": 8,
+    "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+_NAME_RE = re.compile(
+    r"(?:mi\s+nombre(?:\s+completo)?\s+es|me\s+llamo|nombre(?:\s+completo)?\s*:)\s*:?\s*([^\d,.;:\n]+)",
+    re.IGNORECASE,
+)
+_NAME_STOP_RE = re.compile(r"\s+(?:y|mi|con|vivo|tengo|nac[ií]|soy|quiero|para)\b.*$", re.IGNORECASE)
+# Partículas de apellidos compuestos ("de la Cruz"); no cuentan para el máximo de palabras
+_NAME_PARTICLES = {"de", "del", "la", "las", "los", "san", "da", "van", "von"}
+_NAME_MAX_WORDS = 8
+_ADDRESS_RE = re.compile(
+    r"(?:direcci[oó]n(?:\s+de\s+residencia)?(?:\s+es)?\s*:?|vivo\s+en|resido\s+en)\s*(.+?)" + _VALUE_END,
+    re.IGNORECASE,
+)
+_INCOME_RE = re.compile(r"comprobante\s+de\s+ingresos(?:\s+es)?\s*:?\s*(.+?)" + _VALUE_END, re.IGNORECASE)
+_REGISTRY_RE = re.compile(r"registro\s+mercantil(?:\s+es)?\s*:?\s*(.+?)" + _VALUE_END, re.IGNORECASE)
+
+_ACCOUNT_OPENING_RE = re.compile(
+    r"\b(?:abrir|crear|solicitar|registrar|aperturar|quiero|necesito)\s+(?:una\s+)?(?:nueva\s+)?cuenta\b|\bcuenta\s+nueva\b|\bnueva\s+cuenta\b|\bapertura\s+de\s+cuenta\b",
+    re.IGNORECASE,
+)
+
+
+def _numeric_date(match: re.Match) -> Optional[date]:
+    if match.group(3):
+        day, month, year = int(match.group(1)), int(match.group(2)), int(match.group(3))
+    else:
+        year, month, day = int(match.group(4)), int(match.group(5)), int(match.group(6))
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _birth_date(text: str) -> Optional[re.Match]:
+    """Primera fecha del texto con un año de nacimiento plausible."""
+    today = date.today()
+    candidates = [(match, _numeric_date(match)) for match in _DATE_NUMERIC_RE.finditer(text)]
+    for match in _DATE_TEXT_RE.finditer(text):
+        try:
+            parsed = date(int(match.group(3)), _MONTHS[match.group(2).lower()], int(match.group(1)))
+        except ValueError:
+            parsed = None
+        candidates.append((match, parsed))
+
+    candidates.sort(key=lambda candidate: candidate[0].start())
+    for match, parsed in candidates:
+        if parsed and 1900 <= parsed.year <= today.year - 16:
+            return match
+    return None
+
+
+def _looks_like_date(value: str) -> bool:
+    """Indica si una cédula sin etiqueta es en realidad una fecha (12-05-1990, 3-10-2020)."""
+    match = _DATE_NUMERIC_RE.fullmatch(value)
+    parsed = _numeric_date(match) if match else None
+    return parsed is not None and 1900 <= parsed.year <= 2100
+
+
+def _unlabeled_cedula(text: str, birth_date: Optional[re.Match]) -> Optional[str]:
+    """Primera cédula del texto que no sea una fecha ni se superponga a la fecha de nacimiento."""
+    for match in _CEDULA_RE.finditer(text):
+        if _looks_like_date(match.group(0)):
+            continue
+        if birth_date and match.start() < birth_date.end() and birth_date.start() < match.end():
+            continue
+        return match.group(0).upper()
+    return None
+
+
+def _extract_slots(text: str) -> Tuple[Dict[str, str], Set[str]]:
+    """Slots del mensaje y cuáles vinieron con etiqueta ("mi cédula es ...")."""
+    slots: Dict[str, str] = {}
+    labeled: Set[str] = set()
+    if not text:
+        return slots, labeled
+
+    email = _EMAIL_RE.search(text)
+    if email:
+        slots["correo_electronico"] = email.group(0)
+        if _EMAIL_LABELED_RE.search(text[:email.start()]):
+            labeled.add("correo_electronico")
+
+    birth_date = _birth_date(text)
+    if birth_date:
+        slots["fecha_nacimiento"] = birth_date.group(0)
+        if _BIRTH_DATE_LABELED_RE.search(text):
+            labeled.add("fecha_nacimiento")
+
+    document_labeled = _DOCUMENT_LABELED_RE.search(text)
+    if document_labeled:
+        slots["documento_identidad"] = document_labeled.group(1).upper()
+        labeled.add("documento_identidad")
+    else:
+        document = _unlabeled_cedula(text, birth_date)
+        if document:
+            slots["documento_identidad"] = document
+
+    phone = _PHONE_LABELED_RE.search(text)
+    if phone:
+        slots["telefono"] = phone.group(1)
+        labeled.add("telefono")
+    else:
+        mobile = _MOBILE_RE.search(text)
+        if mobile and mobile.group(0) != slots.get("documento_identidad"):
+            slots["telefono"] = f"{mobile.group(1)}-{mobile.group(2)}"
+
+    name = _NAME_RE.search(text)
+    if name:
+        value = _NAME_STOP_RE.sub("", name.group(1)).strip()
+        words, counted = [], 0
+        for word in value.split():
+            # Un texto más largo que un nombre se recorta en vez de descartarse
+            if word.lower() not in _NAME_PARTICLES:
+                counted += 1
+                if counted > _NAME_MAX_WORDS:
+                    break
+            words.append(word)
+        while words and words[-1].lower() in _NAME_PARTICLES:
+            words.pop()
+        if words:
+            slots["nombre"] = " ".join(words)
+            labeled.add("nombre")
+
+    for field, pattern in (("direccion_residencia", _ADDRESS_RE),
+                           ("comprobante_ingresos", _INCOME_RE),
+                           ("registro_mercantil", _REGISTRY_RE)):
+        match = pattern.search(text)
+        if match and match.group(1).strip():
+            slots[field] = match.group(1).strip()
+            labeled.add(field)
+
+    return slots, labeled
+
+
+def extract_slots(text: str) -> Dict[str, str]:
+    """Extrae los datos de apertura de cuenta presentes en un mensaje."""
+    return _extract_slots(text)[0]
+
+
+def is_account_opening_intent(text: str) -> bool:
+    """Detecta si el mensaje expresa la intención de abrir una cuenta."""
+    return bool(_ACCOUNT_OPENING_RE.search(text or ""))
+
+
+class AccountSlotStore:
+    """Slots de apertura de cuenta por sesión."""
+
+    def __init__(self, max_sessions: int = 10000):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        # session_id -> {"active": bool, "slots": {...}}
+        self._sessions: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def update(self, session_id: str, text: str) -> Dict:
+        """Extrae datos del mensaje y los agrega a la sesión; devuelve el estado actualizado.
+
+        Un dato sin etiqueta (una cédula o un correo sueltos) solo se guarda
+        con una apertura en curso ("quiero transferir 8-123-4567 balboas" no es
+        una cédula) y no reemplaza al que ya estaba registrado; uno con
+        etiqueta ("mi correo es ...") sí.
+        """
+        extracted, labeled = _extract_slots(text)
+        intent = is_account_opening_intent(text)
+        with self._lock:
+            state = self._sessions.get(session_id)
+            active = intent or bool(state and state["active"])
+            if not active:
+                extracted = {field: value for field, value in extracted.items() if field in labeled}
+            if state is None:
+                if not extracted and not intent:
+                    return {"active": False, "slots": {}}
+                state = {"active": False, "slots": {}}
+                self._sessions[session_id] = state
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            state["active"] = active
+            for field, value in extracted.items():
+                if field in labeled or not state["slots"].get(field):
+                    state["slots"][field] = value
+            return {"active": state["active"], "slots": dict(state["slots"])}
+
+    def get(self, session_id: str) -> Dict:
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                return {"active": False, "slots": {}}
+            return {"active": state["active"], "slots": dict(state["slots"])}
+
+    def clear(self, session_id: str):
+        """Olvida los datos de la sesión (p. ej. después de crear el caso)."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    @staticmethod
+    def missing_fields(slots: Dict[str, str]) -> List[str]:
+        return [field for field in REQUIRED_FIELDS if not slots.get(field)]
+
+    @staticmethod
+    def missing_fields_prompt(slots: Dict[str, str]) -> str:
+        """Bloque corto para el prompt con solo los datos que faltan."""
+        missing = AccountSlotStore.missing_fields(slots)
+        if not missing:
+            return ""
+        labels = ", ".join(FIELD_LABELS[field] for field in missing)
+        return (
+            "APERTURA DE CUENTA EN CURSO:\n"
+            f"- Datos que faltan: {labels}\n"
+            "- Pide solo estos datos; los demás ya fueron registrados"
+        )
+
+
+# Instancia global de slots
+slot_store = AccountSlotStore()
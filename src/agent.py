@@ -2,30 +2,95 @@
 """
 Agente minimalista inspirado en `mini/telegram-assistant/src/agents`.
 
-- Intenta resolver por intents de Lex.
-- Si no hay intent o falla, hace fallback a Bedrock (LLM).
+- Intenta resolver con el router local de intents (plantillas de FAQ y saludos).
+- Si no hay intent con confianza suficiente, hace fallback a Bedrock (LLM).
 """
 from __future__ import annotations
 
 import json
 import os
 import re
-from typing import Any, Dict, List, Optional
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
 
-import boto3
+from .aws_clients import aws_clients
 from .memory import memory
-from .context_loader import load_banesco_context, get_product_recommendations
-from .faq_loader import get_faq_text
+from .conversation_summarizer import conversation_summarizer
+from .context_loader import load_banesco_context, load_banesco_products, get_product_recommendations
 from .comprehend_analyzer import comprehend_analyzer
 from .timer_manager import timer_manager
+from .analytics_rollups import rollups
+from .account_slots import slot_store, AccountSlotStore
+from .intent_router import intent_router
+from .response_cache import response_cache
+from .stage_timer import stage_timer
+from .metrics import metrics
+from .config import CONFIG
+from .prompt_builder import PromptBuilder, HISTORY_MESSAGES, CACHE_POINT_BLOCK, supports_prompt_caching
+from .prompt_planner import PromptPlanner, estimate_tokens
+from .model_router import model_router, ModelRouter, RouteDecision
+from .hedging import bedrock_hedger
+from .inference_profiles import select_profile, inference_config, TOOL_CALLS_STOP
+from .resilience import bedrock_caller, Deadline, DeadlineExceeded, CircuitOpenError, ResilienceError, error_code
+from .tools import ToolRegistry, ACCOUNT_OPENING_SCHEMA, CASE_STATUS_SCHEMA, supports_native_tools
+
+# Confianza mínima del router de intents para responder con plantilla en modo degradado
+DEGRADED_MIN_CONFIDENCE = 0.4
+DEGRADED_MESSAGE = (
+    "En este momento no puedo procesar tu consulta por una alta demanda. "
+    "Por favor intenta de nuevo en unos minutos o comunícate con un representante de Banesco."
+)
 
 
 class Agent:
     """Agente principal del MVP."""
 
     def __init__(self, bedrock_client=None):
-        self.bedrock = bedrock_client or boto3.client('bedrock-runtime', region_name='us-east-1')
+        # Sin cliente explícito se usa el de la fábrica compartida, creado al primer uso
+        self._bedrock_client = bedrock_client
         self.context = load_banesco_context()
+        self.prompts = PromptBuilder(self.context, load_banesco_products())
+        self.tools = ToolRegistry()
+        self.tools.register(
+            'abrir_cuenta',
+            'Procesa una solicitud de apertura de cuenta cuando el cliente proporcionó todos sus datos',
+            ACCOUNT_OPENING_SCHEMA,
+            self._handle_account_opening,
+            # El handler ya devuelve el texto final para el cliente
+            terminal=True,
+            # Crea el caso en el CRM: se espera aunque el turno se pase del deadline
+            side_effects=True,
+        )
+        self.tools.register(
+            'consultar_caso',
+            'Consulta el estado de un caso o solicitud existente por su número de caso',
+            CASE_STATUS_SCHEMA,
+            self._handle_case_status,
+        )
+        # Latencias recientes de converse (s), para estimar el ahorro de las respuestas terminales
+        self._converse_latencies = deque(maxlen=100)
+        self.stats = {
+            "messages": 0,
+            "fast_path_responses": 0,
+            "terminal_tool_responses": 0,
+            "estimated_latency_saved_ms": 0.0,
+            "slot_direct_cases": 0,
+            "degraded_responses": 0,
+            "input_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "cache_write_input_tokens": 0,
+            "output_tokens": 0,
+        }
+        # Llamadas y tokens generados por perfil de inferencia
+        self._profile_stats: Dict[str, Dict[str, int]] = {}
+        # Modelos que rechazaron toolConfig; usan el formato <tool_calls> como respaldo
+        self._models_without_tools = set()
+
+    @property
+    def bedrock(self):
+        """Cliente de Bedrock Runtime."""
+        return self._bedrock_client or aws_clients.bedrock()
 
     def _extract_tool_calls(self, message: str) -> List[Dict[str, Any]]:
         """Extrae tool calls del mensaje usando regex."""
@@ -57,31 +122,16 @@ class Agent:
         
         return tool_calls
 
-    def _process_tool_calls(self, tool_calls: List[Dict[str, Any]], session_id: str) -> str:
-        """Procesa las tool calls extraídas."""
-        if not tool_calls:
-            return ""
-        
-        results = []
-        for tool_call in tool_calls:
-            tool_name = tool_call.get('name', '')
-            arguments = tool_call.get('arguments', {})
-            
-            if tool_name == 'abrir_cuenta':
-                # Procesar apertura de cuenta
-                result = self._handle_account_opening(arguments, session_id)
-                results.append(result)
-            else:
-                results.append(f"Tool call '{tool_name}' no reconocida")
-        
-        return "\n".join(results)
-
     def _handle_account_opening(self, arguments: Dict[str, Any], session_id: str) -> str:
         """Maneja la apertura de cuenta con los datos proporcionados."""
         try:
             # Importar aquí para evitar dependencias circulares
             from .crm_adapter import create_case
             
+            # Los datos ya capturados en la sesión completan los que el modelo no repitió
+            captured = slot_store.get(session_id)["slots"]
+            arguments = {**captured, **{key: value for key, value in (arguments or {}).items() if value}}
+            
             crm_data = {
                 'customer_name': arguments.get('nombre', '') or '',
                 'document_id': arguments.get('documento_identidad', '') or '',
@@ -98,8 +148,10 @@ class Agent:
             
             # Crear caso en CRM
             crm_result = create_case(crm_data)
+            slot_store.clear(session_id)
             
             if crm_result.get('id'):
+                rollups.record_crm_case()
                 return f"✅ ¡Perfecto! He creado tu solicitud de apertura de cuenta. Número de caso: {crm_result['id']}. Un representante se pondrá en contacto contigo pronto."
             else:
                 return "⚠️ He registrado tu solicitud, pero hubo un problema al crear el caso en el sistema. Un representante se pondrá en contacto contigo."
@@ -108,26 +160,55 @@ class Agent:
             print(f"[Agent] Error procesando apertura de cuenta: {e}")
             return "⚠️ He registrado tu solicitud, pero hubo un problema técnico. Un representante se pondrá en contacto contigo."
 
+    def _handle_case_status(self, arguments: Dict[str, Any], session_id: str) -> str:
+        """Consulta el estado de un caso en el CRM (sin exponer datos personales)."""
+        from .crm_adapter import get_case
+        
+        case_id = str(arguments.get('numero_caso', '') or '').strip()
+        if not case_id:
+            return "No se indicó un número de caso."
+        
+        case = get_case(case_id)
+        if not case:
+            return f"No se encontró el caso {case_id}."
+        
+        return f"Caso {case_id}: {case.get('tipo', '')}, estado '{case.get('estado', '')}', creado el {case.get('fecha_creacion', '')}."
+
     def handle_message(self, event: Dict[str, Any]) -> Dict[str, Any]:
         """Procesa un mensaje del usuario con agent loop.
 
         event debe incluir:
         - `text`: texto del usuario
         - Opcional: `session_id`, `bedrock_model_id`
+
+        La respuesta incluye `timings_ms`, los milisegundos de cada etapa del turno.
         """
+        stage_timer.begin()
+        started = time.perf_counter()
+        response_data = self._handle_message(event)
+        response_data["timings_ms"] = stage_timer.end()
+        source = response_data.get("source", "unknown")
+        metrics.inc("turns_total", source=source)
+        metrics.observe("turn_seconds", time.perf_counter() - started, source=source)
+        return response_data
+
+    def _handle_message(self, event: Dict[str, Any]) -> Dict[str, Any]:
         text = (event or {}).get("text") or ""
         session_id = (event or {}).get("session_id") or "banon"
+        self.stats["messages"] += 1
 
         # Real-time sentiment analysis for user message
         sentiment_data = None
         if not os.getenv('MOCK_MODE') and text.strip():
             try:
-                sentiment_data = comprehend_analyzer.analyze_user_sentiment(text)
+                with stage_timer.stage("sentiment"):
+                    sentiment_data = comprehend_analyzer.analyze_user_sentiment(text)
                 # Imprimir análisis en amarillo
                 from .colors import print_warning
                 print_warning(f"🧠 Sentiment Analysis: {sentiment_data['sentiment']} (confidence: {sentiment_data['confidence']:.2f})")
             except Exception as e:
                 print(f"[Agent] Error analyzing sentiment: {e}")
+                metrics.inc("errors_total", component="sentiment")
                 sentiment_data = {
                     "sentiment": "NEUTRAL",
                     "confidence": 0.5,
@@ -137,6 +218,20 @@ class Agent:
         # Start/restart timer for inactivity analysis
         timer_manager.start_timer(session_id)
 
+        # Extraer localmente datos de apertura de cuenta; con el formulario completo
+        # se crea el caso directamente, sin llamar al modelo
+        with stage_timer.stage("slots"):
+            slot_state = slot_store.update(session_id, text)
+        if slot_state["active"] and not AccountSlotStore.missing_fields(slot_state["slots"]):
+            return self._complete_account_opening(text, session_id, slot_state["slots"], sentiment_data)
+
+        # Intents frecuentes con plantilla; no durante una apertura de cuenta ni con clientes molestos
+        if self._can_use_fast_path(slot_state, sentiment_data):
+            with stage_timer.stage("intent_router"):
+                routed = intent_router.route(text)
+            if routed:
+                return self._fast_path_response(text, session_id, routed, sentiment_data)
+
         # Usar Bedrock si está disponible
         if not os.getenv('MOCK_MODE'):
             return self._agent_loop(text, session_id, event, sentiment_data=sentiment_data)
@@ -154,103 +249,256 @@ class Agent:
             
             return mock_response
 
-    def _agent_loop(self, initial_text: str, session_id: str, event: Dict[str, Any], max_iterations: int = 5, sentiment_data: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Loop principal del agente que procesa tool calls iterativamente."""
-        model_id = event.get("bedrock_model_id") or "ai21.jamba-1-5-large-v1:0"
+    def _complete_account_opening(self, text: str, session_id: str, slots: Dict[str, str], sentiment_data: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Crea el caso de apertura con los slots extraídos localmente."""
+        print(f"📝 [Agent] Datos de apertura completos para {session_id}, creando caso sin LLM")
+        with stage_timer.stage("tools"):
+            (result, _), = self.tools.execute_many([('abrir_cuenta', slots)], session_id)
+        self.stats["slot_direct_cases"] += 1
         
-        # Obtener contexto de conversación
-        conversation_context = memory.get_context_summary(session_id)
+        with stage_timer.stage("memory_write"):
+            memory.add_message(session_id, text, result, "slots")
         
-        # Generar recomendaciones de productos
-        product_recommendations = get_product_recommendations(initial_text, self.context)
-        
-        # Generar texto de FAQ
-        faq_text = get_faq_text()
-        print(f"[Agent] FAQ text: {faq_text}")
-        
-        # Construir prompt del sistema con contexto
-        system_prompt = f"""Eres un asistente bancario de Banesco Panamá. Eres amigable, profesional y experto en productos bancarios.
-
-{self.context}
-
-{conversation_context}
-
-Esta es una lista de preguntas frecuentes que puedes usar para responder las consultas del usuario, las preguntas no tienen que ser necesariamente las mismas que las preguntas frecuentes, puedes usar las preguntas frecuentes como base para tu respuesta.
-
-
-{faq_text}
-
-Instrucciones:
-- Responde en español de manera clara y útil
-- Usa la información de productos proporcionada para dar respuestas precisas
-- Si el usuario pregunta sobre productos específicos, proporciona detalles de requisitos, beneficios y tarifas
-- Usa las preguntas frecuentes (FAQ) proporcionadas para responder consultas comunes
-- Si encuentras una FAQ relevante, úsala como base para tu respuesta
-- Si no tienes información específica, deriva al usuario a un representante
-- Mantén un tono profesional pero amigable
-
-HERRAMIENTAS DISPONIBLES:
-- abrir_cuenta: Para procesar solicitudes de apertura de cuenta
-  Argumentos: nombre, documento_identidad, fecha_nacimiento, direccion_residencia, comprobante_ingresos, registro_mercantil, telefono, correo_electronico
+        response_data = {"source": "slots", "message": result}
+        if sentiment_data:
+            response_data["sentiment_analysis"] = {
+                "sentiment": sentiment_data['sentiment'],
+                "confidence": sentiment_data['confidence'],
+                "scores": sentiment_data['scores']
+            }
+        return response_data
 
-CUANDO USAR HERRAMIENTAS:
-- Si el usuario proporciona TODOS los datos necesarios para abrir una cuenta, usa la herramienta abrir_cuenta
-- Si solo faltan algunos datos, pide los datos faltantes
-- Para otras consultas, responde normalmente sin usar herramientas
+    def _can_use_fast_path(self, slot_state: Dict[str, Any], sentiment_data: Dict[str, Any] = None) -> bool:
+        """Indica si el mensaje puede resolverse con el router local de intents."""
+        if not CONFIG["intent_router_enabled"]:
+            return False
+        if slot_state["active"] or slot_state["slots"]:
+            return False
+        # Un cliente molesto necesita una respuesta redactada, no una plantilla
+        return not (sentiment_data and sentiment_data['sentiment'] == 'NEGATIVE')
 
-FORMATO DE HERRAMIENTAS:
-<tool_calls>
-[{{"name": "abrir_cuenta", "arguments": {{"nombre": "Juan Pérez", "documento_identidad": "123456789", ...}}}}
-]
-</tool_calls>
+    def _fast_path_response(self, text: str, session_id: str, routed: Dict[str, Any], sentiment_data: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Responde con la plantilla del intent, sin llamar al modelo."""
+        print(f"⚡ [Agent] Intent '{routed['intent']}' ({routed['confidence']:.2f}) resuelto sin LLM")
+        self.stats["fast_path_responses"] += 1
+        
+        with stage_timer.stage("memory_write"):
+            memory.add_message(session_id, text, routed["message"], "intent_router")
+        
+        response_data = {
+            "source": "intent_router",
+            "message": routed["message"],
+            "intent": routed["intent"],
+            "confidence": routed["confidence"]
+        }
+        if sentiment_data:
+            response_data["sentiment_analysis"] = {
+                "sentiment": sentiment_data['sentiment'],
+                "confidence": sentiment_data['confidence'],
+                "scores": sentiment_data['scores']
+            }
+        return response_data
 
-{product_recommendations}"""
+    def _agent_loop(self, initial_text: str, session_id: str, event: Dict[str, Any], max_iterations: int = 5,
+                    sentiment_data: Dict[str, Any] = None, route: Optional[RouteDecision] = None,
+                    deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Loop principal del agente que procesa tool calls iterativamente.
+        
+        Todas las llamadas del turno comparten el mismo deadline; si Bedrock no
+        está disponible (breaker abierto, throttling persistente o sin tiempo)
+        se responde en modo degradado con las plantillas locales.
+        """
+        loop_started = time.perf_counter()
+        deadline = deadline or Deadline(CONFIG["bedrock_deadline_seconds"])
+        
+        # Solo preguntas sin contexto de sesión comparten respuestas entre clientes
+        slot_state = slot_store.get(session_id)
+        use_cache = (
+            CONFIG["response_cache_enabled"]
+            and not memory.has_history(session_id)
+            and not slot_state["active"]
+            and not slot_state["slots"]
+        )
+        if use_cache:
+            with stage_timer.stage("cache"):
+                cached = response_cache.lookup(initial_text)
+            metrics.inc("cache_lookups_total", cache="response", result="hit" if cached else "miss")
+            if cached:
+                return self._cached_response(initial_text, session_id, cached, sentiment_data)
+        
+        # Resumen acumulado y mensajes recientes que aún no forman parte de él
+        with stage_timer.stage("memory_read"):
+            summary = memory.get_summary(session_id)
+            history = memory.get_unsummarized_messages(session_id, HISTORY_MESSAGES)
+        
+        # Complejidad del turno: elige el modelo (si no se pidió uno) y el perfil de inferencia
+        features = self._turn_features(initial_text, slot_state, history, summary)
+        model_id = event.get("bedrock_model_id")
+        if not model_id:
+            if route is None and CONFIG["model_router_enabled"]:
+                route = model_router.route(features)
+                print(f"🧭 [Agent] Nivel '{route.tier}' → {route.model_id} ({route.reason})")
+            model_id = route.model_id if route else CONFIG["bedrock_model_id"]
+        
+        # Recomendaciones, prompt del sistema y mensajes del turno
+        with stage_timer.stage("prompt_build"):
+            # Generar recomendaciones de productos
+            product_recommendations = get_product_recommendations(initial_text, self.context)
+        
+            # Solo la lista de datos faltantes si hay una apertura de cuenta en curso
+            account_opening_status = AccountSlotStore.missing_fields_prompt(slot_state["slots"]) if slot_state["active"] else ""
+        
+            native_tools = supports_native_tools(model_id) and model_id not in self._models_without_tools
+        
+            # Prompt del sistema: prefijo estático (persona, catálogo, FAQ, herramientas),
+            # cachePoint si el modelo lo soporta y el resumen de la sesión, todo dentro
+            # del presupuesto de tokens de entrada
+            plan = self.prompts.build(
+                model_id,
+                self._tool_instructions(native_tools),
+                initial_text,
+                history,
+                account_opening_status,
+                product_recommendations,
+                summary,
+            )
+            system_blocks = plan["system"]
+            print(f"🧱 [Agent] Bloques del sistema: {PromptBuilder.layout(system_blocks)}")
+            print(f"📏 [Agent] Tokens estimados por sección: {PromptPlanner.format_report(plan['report'])}")
 
-        # Inicializar mensajes de conversación
-        messages = [
-            {
-                "role": "user",
-                "content": [{"text": initial_text}]
-            }
-        ]
+            # Historial como mensajes de Converse (ya convertidos por la memoria) y el
+            # contexto de este turno junto al mensaje del usuario
+            messages = memory.get_converse_messages(session_id, plan["history_messages"])
+            if messages and supports_prompt_caching(model_id):
+                # El historial de este turno es el prefijo del siguiente
+                messages[-1] = {"role": messages[-1]["role"], "content": messages[-1]["content"] + [CACHE_POINT_BLOCK]}
+            user_content = [{"text": initial_text}]
+            if plan["turn_context"]:
+                user_content.append({"text": f"Contexto para esta respuesta:\n{plan['turn_context']}"})
+            messages.append({"role": "user", "content": user_content})
         
         iteration = 0
         final_response = ""
+        failed = False
+        degraded = False
+        # Resultados de herramientas del turno, para el modo degradado
+        tool_results: List[str] = []
+        after_tool_results = False
         
         while iteration < max_iterations:
             iteration += 1
             print(f"🔄 [Agent] Iteración {iteration}")
             
             try:
-                # Llamar a Bedrock
-                resp = self.bedrock.converse(
-                    modelId=model_id,
-                    messages=messages,
-                    system=[{"text": system_prompt}],
-                    inferenceConfig={
-                        "maxTokens": 512,
-                        "temperature": 0.7,
-                        "topP": 0.9
-                    }
+                # Llamar a Bedrock con el perfil de inferencia del turno
+                profile = select_profile(
+                    features["intent"], features["intent_confidence"], features["tool_likely"], after_tool_results
                 )
+                request = {
+                    "modelId": model_id,
+                    "messages": messages,
+                    "system": system_blocks,
+                    "inferenceConfig": inference_config(profile, native_tools)
+                }
+                if native_tools:
+                    request["toolConfig"] = self.tools.to_tool_config()
                 
-                message = resp["output"]["message"]["content"][0]["text"]
+                call_started = time.perf_counter()
+                try:
+                    with stage_timer.stage("converse"):
+                        resp = bedrock_caller.call(self._breaker_key(model_id), self._converse_call(model_id, request), deadline)
+                except Exception as e:
+                    metrics.inc("converse_errors_total", model=model_id, code=error_code(e))
+                    if native_tools and self._is_tool_use_unsupported(e):
+                        # El modelo no acepta toolConfig: reintentar con el formato <tool_calls>
+                        print(f"⚠️ [Agent] {model_id} no soporta tool use nativo, usando formato <tool_calls>")
+                        self._models_without_tools.add(model_id)
+                        return self._agent_loop(initial_text, session_id, event, max_iterations, sentiment_data, route, deadline)
+                    if not isinstance(e, CircuitOpenError):
+                        model_router.record_call(model_id, time.perf_counter() - call_started, False)
+                    if route is not None and iteration == 1 and route.has_fallback() and not isinstance(e, DeadlineExceeded):
+                        # Aún no se ejecutaron herramientas: el turno pasa al siguiente modelo
+                        print(f"🔀 [Agent] {model_id} falló ({e}), probando {route.candidates[route.attempt + 1]}")
+                        model_router.record_failover()
+                        return self._agent_loop(initial_text, session_id, event, max_iterations, sentiment_data, route.next(), deadline)
+                    raise
+                latency = time.perf_counter() - call_started
+                self._converse_latencies.append(latency)
+                model_router.record_call(model_id, latency, True)
+                metrics.observe("converse_seconds", latency, model=model_id, profile=profile)
+                self._record_usage(resp.get("usage", {}), profile, model_id)
+                
+                output_message = resp["output"]["message"]
+                content = output_message.get("content", [])
+                message = "".join(block["text"] for block in content if "text" in block)
+                if resp.get("stopReason") == "stop_sequence" and "<tool_calls>" in message and TOOL_CALLS_STOP not in message:
+                    # Bedrock no incluye la stop sequence en el texto
+                    message += TOOL_CALLS_STOP
                 print(f"🤖 [Agent] Respuesta: {message[:100]}...")
                 
-                # Extraer tool calls
-                tool_calls = self._extract_tool_calls(message)
+                tool_uses = [block["toolUse"] for block in content if "toolUse" in block]
+                
+                if tool_uses:
+                    # Las respuestas con resultados de herramientas dependen del cliente
+                    use_cache = False
+                    print(f"🔧 [Agent] Tool use nativo: {[tool_use['name'] for tool_use in tool_uses]}")
+                    
+                    # Las herramientas independientes del mismo turno se ejecutan en paralelo
+                    with stage_timer.stage("tools"):
+                        outcomes = self.tools.execute_many(
+                            [(tool_use["name"], tool_use.get("input", {})) for tool_use in tool_uses], session_id,
+                            max_seconds=deadline.remaining(),
+                        )
+                    tool_results = [text for text, _ in outcomes]
+                    
+                    terminal_response = self._terminal_response([t["name"] for t in tool_uses], outcomes, message)
+                    if terminal_response is not None:
+                        final_response = terminal_response
+                        break
+                    
+                    # El mensaje del asistente con los bloques toolUse se devuelve tal cual
+                    messages.append(output_message)
+                    messages.append({
+                        "role": "user",
+                        "content": [
+                            {
+                                "toolResult": {
+                                    "toolUseId": tool_use["toolUseId"],
+                                    "content": [{"text": tool_result}],
+                                    "status": status
+                                }
+                            }
+                            for tool_use, (tool_result, status) in zip(tool_uses, outcomes)
+                        ]
+                    })
+                    after_tool_results = True
+                    
+                    print(f"✅ [Agent] Tool results enviados, continuando loop...")
+                    continue
+                
+                # Extraer tool calls (formato <tool_calls> para modelos sin tool use nativo)
+                tool_calls = [] if native_tools else self._extract_tool_calls(message)
                 
                 if tool_calls:
+                    use_cache = False
                     print(f"🔧 [Agent] Tool calls encontradas: {len(tool_calls)}")
                     
-                    # Procesar tool calls
-                    tool_results = []
-                    for tool_call in tool_calls:
-                        tool_result = self._process_tool_calls([tool_call], session_id)
-                        tool_results.append(tool_result)
+                    # Procesar tool calls en paralelo
+                    with stage_timer.stage("tools"):
+                        outcomes = self.tools.execute_many(
+                            [(tool_call.get('name', ''), tool_call.get('arguments', {})) for tool_call in tool_calls], session_id,
+                            max_seconds=deadline.remaining(),
+                        )
+                    tool_results = [text for text, _ in outcomes]
                     
-                    # Limpiar tool calls del mensaje para mostrar solo el texto
+                    # Texto del modelo sin el bloque <tool_calls>
                     clean_message = re.sub(r'<tool_calls>.*?</tool_calls>', '', message, flags=re.DOTALL).strip()
+                    terminal_response = self._terminal_response(
+                        [tool_call.get('name', '') for tool_call in tool_calls], outcomes, clean_message
+                    )
+                    if terminal_response is not None:
+                        final_response = terminal_response
+                        break
                     
                     # Agregar respuesta del asistente a los mensajes
                     messages.append({
@@ -265,6 +513,7 @@ FORMATO DE HERRAMIENTAS:
                             "content": [{"text": f"Resultado de herramienta {i+1}: {tool_result}"}]
                         })
                     
+                    after_tool_results = True
                     print(f"✅ [Agent] Tool calls procesadas, continuando loop...")
                     
                 else:
@@ -273,22 +522,44 @@ FORMATO DE HERRAMIENTAS:
                     print(f"✅ [Agent] Respuesta final obtenida")
                     break
                     
+            except ResilienceError as e:
+                print(f"🛟 [Agent] Bedrock no disponible ({e}), respondiendo en modo degradado")
+                metrics.inc("errors_total", component="bedrock")
+                use_cache = False
+                failed = True
+                degraded = True
+                final_response = self._degraded_message(initial_text, tool_results)
+                break
             except Exception as e:
                 print(f"❌ [Agent] Error en iteración {iteration}: {e}")
+                metrics.inc("errors_total", component="agent")
+                use_cache = False
+                failed = True
                 final_response = f"Error procesando tu solicitud: {str(e)}"
                 break
         
         if iteration >= max_iterations:
             print(f"⚠️ [Agent] Máximo de iteraciones alcanzado ({max_iterations})")
             final_response = "He procesado tu solicitud pero alcanzé el límite de iteraciones. ¿Hay algo más en lo que pueda ayudarte?"
+        elif use_cache:
+            response_cache.store(initial_text, final_response, time.perf_counter() - loop_started)
+        
+        if route is not None:
+            model_router.log_decision(route, session_id, not failed)
+        
+        source = "degraded" if degraded else "bedrock"
+        if degraded:
+            self.stats["degraded_responses"] += 1
         
         # Guardar en memoria
-        memory.add_message(session_id, initial_text, final_response, "bedrock")
+        with stage_timer.stage("memory_write"):
+            memory.add_message(session_id, initial_text, final_response, source)
         
         # Preparar respuesta con análisis de sentimientos
         response_data = {
-            "source": "bedrock", 
-            "message": final_response
+            "source": source, 
+            "message": final_response,
+            "model_id": model_id
         }
         
         # Incluir análisis de sentimientos si está disponible
@@ -301,6 +572,151 @@ FORMATO DE HERRAMIENTAS:
         
         return response_data
 
+    @staticmethod
+    def _breaker_key(model_id: str) -> str:
+        """Clave del circuit breaker: endpoint (o región) y modelo."""
+        return f"{CONFIG['bedrock_endpoint'] or CONFIG['aws_region']}/{model_id}"
+
+    def _converse_call(self, model_id: str, request: Dict[str, Any]):
+        """Función que llama a converse, con hedging si está activado."""
+        def converse():
+            return self.bedrock.converse(**request)
+        if not CONFIG["bedrock_hedging_enabled"]:
+            return converse
+        
+        secondary = None
+        if CONFIG["bedrock_hedge_endpoint"] or CONFIG["bedrock_hedge_region"]:
+            def secondary():
+                return self._hedge_client().converse(**request)
+        key = self._breaker_key(model_id)
+        return lambda: bedrock_hedger.call(key, converse, secondary)
+
+    @staticmethod
+    def _hedge_client():
+        """Cliente del endpoint/región secundario para hedged requests."""
+        return aws_clients.client("bedrock-runtime", CONFIG["bedrock_hedge_region"], CONFIG["bedrock_hedge_endpoint"])
+
+    def _degraded_message(self, text: str, tool_results: List[str]) -> str:
+        """Respuesta sin modelo: resultados de herramientas ya obtenidos, plantilla del intent o aviso."""
+        if tool_results:
+            return "\n\n".join(tool_results)
+        intent, confidence = intent_router.classify(text)
+        if intent in intent_router.responses and confidence >= DEGRADED_MIN_CONFIDENCE:
+            return intent_router.responses[intent]
+        return DEGRADED_MESSAGE
+
+    def _turn_features(self, text: str, slot_state: Dict[str, Any], history: List[Dict[str, Any]], summary: str) -> Dict[str, Any]:
+        """Features de complejidad del turno (intent, herramientas probables, tamaño del prompt)."""
+        intent, confidence = intent_router.classify(text)
+        features = ModelRouter.turn_features(
+            text, intent, confidence, slot_state, len(history), bool(summary), estimate_tokens(text)
+        )
+        if self._is_account_opening_request(text):
+            features["tool_likely"] = True
+        return features
+
+    def _cached_response(self, text: str, session_id: str, cached: Dict[str, Any], sentiment_data: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Responde con una respuesta del modelo guardada para una pregunta similar."""
+        print(f"💾 [Agent] Respuesta en caché (similitud {cached['similarity']:.2f}) para: {cached['question'][:60]}")
+        
+        with stage_timer.stage("memory_write"):
+            memory.add_message(session_id, text, cached["message"], "cache")
+        
+        response_data = {"source": "cache", "message": cached["message"]}
+        if sentiment_data:
+            response_data["sentiment_analysis"] = {
+                "sentiment": sentiment_data['sentiment'],
+                "confidence": sentiment_data['confidence'],
+                "scores": sentiment_data['scores']
+            }
+        return response_data
+
+    def _terminal_response(self, tool_names: List[str], outcomes: List[Tuple[str, str]], model_text: str) -> Optional[str]:
+        """Respuesta final si todas las herramientas ejecutadas son terminales y terminaron bien.
+        
+        Evita una segunda llamada al modelo solo para redactar la confirmación.
+        """
+        tools = [self.tools.get(name) for name in tool_names]
+        if not tools or not all(tool is not None and tool.terminal for tool in tools):
+            return None
+        if any(status != "success" for _, status in outcomes):
+            return None
+        
+        parts = [text for text, _ in outcomes]
+        if model_text and all(tool.merge_model_text for tool in tools):
+            parts.insert(0, model_text)
+        
+        saved_ms = 0.0
+        if self._converse_latencies:
+            saved_ms = 1000 * sum(self._converse_latencies) / len(self._converse_latencies)
+        self.stats["terminal_tool_responses"] += 1
+        self.stats["estimated_latency_saved_ms"] += saved_ms
+        print(f"⏱️ [Agent] Resultado terminal de {', '.join(tool_names)}: se omite la llamada de confirmación (~{saved_ms:.0f} ms ahorrados)")
+        
+        return "\n\n".join(part for part in parts if part)
+
+    def _record_usage(self, usage: Dict[str, Any], profile: str, model_id: str):
+        """Acumula tokens de entrada y salida y lecturas/escrituras de la caché de prompts."""
+        profile_stats = self._profile_stats.setdefault(profile, {"calls": 0, "output_tokens": 0})
+        profile_stats["calls"] += 1
+        profile_stats["output_tokens"] += usage.get("outputTokens", 0)
+        self.stats["output_tokens"] += usage.get("outputTokens", 0)
+        self.stats["input_tokens"] += usage.get("inputTokens", 0)
+        self.stats["cache_read_input_tokens"] += usage.get("cacheReadInputTokens", 0)
+        self.stats["cache_write_input_tokens"] += usage.get("cacheWriteInputTokens", 0)
+        for kind, key in (("input", "inputTokens"), ("output", "outputTokens"),
+                          ("cache_read", "cacheReadInputTokens"), ("cache_write", "cacheWriteInputTokens")):
+            if usage.get(key):
+                metrics.inc("tokens_total", usage[key], model=model_id, type=kind)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estadísticas del agente."""
+        stats = dict(self.stats)
+        stats["fast_path_ratio"] = self.stats["fast_path_responses"] / self.stats["messages"] if self.stats["messages"] else 0.0
+        stats["intent_router"] = intent_router.get_stats()
+        stats["response_cache"] = response_cache.get_stats()
+        stats["prompt"] = self.prompts.get_stats()
+        stats["summaries"] = conversation_summarizer.get_stats()
+        stats["model_router"] = model_router.get_stats()
+        stats["resilience"] = bedrock_caller.get_stats()
+        stats["inference_profiles"] = {
+            name: dict(entry, avg_output_tokens=entry["output_tokens"] / entry["calls"])
+            for name, entry in self._profile_stats.items()
+        }
+        if CONFIG["bedrock_hedging_enabled"]:
+            stats["hedging"] = bedrock_hedger.get_stats()
+        if self._converse_latencies:
+            stats["avg_converse_latency_ms"] = 1000 * sum(self._converse_latencies) / len(self._converse_latencies)
+        return stats
+
+    def _tool_instructions(self, native_tools: bool) -> str:
+        """Instrucciones de herramientas para el prompt del sistema."""
+        instructions = """CUANDO USAR HERRAMIENTAS:
+- Si el usuario proporciona TODOS los datos necesarios para abrir una cuenta, usa la herramienta abrir_cuenta
+- Si solo faltan algunos datos, pide los datos faltantes
+- Si el usuario pregunta por el estado de una solicitud y da su número de caso, usa la herramienta consultar_caso
+- Para otras consultas, responde normalmente sin usar herramientas"""
+        if native_tools:
+            # Las herramientas y sus argumentos viajan en toolConfig
+            return instructions
+        
+        return f"""{self.tools.prompt_description()}
+
+{instructions}
+
+FORMATO DE HERRAMIENTAS:
+<tool_calls>
+[{{"name": "abrir_cuenta", "arguments": {{"nombre": "Juan Pérez", "documento_identidad": "123456789", ...}}}}
+]
+</tool_calls>"""
+
+    @staticmethod
+    def _is_tool_use_unsupported(error: Exception) -> bool:
+        """Detecta el ValidationException de Bedrock para modelos sin tool use."""
+        code = getattr(error, "response", {}).get("Error", {}).get("Code", "")
+        text = str(error).lower()
+        return code == "ValidationException" and "tool" in text and ("support" in text or "not allowed" in text)
+
     def _is_account_opening_request(self, text: str) -> bool:
         """Detecta si el usuario quiere abrir una cuenta."""
         text_lower = text.lower()
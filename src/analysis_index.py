@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Inverted index over stored conversation analyses.
+
+Maps entity/key-phrase terms, entity types, sentiment, insights and day
+buckets to the sessions that contain them, so supervisors can search
+analyses without scanning `comprehend_analysis.json`. Day buckets use the
+conversation's last message (falling back to the analysis time), so a late
+or bulk re-analysis keeps old conversations on the day they happened.
+"""
+import heapq
+import itertools
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+_STOPWORDS = {
+    "el", "la", "los", "las", "de", "del", "un", "una", "unos", "unas", "y", "o",
+    "en", "mi", "mis", "tu", "tus", "su", "sus", "por", "para", "con", "que", "al", "lo",
+}
+
+
+def _conversation_timestamp(analysis: Dict[str, Any]) -> str:
+    """ISO timestamp of when the conversation happened, or of its analysis if unknown."""
+    return analysis.get("last_message_timestamp") or analysis.get("analysis_timestamp") or ""
+
+
+def normalize_terms(text: str) -> List[str]:
+    """Lowercase, strip accents and split text into indexable terms."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return [tok for tok in _TOKEN_RE.findall(text) if len(tok) > 1 and tok not in _STOPWORDS]
+
+
+class AnalysisIndex:
+    """Incrementally maintained inverted index of conversation analyses."""
+
+    FIELDS = ("entity", "entity_type", "phrase", "sentiment", "insight", "date")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # field -> term -> doc ids
+        self._postings: Dict[str, Dict[str, Set[int]]] = {field: defaultdict(set) for field in self.FIELDS}
+        # Doc ids grow with every (re)analysis, so a higher id means a more recent analysis
+        self._next_doc = 0
+        self._doc_by_session: Dict[str, int] = {}
+        self._session_by_doc: Dict[int, str] = {}
+        self._terms_by_doc: Dict[int, List[Tuple[str, str]]] = {}
+        self._date_by_doc: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._doc_by_session)
+
+    def build(self, analyses: Iterable[Dict[str, Any]]):
+        """Index every analysis, oldest conversation first."""
+        ordered = sorted(analyses, key=_conversation_timestamp)
+        for analysis in ordered:
+            self.add(analysis)
+
+    def _extract_terms(self, analysis: Dict[str, Any]) -> Set[Tuple[str, str]]:
+        """Collect the (field, term) pairs an analysis is indexed under."""
+        terms = set()
+        for entity in analysis.get("entities", []):
+            for term in normalize_terms(entity.get("text", "")):
+                terms.add(("entity", term))
+            if entity.get("type"):
+                terms.add(("entity_type", entity["type"].upper()))
+        for phrase in analysis.get("key_phrases", []):
+            for term in normalize_terms(phrase.get("text", "")):
+                terms.add(("phrase", term))
+        sentiment = (analysis.get("sentiment") or {}).get("overall")
+        if sentiment:
+            terms.add(("sentiment", sentiment.upper()))
+        for insight in analysis.get("conversation_insights", []):
+            terms.add(("insight", insight.lower()))
+        timestamp = _conversation_timestamp(analysis)
+        if len(timestamp) >= 10:
+            terms.add(("date", timestamp[:10]))
+        return terms
+
+    def add(self, analysis: Dict[str, Any]):
+        """Index (or re-index) one analysis result."""
+        session_id = analysis.get("session_id")
+        if not session_id:
+            return
+        terms = self._extract_terms(analysis)
+        with self._lock:
+            self._remove_locked(session_id)
+            doc = self._next_doc
+            self._next_doc += 1
+            self._doc_by_session[session_id] = doc
+            self._session_by_doc[doc] = session_id
+            self._terms_by_doc[doc] = list(terms)
+            self._date_by_doc[doc] = _conversation_timestamp(analysis)[:10]
+            for field, term in terms:
+                self._postings[field][term].add(doc)
+
+    def remove(self, session_id: str):
+        """Drop a session from the index."""
+        with self._lock:
+            self._remove_locked(session_id)
+
+    def _remove_locked(self, session_id: str):
+        doc = self._doc_by_session.pop(session_id, None)
+        if doc is None:
+            return
+        del self._session_by_doc[doc]
+        del self._date_by_doc[doc]
+        for field, term in self._terms_by_doc.pop(doc, []):
+            postings = self._postings[field].get(term)
+            if postings is not None:
+                postings.discard(doc)
+                if not postings:
+                    del self._postings[field][term]
+
+    def _term_postings(self, field: str, text: str) -> Set[int]:
+        """Docs containing every term of `text` in a tokenized field."""
+        sets = [self._postings[field].get(term, set()) for term in normalize_terms(text)]
+        if not sets:
+            return set()
+        sets.sort(key=len)
+        result = set(sets[0])
+        for other in sets[1:]:
+            result &= other
+        return result
+
+    def _insight_postings(self, text: str) -> Set[int]:
+        """Docs with an insight containing `text` (the insight vocabulary is small)."""
+        needle = text.lower()
+        result: Set[int] = set()
+        for insight, docs in self._postings["insight"].items():
+            if needle in insight:
+                result |= docs
+        return result
+
+    def _date_postings(self, date_from: Optional[str], date_to: Optional[str]) -> Set[int]:
+        """Docs whose conversation happened between two ISO dates (inclusive)."""
+        buckets = self._postings["date"]
+        if not buckets:
+            return set()
+        start = date.fromisoformat(date_from[:10]) if date_from else date.fromisoformat(min(buckets))
+        end = date.fromisoformat(date_to[:10]) if date_to else date.fromisoformat(max(buckets))
+        result: Set[int] = set()
+        if (end - start).days > len(buckets):
+            # Wide range: walk the existing buckets instead of every calendar day
+            for day, docs in buckets.items():
+                if start.isoformat() <= day <= end.isoformat():
+                    result |= docs
+            return result
+        day = start
+        while day <= end:
+            result |= buckets.get(day.isoformat(), set())
+            day += timedelta(days=1)
+        return result
+
+    def search(self, entity: Optional[str] = None, entity_type: Optional[str] = None,
+               phrase: Optional[str] = None, sentiment: Optional[str] = None,
+               insight: Optional[str] = None, date_from: Optional[str] = None,
+               date_to: Optional[str] = None, page: int = 1, page_size: int = 20) -> Dict[str, Any]:
+        """Return the session ids matching all filters, most recent analysis first."""
+        page = max(1, page)
+        page_size = max(1, min(page_size, 500))
+        for value in (date_from, date_to):
+            if value:
+                date.fromisoformat(value[:10])  # ValueError on malformed dates
+
+        with self._lock:
+            candidates: List[Set[int]] = []
+            if entity:
+                candidates.append(self._term_postings("entity", entity))
+            if entity_type:
+                candidates.append(self._postings["entity_type"].get(entity_type.upper(), set()))
+            if phrase:
+                candidates.append(self._term_postings("phrase", phrase))
+            if sentiment:
+                candidates.append(self._postings["sentiment"].get(sentiment.upper(), set()))
+            if insight:
+                candidates.append(self._insight_postings(insight))
+
+            if candidates:
+                candidates.sort(key=len)
+                matches = set(candidates[0])
+                for other in candidates[1:]:
+                    if not matches:
+                        break
+                    matches &= other
+                if date_from or date_to:
+                    # Cheaper to check the surviving docs than to union day buckets
+                    low, high = (date_from or "")[:10], (date_to or "9999-12-31")[:10]
+                    matches = {doc for doc in matches if low <= self._date_by_doc[doc] <= high}
+            elif date_from or date_to:
+                matches = self._date_postings(date_from, date_to)
+            else:
+                matches = None
+
+            start = (page - 1) * page_size
+            if matches is None:
+                # Doc ids are inserted in increasing order, so the dict is already sorted
+                total = len(self._session_by_doc)
+                top = itertools.islice(reversed(self._session_by_doc), start, start + page_size)
+            else:
+                total = len(matches)
+                # Only the docs up to the requested page need ordering
+                top = heapq.nlargest(start + page_size, matches)[start:]
+            session_ids = [self._session_by_doc[doc] for doc in top]
+
+        return {
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "session_ids": session_ids,
+        }
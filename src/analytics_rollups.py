@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Precomputed time-bucketed analytics rollups.
+
+Events (messages, sentiment results, conversation analyses, CRM cases) are
+folded into hourly and daily buckets as they happen. Each granularity keeps
+one sorted array of bucket ids plus one array per numeric metric, so a
+dashboard query is a bisect plus slices instead of a scan of raw messages.
+"""
+import atexit
+import calendar
+import json
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from .colors import print_error
+
+GRANULARITIES = {"hour": 3600, "day": 86400}
+SENTIMENTS = ("POSITIVE", "NEGATIVE", "NEUTRAL", "MIXED")
+NUMERIC_COLUMNS = {
+    "messages": "l",
+    "sentiment_positive": "l",
+    "sentiment_negative": "l",
+    "sentiment_neutral": "l",
+    "sentiment_mixed": "l",
+    "confidence_sum": "d",
+    "confidence_count": "l",
+    "conversations_analyzed": "l",
+    "crm_cases": "l",
+}
+_EPOCH = datetime(1970, 1, 1)
+# Entities kept per bucket; the long tail is dropped to keep buckets compact
+MAX_ENTITIES_PER_BUCKET = 50
+
+
+def _epoch(moment: datetime) -> int:
+    """Seconds since epoch for a naive timestamp (timestamps in this app are naive)."""
+    return calendar.timegm(moment.timetuple())
+
+
+class _Series:
+    """Columnar buckets for one granularity."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.bucket_ids = array("q")
+        self.columns = {name: array(code) for name, code in NUMERIC_COLUMNS.items()}
+        self.insights: List[Dict[str, int]] = []
+        self.entities: List[Dict[str, int]] = []
+
+    def slot(self, moment: datetime) -> int:
+        """Index of the bucket containing `moment`, creating it if needed."""
+        bucket_id = _epoch(moment) // self.size
+        if self.bucket_ids and self.bucket_ids[-1] == bucket_id:
+            return len(self.bucket_ids) - 1
+        pos = bisect_left(self.bucket_ids, bucket_id)
+        if pos < len(self.bucket_ids) and self.bucket_ids[pos] == bucket_id:
+            return pos
+        self.bucket_ids.insert(pos, bucket_id)
+        for column in self.columns.values():
+            column.insert(pos, 0)
+        self.insights.insert(pos, {})
+        self.entities.insert(pos, {})
+        return pos
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "bucket_ids": self.bucket_ids.tolist(),
+            "columns": {name: column.tolist() for name, column in self.columns.items()},
+            "insights": self.insights,
+            "entities": self.entities,
+        }
+
+    @classmethod
+    def from_dict(cls, size: int, data: Dict[str, Any]) -> "_Series":
+        series = cls(size)
+        series.bucket_ids = array("q", data.get("bucket_ids", []))
+        stored = data.get("columns", {})
+        for name, code in NUMERIC_COLUMNS.items():
+            series.columns[name] = array(code, stored.get(name, [0] * len(series.bucket_ids)))
+        series.insights = data.get("insights", [{} for _ in series.bucket_ids])
+        series.entities = data.get("entities", [{} for _ in series.bucket_ids])
+        return series
+
+
+class AnalyticsRollups:
+    """Maintains hourly/daily rollups of chat and analysis events."""
+
+    def __init__(self, rollups_file: str = "analytics_rollups.json", save_interval_seconds: float = 5.0):
+        self.rollups_file = rollups_file
+        self.save_interval_seconds = save_interval_seconds
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        self.series = self._load_rollups()
+        atexit.register(self.flush)
+
+    def _load_rollups(self) -> Dict[str, _Series]:
+        """Load rollups from file."""
+        stored = {}
+        if os.path.exists(self.rollups_file):
+            try:
+                with open(self.rollups_file, 'r', encoding='utf-8') as f:
+                    stored = json.load(f)
+            except Exception as e:
+                # Keep the unreadable file aside instead of overwriting it on the next save
+                corrupt_file = f"{self.rollups_file}.corrupt"
+                print_error(f"Error loading rollups: {e}; moving it to {corrupt_file}")
+                try:
+                    os.replace(self.rollups_file, corrupt_file)
+                except OSError as move_error:
+                    print_error(f"Error moving corrupt rollups: {move_error}")
+        return {
+            name: _Series.from_dict(size, stored.get(name, {}))
+            for name, size in GRANULARITIES.items()
+        }
+
+    def _save_rollups(self):
+        """Save rollups to file through a temp file, so a crash never leaves it truncated (caller holds the lock)."""
+        temp_file = f"{self.rollups_file}.tmp"
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({name: series.to_dict() for name, series in self.series.items()},
+                          f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temp_file, self.rollups_file)
+            self._dirty = False
+            self._last_save = time.monotonic()
+        except Exception as e:
+            print_error(f"Error saving rollups: {e}")
+
+    def _touch(self):
+        """Mark rollups as modified and persist at most every `save_interval_seconds`."""
+        self._dirty = True
+        if time.monotonic() - self._last_save >= self.save_interval_seconds:
+            self._save_rollups()
+
+    def flush(self):
+        """Persist pending changes."""
+        with self._lock:
+            if self._dirty:
+                self._save_rollups()
+
+    def record_message(self, moment: Optional[datetime] = None):
+        """Count one user message."""
+        moment = moment or datetime.now()
+        with self._lock:
+            for series in self.series.values():
+                series.columns["messages"][series.slot(moment)] += 1
+            self._touch()
+
+    def record_sentiment(self, sentiment: str, confidence: float, moment: Optional[datetime] = None):
+        """Count one real-time sentiment result."""
+        moment = moment or datetime.now()
+        column = f"sentiment_{sentiment.lower()}"
+        with self._lock:
+            for series in self.series.values():
+                i = series.slot(moment)
+                if column in series.columns:
+                    series.columns[column][i] += 1
+                series.columns["confidence_sum"][i] += confidence
+                series.columns["confidence_count"][i] += 1
+            self._touch()
+
+    def record_conversation_analysis(self, analysis: Dict[str, Any], moment: Optional[datetime] = None):
+        """Fold a conversation analysis (entities, insights) into the rollups."""
+        moment = moment or datetime.now()
+        entity_texts = Counter(entity.get("text", "") for entity in analysis.get("entities", []) if entity.get("text"))
+        insights = analysis.get("conversation_insights", [])
+        with self._lock:
+            for series in self.series.values():
+                i = series.slot(moment)
+                series.columns["conversations_analyzed"][i] += 1
+                bucket_insights = series.insights[i]
+                for insight in insights:
+                    bucket_insights[insight] = bucket_insights.get(insight, 0) + 1
+                bucket_entities = series.entities[i]
+                for text, count in entity_texts.items():
+                    bucket_entities[text] = bucket_entities.get(text, 0) + count
+                if len(bucket_entities) > MAX_ENTITIES_PER_BUCKET:
+                    series.entities[i] = dict(Counter(bucket_entities).most_common(MAX_ENTITIES_PER_BUCKET))
+            self._touch()
+
+    def record_crm_case(self, moment: Optional[datetime] = None):
+        """Count one CRM case created."""
+        moment = moment or datetime.now()
+        with self._lock:
+            for series in self.series.values():
+                series.columns["crm_cases"][series.slot(moment)] += 1
+            self._touch()
+
+    def query(self, date_from: Optional[str] = None, date_to: Optional[str] = None,
+              granularity: str = "hour", top_entities: int = 10) -> Dict[str, Any]:
+        """Return rollups between two ISO timestamps as parallel per-metric arrays."""
+        if granularity not in self.series:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        size = GRANULARITIES[granularity]
+        end = datetime.fromisoformat(date_to) if date_to else datetime.now()
+        default_span = timedelta(days=1) if granularity == "hour" else timedelta(days=30)
+        start = datetime.fromisoformat(date_from) if date_from else end - default_span
+
+        with self._lock:
+            series = self.series[granularity]
+            lo = bisect_left(series.bucket_ids, _epoch(start) // size)
+            hi = bisect_left(series.bucket_ids, _epoch(end) // size + 1)
+            bucket_ids = series.bucket_ids[lo:hi]
+            columns = {name: column[lo:hi].tolist() for name, column in series.columns.items()}
+            insights = [dict(bucket) for bucket in series.insights[lo:hi]]
+            entities = [Counter(bucket).most_common(top_entities) for bucket in series.entities[lo:hi]]
+
+        confidence_sum = columns.pop("confidence_sum")
+        confidence_count = columns.pop("confidence_count")
+        return {
+            "granularity": granularity,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "buckets": [(_EPOCH + timedelta(seconds=b * size)).isoformat() for b in bucket_ids],
+            "messages": columns.pop("messages"),
+            "sentiment_distribution": {
+                sentiment: columns.pop(f"sentiment_{sentiment.lower()}") for sentiment in SENTIMENTS
+            },
+            "average_confidence": [
+                round(total / count, 4) if count else None
+                for total, count in zip(confidence_sum, confidence_count)
+            ],
+            "conversations_analyzed": columns.pop("conversations_analyzed"),
+            "crm_cases": columns.pop("crm_cases"),
+            "insight_counts": insights,
+            "top_entities": entities,
+        }
+
+# Global instance
+rollups = AnalyticsRollups()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Fábrica compartida de clientes AWS.
+
+Los clientes se crean al primer uso (importar el servidor no toca AWS ni
+importa boto3) y se reutilizan por servicio, región y endpoint. Cada cliente
+usa la región y el endpoint de `CONFIG`, un pool de conexiones del tamaño de la
+concurrencia configurada, timeouts de conexión y lectura, y keep-alive TCP.
+
+Con `AWS_STUB_MODE=true` se entregan los stubs locales de `aws_stubs`.
+
+Los clientes de botocore no son seguros entre procesos: después de un fork
+(servidores con varios workers, `ProcessPoolExecutor`) el proceso hijo
+descarta los clientes heredados y crea los suyos.
+"""
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from .config import CONFIG
+
+
+class AWSClientFactory:
+    """Crea y reutiliza clientes de boto3 con la configuración del proyecto."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple[str, Optional[str], Optional[str]], Any] = {}
+        self._session = None
+        self._pid = os.getpid()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self.reset)
+
+    def reset(self):
+        """Descarta los clientes y la sesión (p. ej. en un proceso hijo)."""
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._session = None
+        self._pid = os.getpid()
+
+    def _client_config(self, service: str):
+        from botocore.config import Config
+
+        read_timeout = CONFIG["bedrock_read_timeout_seconds"] if service == "bedrock-runtime" else CONFIG["aws_read_timeout_seconds"]
+        # Bedrock se reintenta con jitter y circuit breaker en resilience.py; el resto con los reintentos de botocore
+        retries = {"max_attempts": 1 if service == "bedrock-runtime" else 3, "mode": "standard"}
+        return Config(
+            max_pool_connections=CONFIG["aws_max_pool_connections"],
+            connect_timeout=CONFIG["aws_connect_timeout_seconds"],
+            read_timeout=read_timeout,
+            tcp_keepalive=True,
+            retries=retries,
+        )
+
+    def client(self, service: str, region: Optional[str] = None, endpoint_url: Optional[str] = None):
+        """Cliente del servicio; se crea una sola vez por (servicio, región, endpoint)."""
+        if os.getpid() != self._pid:
+            self.reset()
+        region = region or CONFIG["aws_region"]
+        key = (service, region, endpoint_url)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                if CONFIG["aws_stub_mode"]:
+                    from .aws_stubs import stub_client
+                    print(f"🧪 [AWS] Stub local de {service}")
+                    client = stub_client(service)
+                else:
+                    if self._session is None:
+                        import boto3
+                        self._session = boto3.session.Session(profile_name=CONFIG["aws_profile"])
+                    print(f"🔌 [AWS] Cliente {service} ({region}{', ' + endpoint_url if endpoint_url else ''})")
+                    client = self._session.client(
+                        service, region_name=region, endpoint_url=endpoint_url, config=self._client_config(service)
+                    )
+                self._clients[key] = client
+            return client
+
+    def bedrock(self, region: Optional[str] = None, endpoint_url: Optional[str] = None):
+        """Cliente `bedrock-runtime`; por defecto con `BEDROCK_ENDPOINT`."""
+        return self.client("bedrock-runtime", region, endpoint_url or CONFIG["bedrock_endpoint"])
+
+    def comprehend(self):
+        """Cliente `comprehend`; por defecto con `COMPREHEND_ENDPOINT`."""
+        return self.client("comprehend", endpoint_url=CONFIG["comprehend_endpoint"])
+
+
+# Instancia global de la fábrica
+aws_clients = AWSClientFactory()
@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""
+Clientes locales que imitan Bedrock Runtime y Comprehend.
+
+Sirven para ejercitar el camino real del agente (loop, herramientas, memoria,
+análisis) sin red ni credenciales: responden con las mismas estructuras que
+boto3 (`converse`, `converse_stream`, `detect_sentiment`,
+`batch_detect_sentiment`, `detect_entities`, `detect_key_phrases` y sus
+variantes batch) y permiten configurar:
+
+- Latencia: log-normal con mediana y dispersión, una cola de llamadas lentas
+  (probabilidad y multiplicador) y, en Bedrock, un costo por token generado.
+- Fallas: tasa de throttling y de errores internos, como `ClientError`.
+- Respuestas: reglas por regex que devuelven texto o llamadas a herramientas
+  (`toolUse` nativo o bloque `<tool_calls>` según el request).
+
+Con `AWS_STUB_MODE=true` la fábrica de clientes (`aws_clients`) entrega estos
+stubs; `stub_server.py` los expone por HTTP para apuntar `BEDROCK_ENDPOINT` y
+`COMPREHEND_ENDPOINT` a ellos.
+"""
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import CONFIG
+from .prompt_planner import estimate_tokens
+
+try:
+    from botocore.exceptions import ClientError
+except ImportError:  # botocore no instalado: misma forma de error para el agente
+    class ClientError(Exception):
+        def __init__(self, error_response: Dict[str, Any], operation_name: str):
+            self.response = error_response
+            self.operation_name = operation_name
+            error = error_response.get("Error", {})
+            super().__init__(
+                f"An error occurred ({error.get('Code')}) when calling the {operation_name} operation: {error.get('Message', '')}"
+            )
+
+DEFAULT_TEXT = (
+    "Con gusto te ayudo. En Banesco Panamá contamos con cuentas de ahorro, cuentas corrientes, "
+    "tarjetas de crédito y préstamos. Cada producto tiene requisitos y beneficios distintos; "
+    "puedo darte el detalle del que te interese o conectarte con un representante."
+)
+
+# Reglas por defecto: las consultas de casos llaman a `consultar_caso`; saludos y agradecimientos responden texto
+DEFAULT_RULES: List[Dict[str, Any]] = [
+    {"match": r"\bcaso\s+(?:n[uú]mero\s+)?(?P<numero_caso>[A-Za-z0-9-]*\d[A-Za-z0-9-]*)", "tool": "consultar_caso",
+     "input": {"numero_caso": "{numero_caso}"}},
+    {"match": r"\b(?:hola|buenas|buenos d[ií]as)\b", "text": "¡Hola! Soy tu asistente de Banesco Panamá. ¿En qué puedo ayudarte?"},
+    {"match": r"\bgracias\b", "text": "¡Con gusto! ¿Hay algo más en lo que pueda ayudarte?"},
+]
+
+_NEGATIVE_WORDS = {"molesto", "molesta", "mal", "malo", "problema", "queja", "terrible", "pésimo", "pesimo",
+                   "demora", "error", "nunca", "cobro", "fraude", "enojado", "horrible", "inaceptable"}
+_POSITIVE_WORDS = {"gracias", "excelente", "bien", "perfecto", "genial", "feliz", "bueno", "buena", "rápido",
+                   "amable", "encantado", "satisfecho"}
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_ENTITY_PATTERNS = [
+    (re.compile(r"\b\d{1,2}/\d{1,2}/\d{2,4}\b"), "DATE"),
+    (re.compile(r"\$\s?\d[\d,.]*|\b\d[\d,.]*\s?(?:dólares|balboas)\b"), "QUANTITY"),
+    (re.compile(r"\b[A-Z]{2,}-?\d{3,}\b|\b\d{5,}\b"), "OTHER"),
+    (re.compile(r"\bBanesco(?: Panamá)?\b"), "ORGANIZATION"),
+    (re.compile(r"\b(?:Panamá|Colón|David|Chiriquí)\b"), "LOCATION"),
+]
+_STOPWORDS = {"el", "la", "los", "las", "de", "del", "un", "una", "y", "o", "a", "en", "mi", "que", "por",
+              "para", "con", "es", "me", "se", "al", "lo", "su", "sus", "quiero", "como", "cual"}
+
+
+class LatencyModel:
+    """Latencia log-normal con una cola de llamadas lentas."""
+
+    def __init__(self, median_ms: float, sigma: float = 0.4, tail_prob: float = 0.0, tail_factor: float = 1.0,
+                 rng: Optional[random.Random] = None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.tail_prob = tail_prob
+        self.tail_factor = tail_factor
+        self._random = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """Latencia en segundos."""
+        with self._lock:
+            latency = self.median_ms * math.exp(self._random.gauss(0, self.sigma))
+            if self._random.random() < self.tail_prob:
+                latency *= self.tail_factor
+        return latency / 1000
+
+
+class FaultInjector:
+    """Throttling y errores internos con probabilidades fijas."""
+
+    def __init__(self, error_rate: float = 0.0, throttle_rate: float = 0.0, rng: Optional[random.Random] = None):
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self._random = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def check(self, operation: str):
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded (stub)"},
+                               "ResponseMetadata": {"HTTPStatusCode": 429}}, operation)
+        if roll < self.throttle_rate + self.error_rate:
+            raise ClientError({"Error": {"Code": "InternalServerException", "Message": "Internal error (stub)"},
+                               "ResponseMetadata": {"HTTPStatusCode": 500}}, operation)
+
+
+class StubBedrockClient:
+    """Stub de `bedrock-runtime` con respuestas por reglas y latencia por token."""
+
+    def __init__(self, latency: LatencyModel, faults: Optional[FaultInjector] = None, rules: Optional[List[Dict[str, Any]]] = None,
+                 default_text: str = DEFAULT_TEXT, ms_per_output_token: float = 0.0, output_tokens: int = 120):
+        self.latency = latency
+        self.faults = faults or FaultInjector()
+        self.rules = [dict(rule, pattern=re.compile(rule["match"], re.IGNORECASE)) for rule in (rules if rules is not None else DEFAULT_RULES)]
+        self.default_text = default_text
+        self.ms_per_output_token = ms_per_output_token
+        self.output_tokens = output_tokens
+        self._cached_prefixes = set()
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    @staticmethod
+    def _text_of(blocks: List[Dict[str, Any]]) -> str:
+        return " ".join(block["text"] for block in blocks if "text" in block)
+
+    def _reply(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Texto o llamada a herramienta según el último mensaje del usuario."""
+        last = messages[-1]["content"] if messages else []
+        tool_results = [block["toolResult"] for block in last if "toolResult" in block]
+        if tool_results:
+            return {"text": " ".join(self._text_of(result.get("content", [])) for result in tool_results)}
+        text = self._text_of(last)
+        if text.startswith("Resultado de herramienta"):
+            return {"text": text.split(":", 1)[-1].strip()}
+        # Solo el texto del cliente, no el contexto del turno
+        text = self._text_of(last[:1])
+        for rule in self.rules:
+            match = rule["pattern"].search(text)
+            if not match:
+                continue
+            if "tool" in rule:
+                groups = {key: value or "" for key, value in match.groupdict().items()}
+                arguments = {key: value.format(**groups) if isinstance(value, str) else value
+                             for key, value in rule.get("input", {}).items()}
+                return {"tool": rule["tool"], "input": arguments, "text": rule.get("text", "")}
+            return {"text": rule["text"]}
+        # Texto por defecto repetido hasta el largo de respuesta configurado
+        words = self.default_text.split()
+        return {"text": " ".join(words[i % len(words)] for i in range(max(1, self.output_tokens)))}
+
+    def _usage(self, system: List[Dict[str, Any]], messages: List[Dict[str, Any]], output_tokens: int) -> Dict[str, Any]:
+        usage = {"inputTokens": 0, "outputTokens": output_tokens}
+        prefix_tokens = 0
+        for i, block in enumerate(system):
+            if "cachePoint" in block:
+                prefix = json.dumps(system[:i], sort_keys=True)
+                with self._lock:
+                    hit = prefix in self._cached_prefixes
+                    self._cached_prefixes.add(prefix)
+                prefix_tokens = sum(estimate_tokens(b.get("text", "")) for b in system[:i])
+                usage["cacheReadInputTokens" if hit else "cacheWriteInputTokens"] = prefix_tokens
+                break
+        total = sum(estimate_tokens(block.get("text", "")) for block in system)
+        total += sum(estimate_tokens(self._text_of(message.get("content", []))) for message in messages)
+        usage["inputTokens"] = total - prefix_tokens
+        usage["totalTokens"] = usage["inputTokens"] + prefix_tokens + output_tokens
+        return usage
+
+    def _complete(self, modelId: str, messages: List[Dict[str, Any]], system: Optional[List[Dict[str, Any]]] = None,
+                  inferenceConfig: Optional[Dict[str, Any]] = None, toolConfig: Optional[Dict[str, Any]] = None,
+                  **_: Any) -> Dict[str, Any]:
+        """Contenido, stopReason y uso de una respuesta (sin latencia)."""
+        inference = inferenceConfig or {}
+        reply = self._reply(messages)
+        content: List[Dict[str, Any]] = []
+        stop_reason = "end_turn"
+        text = reply.get("text", "")
+
+        if "tool" in reply and toolConfig:
+            if text:
+                content.append({"text": text})
+            content.append({"toolUse": {"toolUseId": f"tooluse_{uuid.uuid4().hex[:12]}", "name": reply["tool"], "input": reply["input"]}})
+            stop_reason = "tool_use"
+        else:
+            if "tool" in reply:
+                call = json.dumps([{"name": reply["tool"], "arguments": reply["input"]}], ensure_ascii=False)
+                text = f"{text} <tool_calls>{call}</tool_calls>".strip()
+            for stop in inference.get("stopSequences", []):
+                position = text.find(stop)
+                if position >= 0:
+                    text, stop_reason = text[:position], "stop_sequence"
+            words = text.split(" ")
+            max_tokens = inference.get("maxTokens")
+            if max_tokens and len(words) > max_tokens:
+                text, stop_reason = " ".join(words[:max_tokens]), "max_tokens"
+            content.append({"text": text})
+
+        output_tokens = sum(estimate_tokens(block.get("text", "")) for block in content) + 20 * (stop_reason == "tool_use")
+        return {"content": content, "stopReason": stop_reason, "usage": self._usage(system or [], messages, output_tokens)}
+
+    def converse(self, **request: Any) -> Dict[str, Any]:
+        started = time.perf_counter()
+        with self._lock:
+            self.calls += 1
+        self.faults.check("Converse")
+        result = self._complete(**request)
+        time.sleep(self.latency.sample() + self.ms_per_output_token * result["usage"]["outputTokens"] / 1000)
+        return {
+            "output": {"message": {"role": "assistant", "content": result["content"]}},
+            "stopReason": result["stopReason"],
+            "usage": result["usage"],
+            "metrics": {"latencyMs": int(1000 * (time.perf_counter() - started))},
+        }
+
+    def converse_stream(self, **request: Any) -> Dict[str, Any]:
+        """Misma respuesta que `converse`, como eventos; la latencia se reparte entre primer token y deltas."""
+        with self._lock:
+            self.calls += 1
+        self.faults.check("ConverseStream")
+        result = self._complete(**request)
+        return {"stream": self._events(result)}
+
+    def _events(self, result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        started = time.perf_counter()
+        per_token = self.ms_per_output_token / 1000
+        time.sleep(self.latency.sample())
+        yield {"messageStart": {"role": "assistant"}}
+        for index, block in enumerate(result["content"]):
+            if "toolUse" in block:
+                tool_use = block["toolUse"]
+                yield {"contentBlockStart": {"contentBlockIndex": index,
+                                             "start": {"toolUse": {"toolUseId": tool_use["toolUseId"], "name": tool_use["name"]}}}}
+                yield {"contentBlockDelta": {"contentBlockIndex": index,
+                                             "delta": {"toolUse": {"input": json.dumps(tool_use["input"], ensure_ascii=False)}}}}
+            else:
+                words = block["text"].split(" ")
+                for i in range(0, len(words), 4):
+                    time.sleep(per_token * estimate_tokens(" ".join(words[i:i + 4])))
+                    chunk = " ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "")
+                    yield {"contentBlockDelta": {"contentBlockIndex": index, "delta": {"text": chunk}}}
+            yield {"contentBlockStop": {"contentBlockIndex": index}}
+        yield {"messageStop": {"stopReason": result["stopReason"]}}
+        yield {"metadata": {"usage": result["usage"], "metrics": {"latencyMs": int(1000 * (time.perf_counter() - started))}}}
+
+
+class StubComprehendClient:
+    """Stub de Comprehend con sentimiento por léxico y entidades/frases por regex."""
+
+    def __init__(self, latency: LatencyModel, faults: Optional[FaultInjector] = None):
+        self.latency = latency
+        self.faults = faults or FaultInjector()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self, operation: str):
+        with self._lock:
+            self.calls += 1
+        self.faults.check(operation)
+        time.sleep(self.latency.sample())
+
+    @staticmethod
+    def _sentiment(text: str) -> Dict[str, Any]:
+        words = _WORD_RE.findall(text.lower())
+        negative = sum(word in _NEGATIVE_WORDS for word in words)
+        positive = sum(word in _POSITIVE_WORDS for word in words)
+        raw = {"Positive": 0.1 + positive, "Negative": 0.1 + negative, "Neutral": 1.0, "Mixed": 0.05 + min(positive, negative)}
+        total = sum(raw.values())
+        scores = {name: value / total for name, value in raw.items()}
+        best = max(scores, key=scores.get)
+        return {"Sentiment": best.upper(), "SentimentScore": scores}
+
+    @staticmethod
+    def _entities(text: str) -> List[Dict[str, Any]]:
+        entities = []
+        for pattern, entity_type in _ENTITY_PATTERNS:
+            for match in pattern.finditer(text):
+                entities.append({"Text": match.group(0), "Type": entity_type, "Score": 0.95,
+                                 "BeginOffset": match.start(), "EndOffset": match.end()})
+        return entities
+
+    @staticmethod
+    def _key_phrases(text: str) -> List[Dict[str, Any]]:
+        phrases, current, start = [], [], 0
+        for match in _WORD_RE.finditer(text):
+            word = match.group(0)
+            if word.lower() in _STOPWORDS or len(word) < 3:
+                if len(current) >= 2:
+                    phrases.append((start, current))
+                current = []
+                continue
+            if not current:
+                start = match.start()
+            current.append(word)
+        if len(current) >= 2:
+            phrases.append((start, current))
+        return [{"Text": " ".join(words), "Score": 0.9, "BeginOffset": begin, "EndOffset": begin + len(" ".join(words))}
+                for begin, words in phrases[:20]]
+
+    def detect_sentiment(self, Text: str, LanguageCode: str = "es") -> Dict[str, Any]:
+        self._call("DetectSentiment")
+        return self._sentiment(Text)
+
+    def detect_entities(self, Text: str, LanguageCode: str = "es") -> Dict[str, Any]:
+        self._call("DetectEntities")
+        return {"Entities": self._entities(Text)}
+
+    def detect_key_phrases(self, Text: str, LanguageCode: str = "es") -> Dict[str, Any]:
+        self._call("DetectKeyPhrases")
+        return {"KeyPhrases": self._key_phrases(Text)}
+
+    def _batch(self, operation: str, texts: List[str], build) -> Dict[str, Any]:
+        self._call(operation)
+        return {"ResultList": [dict(build(text), Index=index) for index, text in enumerate(texts)], "ErrorList": []}
+
+    def batch_detect_sentiment(self, TextList: List[str], LanguageCode: str = "es") -> Dict[str, Any]:
+        return self._batch("BatchDetectSentiment", TextList, self._sentiment)
+
+    def batch_detect_entities(self, TextList: List[str], LanguageCode: str = "es") -> Dict[str, Any]:
+        return self._batch("BatchDetectEntities", TextList, lambda text: {"Entities": self._entities(text)})
+
+    def batch_detect_key_phrases(self, TextList: List[str], LanguageCode: str = "es") -> Dict[str, Any]:
+        return self._batch("BatchDetectKeyPhrases", TextList, lambda text: {"KeyPhrases": self._key_phrases(text)})
+
+
+def load_rules(script_file: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+    """Reglas de respuesta desde un JSON `{"rules": [...]}`; None para usar las por defecto."""
+    if not script_file or not os.path.exists(script_file):
+        return None
+    with open(script_file, "r", encoding="utf-8") as f:
+        return json.load(f).get("rules", [])
+
+
+def stub_client(service: str, **overrides: Any):
+    """Stub del servicio con la configuración `STUB_*` (o `overrides`)."""
+    settings = {
+        "median_ms": CONFIG["stub_bedrock_median_ms"] if service == "bedrock-runtime" else CONFIG["stub_comprehend_median_ms"],
+        "sigma": CONFIG["stub_latency_sigma"],
+        "tail_prob": CONFIG["stub_tail_prob"],
+        "tail_factor": CONFIG["stub_tail_factor"],
+        "error_rate": CONFIG["stub_error_rate"],
+        "throttle_rate": CONFIG["stub_throttle_rate"],
+        "seed": CONFIG["stub_seed"],
+    }
+    settings.update(overrides)
+    seed = settings["seed"]
+    latency = LatencyModel(settings["median_ms"], settings["sigma"], settings["tail_prob"], settings["tail_factor"],
+                           random.Random(seed))
+    faults = FaultInjector(settings["error_rate"], settings["throttle_rate"], random.Random(None if seed is None else seed + 1))
+    if service == "bedrock-runtime":
+        return StubBedrockClient(
+            latency, faults,
+            rules=load_rules(settings.get("script_file", CONFIG["stub_script_file"])),
+            ms_per_output_token=settings.get("ms_per_output_token", CONFIG["stub_ms_per_output_token"]),
+            output_tokens=settings.get("output_tokens", CONFIG["stub_output_tokens"]),
+        )
+    if service == "comprehend":
+        return StubComprehendClient(latency, faults)
+    raise ValueError(f"No hay stub para el servicio {service}")
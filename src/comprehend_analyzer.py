@@ -4,21 +4,49 @@ Amazon Comprehend integration for conversation analysis.
 """
 import json
 import os
-import boto3
+import threading
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 import asyncio
 from .colors import print_comprehend, print_success, print_error, print_warning
+from .analysis_index import AnalysisIndex
+from .analytics_rollups import rollups
+from .insight_rules import InsightRuleEngine
+from .config import CONFIG
+from .aws_clients import aws_clients
+
+# Limits of the Comprehend batch APIs
+BATCH_MAX_DOCUMENTS = 25
+BATCH_MAX_BYTES = 4900
+
+
+def _truncate_utf8(text: str, max_bytes: int) -> str:
+    """Cut text to at most `max_bytes` UTF-8 bytes without splitting a character."""
+    encoded = text.encode('utf-8')
+    if len(encoded) <= max_bytes:
+        return text
+    return encoded[:max_bytes].decode('utf-8', errors='ignore')
 
 
 class ComprehendAnalyzer:
     """Handles Amazon Comprehend analysis for conversations."""
     
-    def __init__(self):
-        self.comprehend = boto3.client('comprehend', region_name='us-east-1')
+    def __init__(self, comprehend_client=None):
+        # Without an explicit client, the shared factory creates one on first use
+        self._comprehend_client = comprehend_client
         self.analysis_file = "comprehend_analysis.json"
+        # The inactivity scheduler and bulk re-analysis write concurrently
+        self._lock = threading.RLock()
         self.analysis_data = self._load_analysis_data()
+        self.insight_engine = InsightRuleEngine.from_file(CONFIG["insight_rules_file"])
+        self.index = AnalysisIndex()
+        self.index.build(self.analysis_data["conversations"].values())
     
+    @property
+    def comprehend(self):
+        """Comprehend client."""
+        return self._comprehend_client or aws_clients.comprehend()
+
     def _load_analysis_data(self) -> Dict[str, Any]:
         """Load analysis data from file."""
         if os.path.exists(self.analysis_file):
@@ -31,10 +59,13 @@ class ComprehendAnalyzer:
         return {"conversations": {}, "sentiment_history": []}
     
     def _save_analysis_data(self):
-        """Save analysis data to file."""
+        """Save analysis data to file (through a temp file, so readers never see a partial write)."""
+        temp_file = f"{self.analysis_file}.tmp"
         try:
-            with open(self.analysis_file, 'w', encoding='utf-8') as f:
-                json.dump(self.analysis_data, f, ensure_ascii=False, indent=2)
+            with self._lock:
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.analysis_data, f, ensure_ascii=False, indent=2)
+                os.replace(temp_file, self.analysis_file)
         except Exception as e:
             print_error(f"Error saving analysis data: {e}")
     
@@ -57,14 +88,16 @@ class ComprehendAnalyzer:
                 "message": user_message
             }
             
-            # Store in sentiment history
-            self.analysis_data["sentiment_history"].append(sentiment_data)
-            
-            # Keep only last 1000 sentiment analyses
-            if len(self.analysis_data["sentiment_history"]) > 1000:
-                self.analysis_data["sentiment_history"] = self.analysis_data["sentiment_history"][-1000:]
-            
-            self._save_analysis_data()
+            with self._lock:
+                # Store in sentiment history
+                self.analysis_data["sentiment_history"].append(sentiment_data)
+                
+                # Keep only last 1000 sentiment analyses
+                if len(self.analysis_data["sentiment_history"]) > 1000:
+                    self.analysis_data["sentiment_history"] = self.analysis_data["sentiment_history"][-1000:]
+                
+                self._save_analysis_data()
+            rollups.record_sentiment(sentiment_data["sentiment"], sentiment_data["confidence"])
             
             print_success(f"Sentiment: {sentiment_data['sentiment']} (confidence: {sentiment_data['confidence']:.2f})")
             return sentiment_data
@@ -89,15 +122,7 @@ class ComprehendAnalyzer:
             print_comprehend(f"Analyzing conversation {session_id} with {len(messages)} messages")
             
             # Combine all messages into a single text for analysis
-            full_text = ""
-            user_messages = []
-            
-            for msg in messages:
-                if msg.get('role') == 'user':
-                    user_messages.append(msg.get('content', ''))
-                    full_text += msg.get('content', '') + " "
-                elif msg.get('role') == 'assistant':
-                    full_text += msg.get('content', '') + " "
+            full_text, user_messages = self._conversation_text(messages)
             
             if not full_text.strip():
                 print_warning("No text to analyze in conversation")
@@ -122,39 +147,14 @@ class ComprehendAnalyzer:
             )
             
             # Create analysis result
-            analysis_result = {
-                "session_id": session_id,
-                "analysis_timestamp": datetime.now().isoformat(),
-                "message_count": len(messages),
-                "user_message_count": len(user_messages),
-                "conversation_length": len(full_text),
-                "sentiment": {
-                    "overall": sentiment_response['Sentiment'],
-                    "confidence": sentiment_response['SentimentScore'][sentiment_response['Sentiment'].capitalize()],
-                    "scores": sentiment_response['SentimentScore']
-                },
-                "entities": [
-                    {
-                        "text": entity['Text'],
-                        "type": entity['Type'],
-                        "confidence": entity['Score']
-                    }
-                    for entity in entities_response['Entities']
-                ],
-                "key_phrases": [
-                    {
-                        "text": phrase['Text'],
-                        "confidence": phrase['Score']
-                    }
-                    for phrase in key_phrases_response['KeyPhrases']
-                ],
-                "user_sentiment_trend": self._analyze_user_sentiment_trend(user_messages),
-                "conversation_insights": self._generate_insights(entities_response, key_phrases_response, sentiment_response)
-            }
+            analysis_result = self._build_analysis_result(
+                session_id, messages, user_messages, full_text,
+                sentiment_response, entities_response['Entities'], key_phrases_response['KeyPhrases'],
+                self._analyze_user_sentiment_trend(user_messages)
+            )
             
             # Store analysis result
-            self.analysis_data["conversations"][session_id] = analysis_result
-            self._save_analysis_data()
+            self.store_analyses([analysis_result])
             
             print_success(f"Conversation analysis completed for {session_id}")
             return analysis_result
@@ -163,6 +163,157 @@ class ComprehendAnalyzer:
             print_error(f"Error analyzing conversation: {e}")
             return {"error": str(e), "session_id": session_id}
     
+    def analyze_conversations_bulk(self, conversations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Analyze any number of conversations with the Comprehend batch APIs.
+        
+        Callers don't need to pre-split: `_batch_call` sends 25 documents per
+        request, and each document is truncated to `BATCH_MAX_BYTES`. Results
+        are returned without being stored; use `store_analyses` to persist
+        them in bulk. Conversations that fail carry an `error` key.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(conversations)
+        texts, positions, user_messages_by_pos = [], [], {}
+        
+        for pos, conversation in enumerate(conversations):
+            full_text, user_messages = self._conversation_text(conversation.get('messages', []))
+            if not full_text.strip():
+                results[pos] = {"error": "No text to analyze", "session_id": conversation.get('session_id')}
+                continue
+            texts.append(_truncate_utf8(full_text, BATCH_MAX_BYTES))
+            positions.append(pos)
+            user_messages_by_pos[pos] = (full_text, user_messages)
+        
+        if texts:
+            sentiments = self._batch_call(self.comprehend.batch_detect_sentiment, texts)
+            entities = self._batch_call(self.comprehend.batch_detect_entities, texts)
+            key_phrases = self._batch_call(self.comprehend.batch_detect_key_phrases, texts)
+            
+            # Per-user-message sentiment for the trend, flattened into batch calls as well
+            flat_messages = [
+                _truncate_utf8(message, BATCH_MAX_BYTES) or ' '
+                for pos in positions for message in user_messages_by_pos[pos][1]
+            ]
+            flat_sentiments = self._batch_call(self.comprehend.batch_detect_sentiment, flat_messages) if flat_messages else []
+            
+            offset = 0
+            for i, pos in enumerate(positions):
+                conversation = conversations[pos]
+                session_id = conversation.get('session_id', 'unknown')
+                full_text, user_messages = user_messages_by_pos[pos]
+                trend_items = flat_sentiments[offset:offset + len(user_messages)]
+                offset += len(user_messages)
+                
+                failed = next((item for item in (sentiments[i], entities[i], key_phrases[i]) if not item or 'ErrorCode' in item), None)
+                if failed:
+                    results[pos] = {"error": failed.get('ErrorMessage', failed.get('ErrorCode', 'Missing result')), "session_id": session_id}
+                    continue
+                
+                sequence = [item.get('Sentiment', 'NEUTRAL') for item in trend_items]
+                results[pos] = self._build_analysis_result(
+                    session_id, conversation.get('messages', []), user_messages, full_text,
+                    sentiments[i], entities[i]['Entities'], key_phrases[i]['KeyPhrases'],
+                    self._sentiment_trend(sequence)
+                )
+        
+        return results
+    
+    def _batch_call(self, operation, texts: List[str]) -> List[Dict[str, Any]]:
+        """Run a Comprehend batch operation over any number of texts, 25 per request.
+        
+        Returns one item per text: the result entry, or an error entry with `ErrorCode`.
+        """
+        items: List[Dict[str, Any]] = []
+        for start in range(0, len(texts), BATCH_MAX_DOCUMENTS):
+            chunk = texts[start:start + BATCH_MAX_DOCUMENTS]
+            chunk_items: List[Dict[str, Any]] = [{}] * len(chunk)
+            try:
+                response = operation(TextList=chunk, LanguageCode='es')
+                for result in response.get('ResultList', []):
+                    chunk_items[result['Index']] = result
+                for error in response.get('ErrorList', []):
+                    chunk_items[error['Index']] = error
+            except Exception as e:
+                chunk_items = [{"ErrorCode": "BatchFailed", "ErrorMessage": str(e)}] * len(chunk)
+            items.extend(chunk_items)
+        return items
+    
+    def store_analyses(self, analysis_results: List[Dict[str, Any]]):
+        """Store several analysis results with a single write of the analysis file.
+        
+        Only sessions analyzed for the first time reach the rollups, in the
+        bucket of their last message, so re-analyzing history does not count
+        conversations twice or pile them into the current hour.
+        """
+        with self._lock:
+            conversations = self.analysis_data["conversations"]
+            for analysis_result in analysis_results:
+                session_id = analysis_result["session_id"]
+                first_analysis = session_id not in conversations
+                conversations[session_id] = analysis_result
+                self.index.add(analysis_result)
+                if first_analysis:
+                    rollups.record_conversation_analysis(analysis_result, self._conversation_moment(analysis_result))
+            self._save_analysis_data()
+    
+    @staticmethod
+    def _conversation_moment(analysis_result: Dict[str, Any]) -> Optional[datetime]:
+        """When the analyzed conversation happened (its last message), if known."""
+        timestamp = analysis_result.get("last_message_timestamp")
+        try:
+            return datetime.fromisoformat(timestamp) if timestamp else None
+        except ValueError:
+            return None
+    
+    def _conversation_text(self, messages: List[Dict[str, Any]]):
+        """Join a conversation into one text and collect the user messages."""
+        full_text = ""
+        user_messages = []
+        
+        for msg in messages:
+            if msg.get('role') == 'user':
+                user_messages.append(msg.get('content', ''))
+                full_text += msg.get('content', '') + " "
+            elif msg.get('role') == 'assistant':
+                full_text += msg.get('content', '') + " "
+        
+        return full_text, user_messages
+    
+    def _build_analysis_result(self, session_id: str, messages: List[Dict[str, Any]], user_messages: List[str],
+                               full_text: str, sentiment_response: Dict[str, Any], entities: List[Dict[str, Any]],
+                               key_phrases: List[Dict[str, Any]], sentiment_trend: Dict[str, Any]) -> Dict[str, Any]:
+        """Assemble the stored analysis format from Comprehend results."""
+        analysis_result = {
+            "session_id": session_id,
+            "analysis_timestamp": datetime.now().isoformat(),
+            "last_message_timestamp": messages[-1].get("timestamp") if messages else None,
+            "message_count": len(messages),
+            "user_message_count": len(user_messages),
+            "conversation_length": len(full_text),
+            "sentiment": {
+                "overall": sentiment_response['Sentiment'],
+                "confidence": sentiment_response['SentimentScore'][sentiment_response['Sentiment'].capitalize()],
+                "scores": sentiment_response['SentimentScore']
+            },
+            "entities": [
+                {
+                    "text": entity['Text'],
+                    "type": entity['Type'],
+                    "confidence": entity['Score']
+                }
+                for entity in entities
+            ],
+            "key_phrases": [
+                {
+                    "text": phrase['Text'],
+                    "confidence": phrase['Score']
+                }
+                for phrase in key_phrases
+            ],
+            "user_sentiment_trend": sentiment_trend
+        }
+        analysis_result["conversation_insights"] = self._generate_insights(analysis_result)
+        return analysis_result
+    
     def _analyze_user_sentiment_trend(self, user_messages: List[str]) -> Dict[str, Any]:
         """Analyze sentiment trend across user messages."""
         if not user_messages:
@@ -179,6 +330,13 @@ class ComprehendAnalyzer:
             except:
                 sentiments.append('NEUTRAL')
         
+        return self._sentiment_trend(sentiments)
+    
+    def _sentiment_trend(self, sentiments: List[str]) -> Dict[str, Any]:
+        """Summarize a sequence of per-message sentiments into a trend."""
+        if not sentiments:
+            return {"trend": "stable", "sentiment_changes": 0}
+        
         # Count sentiment changes
         changes = 0
         for i in range(1, len(sentiments)):
@@ -200,41 +358,35 @@ class ComprehendAnalyzer:
             "sentiment_sequence": sentiments
         }
     
-    def _generate_insights(self, entities_response, key_phrases_response, sentiment_response) -> List[str]:
-        """Generate actionable insights from the analysis."""
-        insights = []
-        
-        # Sentiment insights
-        sentiment = sentiment_response['Sentiment']
-        confidence = sentiment_response['SentimentScore'][sentiment.capitalize()]
-        
-        if sentiment == 'NEGATIVE' and confidence > 0.8:
-            insights.append("High negative sentiment detected - consider immediate follow-up")
-        elif sentiment == 'POSITIVE' and confidence > 0.8:
-            insights.append("Very positive interaction - good customer experience")
-        
-        # Entity insights
-        entities = entities_response['Entities']
-        person_entities = [e for e in entities if e['Type'] == 'PERSON']
-        if person_entities:
-            insights.append(f"Customer mentioned {len(person_entities)} person(s) - potential family/business context")
-        
-        # Key phrases insights
-        key_phrases = key_phrases_response['KeyPhrases']
-        urgent_keywords = ['urgente', 'problema', 'error', 'queja', 'reclamo', 'emergencia']
-        urgent_phrases = [kp for kp in key_phrases if any(keyword in kp['Text'].lower() for keyword in urgent_keywords)]
-        if urgent_phrases:
-            insights.append("Urgent keywords detected - prioritize this conversation")
-        
-        return insights
+    def _generate_insights(self, analysis_result: Dict[str, Any]) -> List[str]:
+        """Generate actionable insights from the analysis using the configured rules."""
+        return self.insight_engine.evaluate(analysis_result)
     
     def get_conversation_analysis(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get analysis results for a specific conversation."""
         return self.analysis_data["conversations"].get(session_id)
     
+    def search_conversation_analyses(self, page: int = 1, page_size: int = 20, **filters) -> Dict[str, Any]:
+        """Search stored analyses by entity, key phrase, sentiment, insight or date range."""
+        result = self.index.search(page=page, page_size=page_size, **filters)
+        with self._lock:
+            conversations = {session_id: self.analysis_data["conversations"].get(session_id) for session_id in result["session_ids"]}
+        result["results"] = []
+        for session_id in result.pop("session_ids"):
+            analysis = conversations.get(session_id) or {}
+            result["results"].append({
+                "session_id": session_id,
+                "analysis_timestamp": analysis.get("analysis_timestamp"),
+                "sentiment": analysis.get("sentiment", {}).get("overall"),
+                "entities": list(dict.fromkeys(entity.get("text") for entity in analysis.get("entities", []))),
+                "conversation_insights": analysis.get("conversation_insights", []),
+            })
+        return result
+
     def get_sentiment_summary(self) -> Dict[str, Any]:
         """Get summary of sentiment analysis across all conversations."""
-        sentiment_history = self.analysis_data.get("sentiment_history", [])
+        with self._lock:
+            sentiment_history = list(self.analysis_data.get("sentiment_history", []))
         
         if not sentiment_history:
             return {"total_analyses": 0}
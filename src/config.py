@@ -6,7 +6,7 @@ Configuración del MVP de asistente bancario.
 - Región por defecto: us-east-1
 """
 import os
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional
 
 # Cargar .env si existe
 try:
@@ -27,8 +27,121 @@ BEDROCK_ENDPOINT = _get_env("BEDROCK_ENDPOINT")
 CRM_URL = _get_env("CRM_URL", "http://localhost:8000/api")
 ENVIRONMENT = _get_env("ENVIRONMENT", "dev")
 
+# Programación de análisis por inactividad
+ANALYSIS_JITTER_SECONDS = float(_get_env("ANALYSIS_JITTER_SECONDS", "15"))
+ANALYSIS_BATCH_WINDOW_SECONDS = float(_get_env("ANALYSIS_BATCH_WINDOW_SECONDS", "2"))
+ANALYSIS_MAX_BATCH_SIZE = int(_get_env("ANALYSIS_MAX_BATCH_SIZE", "25"))
+ANALYSIS_MAX_IN_FLIGHT = int(_get_env("ANALYSIS_MAX_IN_FLIGHT", "4"))
+INSIGHT_RULES_FILE = _get_env("INSIGHT_RULES_FILE", "data/insight_rules.json")
+
+# Ejecución de herramientas del agente
+TOOL_MAX_WORKERS = int(_get_env("TOOL_MAX_WORKERS", "8"))
+TOOL_TIMEOUT_SECONDS = float(_get_env("TOOL_TIMEOUT_SECONDS", "10"))
+
+# Router local de intents antes de Bedrock
+INTENT_ROUTER_ENABLED = _get_env("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+INTENT_ROUTER_FILE = _get_env("INTENT_ROUTER_FILE", "data/intents.json")
+INTENT_ROUTER_THRESHOLD = float(_get_env("INTENT_ROUTER_THRESHOLD", "0.7"))
+
+# Caché semántica de respuestas del modelo
+RESPONSE_CACHE_ENABLED = _get_env("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_THRESHOLD = float(_get_env("RESPONSE_CACHE_THRESHOLD", "0.9"))
+RESPONSE_CACHE_MAX_ENTRIES = int(_get_env("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+RESPONSE_CACHE_TTL_SECONDS = float(_get_env("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+
+# Prefijos de modelos Bedrock con tool use nativo en Converse (toolConfig)
+BEDROCK_TOOL_MODELS = [
+    prefix.strip() for prefix in _get_env(
+        "BEDROCK_TOOL_MODELS",
+        "anthropic.claude-3,anthropic.claude-sonnet-4,anthropic.claude-opus-4,amazon.nova,"
+        "meta.llama3-1,mistral.mistral-large,mistral.mistral-small,cohere.command-r,ai21.jamba-1-5"
+    ).split(",") if prefix.strip()
+]
+
+# Presupuesto de tokens de entrada del prompt (estimados localmente)
+PROMPT_TOKEN_BUDGET = int(_get_env("PROMPT_TOKEN_BUDGET", "6000"))
+
+# Resúmenes incrementales de conversación
+SUMMARY_MODEL_ID = _get_env("SUMMARY_MODEL_ID", "amazon.nova-micro-v1:0")
+SUMMARY_TRIGGER_MESSAGES = int(_get_env("SUMMARY_TRIGGER_MESSAGES", "12"))
+SUMMARY_KEEP_MESSAGES = int(_get_env("SUMMARY_KEEP_MESSAGES", "6"))
+SUMMARY_MAX_CHARS = int(_get_env("SUMMARY_MAX_CHARS", "1500"))
+
+# Prefijos de modelos Bedrock que aceptan `cachePoint` en el prompt del sistema
+BEDROCK_PROMPT_CACHE_MODELS = [
+    prefix.strip() for prefix in _get_env(
+        "BEDROCK_PROMPT_CACHE_MODELS",
+        "anthropic.claude-3-5-haiku,anthropic.claude-3-7-sonnet,anthropic.claude-sonnet-4,"
+        "anthropic.claude-opus-4,amazon.nova"
+    ).split(",") if prefix.strip()
+]
+
+# Router de modelos por turno: niveles "small", "medium" y "large" con sus modelos
+# (formato "nivel=modelo|modelo,nivel=modelo"); sin router se usa BEDROCK_MODEL_ID
+BEDROCK_MODEL_ID = _get_env("BEDROCK_MODEL_ID", "ai21.jamba-1-5-large-v1:0")
+MODEL_ROUTER_ENABLED = _get_env("MODEL_ROUTER_ENABLED", "true").lower() == "true"
+BEDROCK_MODEL_POOL: Dict[str, List[str]] = {}
+for _entry in _get_env(
+    "BEDROCK_MODEL_POOL",
+    "small=amazon.nova-micro-v1:0,medium=amazon.nova-lite-v1:0,large=ai21.jamba-1-5-large-v1:0"
+).split(","):
+    if "=" in _entry:
+        _tier, _models = _entry.split("=", 1)
+        BEDROCK_MODEL_POOL[_tier.strip()] = [model.strip() for model in _models.split("|") if model.strip()]
+MODEL_ROUTER_LOG_FILE = _get_env("MODEL_ROUTER_LOG_FILE", "model_router_decisions.jsonl")
+MODEL_ROUTER_MAX_ERROR_RATE = float(_get_env("MODEL_ROUTER_MAX_ERROR_RATE", "0.3"))
+MODEL_ROUTER_MAX_P95_SECONDS = float(_get_env("MODEL_ROUTER_MAX_P95_SECONDS", "10"))
+MODEL_ROUTER_COOLDOWN_SECONDS = float(_get_env("MODEL_ROUTER_COOLDOWN_SECONDS", "30"))
+
+# Resiliencia de las llamadas a Bedrock: deadline por turno, reintentos y circuit breaker
+BEDROCK_DEADLINE_SECONDS = float(_get_env("BEDROCK_DEADLINE_SECONDS", "25"))
+# Una llamada abandonada al vencer el deadline ocupa su hilo hasta el timeout de lectura,
+# por eso este nunca supera al deadline
+BEDROCK_READ_TIMEOUT_SECONDS = min(
+    float(_get_env("BEDROCK_READ_TIMEOUT_SECONDS", str(BEDROCK_DEADLINE_SECONDS))), BEDROCK_DEADLINE_SECONDS
+)
+BEDROCK_MAX_ATTEMPTS = int(_get_env("BEDROCK_MAX_ATTEMPTS", "3"))
+BEDROCK_RETRY_BASE_SECONDS = float(_get_env("BEDROCK_RETRY_BASE_SECONDS", "0.2"))
+BEDROCK_RETRY_MAX_SECONDS = float(_get_env("BEDROCK_RETRY_MAX_SECONDS", "2"))
+BEDROCK_BREAKER_FAILURES = int(_get_env("BEDROCK_BREAKER_FAILURES", "5"))
+BEDROCK_BREAKER_RESET_SECONDS = float(_get_env("BEDROCK_BREAKER_RESET_SECONDS", "30"))
+
+# Hedged requests a Bedrock (opcional): segunda llamada si la primera supera el percentil
+# de latencia observado, opcionalmente a otro endpoint/región
+BEDROCK_HEDGING_ENABLED = _get_env("BEDROCK_HEDGING_ENABLED", "false").lower() == "true"
+BEDROCK_HEDGE_PERCENTILE = float(_get_env("BEDROCK_HEDGE_PERCENTILE", "0.9"))
+BEDROCK_HEDGE_DEFAULT_DELAY_SECONDS = float(_get_env("BEDROCK_HEDGE_DEFAULT_DELAY_SECONDS", "2"))
+BEDROCK_HEDGE_MAX_RATE = float(_get_env("BEDROCK_HEDGE_MAX_RATE", "0.1"))
+BEDROCK_HEDGE_ENDPOINT = _get_env("BEDROCK_HEDGE_ENDPOINT")
+BEDROCK_HEDGE_REGION = _get_env("BEDROCK_HEDGE_REGION")
+
+# Clientes AWS: llamadas concurrentes a Bedrock (pools de hilos) y conexiones por cliente;
+# el pool de conexiones por defecto cubre también las llamadas de respaldo del hedging
+BEDROCK_MAX_CONCURRENCY = int(_get_env("BEDROCK_MAX_CONCURRENCY", "16"))
+AWS_MAX_POOL_CONNECTIONS = int(_get_env("AWS_MAX_POOL_CONNECTIONS", str(2 * BEDROCK_MAX_CONCURRENCY)))
+AWS_CONNECT_TIMEOUT_SECONDS = float(_get_env("AWS_CONNECT_TIMEOUT_SECONDS", "3"))
+AWS_READ_TIMEOUT_SECONDS = float(_get_env("AWS_READ_TIMEOUT_SECONDS", "10"))
+
+# Stubs locales de Bedrock y Comprehend (sin red ni credenciales), para pruebas de carga
+AWS_STUB_MODE = _get_env("AWS_STUB_MODE", "false").lower() == "true"
+COMPREHEND_ENDPOINT = _get_env("COMPREHEND_ENDPOINT")
+STUB_BEDROCK_MEDIAN_MS = float(_get_env("STUB_BEDROCK_MEDIAN_MS", "400"))
+STUB_COMPREHEND_MEDIAN_MS = float(_get_env("STUB_COMPREHEND_MEDIAN_MS", "60"))
+STUB_LATENCY_SIGMA = float(_get_env("STUB_LATENCY_SIGMA", "0.4"))
+STUB_TAIL_PROB = float(_get_env("STUB_TAIL_PROB", "0.02"))
+STUB_TAIL_FACTOR = float(_get_env("STUB_TAIL_FACTOR", "8"))
+STUB_MS_PER_OUTPUT_TOKEN = float(_get_env("STUB_MS_PER_OUTPUT_TOKEN", "8"))
+STUB_OUTPUT_TOKENS = int(_get_env("STUB_OUTPUT_TOKENS", "120"))
+STUB_ERROR_RATE = float(_get_env("STUB_ERROR_RATE", "0"))
+STUB_THROTTLE_RATE = float(_get_env("STUB_THROTTLE_RATE", "0"))
+STUB_SCRIPT_FILE = _get_env("STUB_SCRIPT_FILE")
+STUB_SEED = int(_get_env("STUB_SEED")) if _get_env("STUB_SEED") else None
+
+# Métricas de Prometheus en /api/metrics (histogramas por etapa y contadores)
+METRICS_ENABLED = _get_env("METRICS_ENABLED", "true").lower() == "true"
+
 # Exportar configuración como dict simple para fácil importación
-CONFIG: Dict[str, Optional[str]] = {
+CONFIG: Dict[str, Any] = {
     "aws_region": AWS_REGION,
     "aws_profile": AWS_PROFILE,
     "aws_access_key_id": AWS_ACCESS_KEY_ID,
@@ -36,4 +149,63 @@ CONFIG: Dict[str, Optional[str]] = {
     "bedrock_endpoint": BEDROCK_ENDPOINT,
     "crm_url": CRM_URL,
     "environment": ENVIRONMENT,
+    "analysis_jitter_seconds": ANALYSIS_JITTER_SECONDS,
+    "analysis_batch_window_seconds": ANALYSIS_BATCH_WINDOW_SECONDS,
+    "analysis_max_batch_size": ANALYSIS_MAX_BATCH_SIZE,
+    "analysis_max_in_flight": ANALYSIS_MAX_IN_FLIGHT,
+    "insight_rules_file": INSIGHT_RULES_FILE,
+    "bedrock_tool_models": BEDROCK_TOOL_MODELS,
+    "bedrock_prompt_cache_models": BEDROCK_PROMPT_CACHE_MODELS,
+    "prompt_token_budget": PROMPT_TOKEN_BUDGET,
+    "summary_model_id": SUMMARY_MODEL_ID,
+    "summary_trigger_messages": SUMMARY_TRIGGER_MESSAGES,
+    "summary_keep_messages": SUMMARY_KEEP_MESSAGES,
+    "summary_max_chars": SUMMARY_MAX_CHARS,
+    "tool_max_workers": TOOL_MAX_WORKERS,
+    "tool_timeout_seconds": TOOL_TIMEOUT_SECONDS,
+    "intent_router_enabled": INTENT_ROUTER_ENABLED,
+    "intent_router_file": INTENT_ROUTER_FILE,
+    "intent_router_threshold": INTENT_ROUTER_THRESHOLD,
+    "response_cache_enabled": RESPONSE_CACHE_ENABLED,
+    "response_cache_threshold": RESPONSE_CACHE_THRESHOLD,
+    "response_cache_max_entries": RESPONSE_CACHE_MAX_ENTRIES,
+    "response_cache_ttl_seconds": RESPONSE_CACHE_TTL_SECONDS,
+    "bedrock_model_id": BEDROCK_MODEL_ID,
+    "model_router_enabled": MODEL_ROUTER_ENABLED,
+    "bedrock_model_pool": BEDROCK_MODEL_POOL,
+    "model_router_log_file": MODEL_ROUTER_LOG_FILE,
+    "model_router_max_error_rate": MODEL_ROUTER_MAX_ERROR_RATE,
+    "model_router_max_p95_seconds": MODEL_ROUTER_MAX_P95_SECONDS,
+    "model_router_cooldown_seconds": MODEL_ROUTER_COOLDOWN_SECONDS,
+    "bedrock_deadline_seconds": BEDROCK_DEADLINE_SECONDS,
+    "bedrock_read_timeout_seconds": BEDROCK_READ_TIMEOUT_SECONDS,
+    "bedrock_max_attempts": BEDROCK_MAX_ATTEMPTS,
+    "bedrock_retry_base_seconds": BEDROCK_RETRY_BASE_SECONDS,
+    "bedrock_retry_max_seconds": BEDROCK_RETRY_MAX_SECONDS,
+    "bedrock_breaker_failures": BEDROCK_BREAKER_FAILURES,
+    "bedrock_breaker_reset_seconds": BEDROCK_BREAKER_RESET_SECONDS,
+    "bedrock_hedging_enabled": BEDROCK_HEDGING_ENABLED,
+    "bedrock_hedge_percentile": BEDROCK_HEDGE_PERCENTILE,
+    "bedrock_hedge_default_delay_seconds": BEDROCK_HEDGE_DEFAULT_DELAY_SECONDS,
+    "bedrock_hedge_max_rate": BEDROCK_HEDGE_MAX_RATE,
+    "bedrock_hedge_endpoint": BEDROCK_HEDGE_ENDPOINT,
+    "bedrock_hedge_region": BEDROCK_HEDGE_REGION,
+    "bedrock_max_concurrency": BEDROCK_MAX_CONCURRENCY,
+    "aws_max_pool_connections": AWS_MAX_POOL_CONNECTIONS,
+    "aws_connect_timeout_seconds": AWS_CONNECT_TIMEOUT_SECONDS,
+    "aws_read_timeout_seconds": AWS_READ_TIMEOUT_SECONDS,
+    "aws_stub_mode": AWS_STUB_MODE,
+    "comprehend_endpoint": COMPREHEND_ENDPOINT,
+    "stub_bedrock_median_ms": STUB_BEDROCK_MEDIAN_MS,
+    "stub_comprehend_median_ms": STUB_COMPREHEND_MEDIAN_MS,
+    "stub_latency_sigma": STUB_LATENCY_SIGMA,
+    "stub_tail_prob": STUB_TAIL_PROB,
+    "stub_tail_factor": STUB_TAIL_FACTOR,
+    "stub_ms_per_output_token": STUB_MS_PER_OUTPUT_TOKEN,
+    "stub_output_tokens": STUB_OUTPUT_TOKENS,
+    "stub_error_rate": STUB_ERROR_RATE,
+    "stub_throttle_rate": STUB_THROTTLE_RATE,
+    "stub_script_file": STUB_SCRIPT_FILE,
+    "stub_seed": STUB_SEED,
+    "metrics_enabled": METRICS_ENABLED,
 }
@@ -6,6 +6,9 @@ import csv
 import os
 from typing import List, Dict
 
+from .metrics import metrics
+
+@metrics.timed("stage_seconds", stage="knowledge_load")
 def load_banesco_context() -> str:
     """Carga el contexto de productos bancarios desde CSV."""
     csv_path = "data/banesco_context.csv"
@@ -22,27 +25,46 @@ def load_banesco_context() -> str:
             current_category = None
             for row in reader:
                 categoria = row['categoria']
-                producto = row['producto']
-                descripcion = row['descripcion']
-                requisitos = row['requisitos']
-                beneficios = row['beneficios']
-                tarifa = row['tarifa']
                 
                 if categoria != current_category:
                     context += f"\n## {categoria.upper()}\n"
                     current_category = categoria
                 
-                context += f"**{producto}**\n"
-                context += f"- Descripción: {descripcion}\n"
-                context += f"- Requisitos: {requisitos}\n"
-                context += f"- Beneficios: {beneficios}\n"
-                context += f"- Tarifa: {tarifa}\n\n"
+                context += format_product(row)
         
         return context
         
     except Exception as e:
         return f"Error cargando contexto: {e}"
 
+def format_product(row: Dict[str, str]) -> str:
+    """Bloque de texto de un producto del catálogo."""
+    return (
+        f"**{row['producto']}**\n"
+        f"- Descripción: {row['descripcion']}\n"
+        f"- Requisitos: {row['requisitos']}\n"
+        f"- Beneficios: {row['beneficios']}\n"
+        f"- Tarifa: {row['tarifa']}\n\n"
+    )
+
+@metrics.timed("stage_seconds", stage="knowledge_load")
+def load_banesco_products() -> List[Dict[str, str]]:
+    """Carga los productos del catálogo con su bloque de texto ya formateado."""
+    csv_path = "data/banesco_context.csv"
+    
+    if not os.path.exists(csv_path):
+        return []
+    
+    try:
+        with open(csv_path, 'r', encoding='utf-8') as file:
+            return [
+                {"categoria": row['categoria'], "producto": row['producto'], "text": format_product(row)}
+                for row in csv.DictReader(file)
+            ]
+    except Exception as e:
+        print(f"❌ Error cargando productos: {e}")
+        return []
+
 def get_product_recommendations(user_message: str, context: str) -> str:
     """Genera recomendaciones de productos basadas en el mensaje del usuario."""
     # Palabras clave para detectar necesidades
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Resúmenes incrementales de conversaciones.
+
+Cuando una sesión acumula suficientes mensajes sin resumir, los turnos más
+antiguos se integran a un resumen acumulado que se guarda con la sesión. El
+resumen lo genera un modelo pequeño de Bedrock en un hilo de fondo, fuera del
+camino del chat; si el modelo no está disponible (o en modo mock) se usa un
+resumen extractivo local, que también se aplica cuando la memoria recorta
+mensajes que aún no se resumieron.
+"""
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .aws_clients import aws_clients
+from .config import CONFIG
+
+SUMMARY_PROMPT = (
+    "Resume la conversación entre un cliente y el asistente de Banesco Panamá en español, "
+    "en viñetas breves. Conserva lo que el cliente quiere, productos mencionados, datos que ya entregó "
+    "y compromisos del asistente. Integra el resumen previo si existe. Responde solo con el resumen."
+)
+
+
+def extractive_summary(previous_summary: str, messages: List[Dict[str, Any]], max_chars: int) -> str:
+    """Resumen local: una viñeta por mensaje del cliente, recortado a max_chars (se conservan las más recientes)."""
+    lines = [line for line in (previous_summary or "").splitlines() if line.strip()]
+    for message in messages:
+        if message.get("role") != "user":
+            continue
+        content = " ".join((message.get("content") or "").split())
+        if content:
+            lines.append(f"- Cliente: {content[:160]}")
+    while lines and len("\n".join(lines)) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ConversationSummarizer:
+    """Genera resúmenes de conversación en segundo plano."""
+
+    def __init__(self, model_id: str, max_chars: int = 1500, max_workers: int = 1, bedrock_client=None):
+        self.model_id = model_id
+        self.max_chars = max_chars
+        self._bedrock = bedrock_client
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summary")
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self.stats = {"scheduled": 0, "model_summaries": 0, "extractive_summaries": 0, "errors": 0}
+
+    def _client(self):
+        return self._bedrock or aws_clients.bedrock()
+
+    def summarize(self, previous_summary: str, messages: List[Dict[str, Any]]) -> str:
+        """Integra los mensajes al resumen previo con el modelo; extractivo si falla."""
+        if os.getenv('MOCK_MODE'):
+            self.stats["extractive_summaries"] += 1
+            return extractive_summary(previous_summary, messages, self.max_chars)
+
+        transcript = "\n".join(
+            f"{'Cliente' if message.get('role') == 'user' else 'Asistente'}: {message.get('content', '')}"
+            for message in messages
+        )
+        text = f"Resumen previo:\n{previous_summary or '(ninguno)'}\n\nNuevos mensajes:\n{transcript}"
+        try:
+            resp = self._client().converse(
+                modelId=self.model_id,
+                system=[{"text": SUMMARY_PROMPT}],
+                messages=[{"role": "user", "content": [{"text": text}]}],
+                inferenceConfig={"maxTokens": 400, "temperature": 0.2},
+            )
+            summary = "".join(block.get("text", "") for block in resp["output"]["message"]["content"]).strip()
+            if summary:
+                self.stats["model_summaries"] += 1
+                return summary[:self.max_chars]
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"⚠️ [Summary] Error generando resumen con {self.model_id}: {e}")
+        self.stats["extractive_summaries"] += 1
+        return extractive_summary(previous_summary, messages, self.max_chars)
+
+    def schedule(self, session_id: str, job: Callable[[], None]) -> Optional[Future]:
+        """Ejecuta el job de resumen de la sesión en segundo plano (uno a la vez por sesión)."""
+        with self._lock:
+            if session_id in self._in_flight:
+                return None
+            self._in_flight.add(session_id)
+            self.stats["scheduled"] += 1
+
+        def run():
+            try:
+                job()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"❌ [Summary] Error resumiendo {session_id}: {e}")
+            finally:
+                with self._lock:
+                    self._in_flight.discard(session_id)
+
+        return self._executor.submit(run)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._in_flight))
+
+
+# Instancia global del resumidor
+conversation_summarizer = ConversationSummarizer(
+    CONFIG["summary_model_id"],
+    max_chars=CONFIG["summary_max_chars"],
+)
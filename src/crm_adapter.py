@@ -9,7 +9,10 @@ import uuid
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+from .metrics import metrics
 
+
+@metrics.timed("stage_seconds", stage="crm_write")
 def create_case(case_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Crea un caso en el CRM (CSV local).
@@ -75,6 +78,7 @@ def create_case(case_data: Dict[str, Any]) -> Dict[str, Any]:
         
     except Exception as e:
         print(f"❌ [CRM] Error creando caso: {e}")
+        metrics.inc("errors_total", component="crm")
         return {
             'success': False,
             'error': str(e),
@@ -82,6 +86,7 @@ def create_case(case_data: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
+@metrics.timed("stage_seconds", stage="crm_write")
 def update_case(case_id: str, update_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Actualiza un caso existente en el CRM (CSV local).
@@ -149,6 +154,7 @@ def update_case(case_id: str, update_data: Dict[str, Any]) -> Dict[str, Any]:
         
     except Exception as e:
         print(f"❌ [CRM] Error actualizando caso: {e}")
+        metrics.inc("errors_total", component="crm")
         return {
             'success': False,
             'error': str(e),
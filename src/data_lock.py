@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Lock entre procesos sobre los archivos de datos locales.
+
+El servidor y `reanalyze.py` mantienen en memoria su propia copia de
+`comprehend_analysis.json`, `conversation_memory.json` y
+`analytics_rollups.json` y la reescriben completa, así que si corren a la vez
+el último en escribir descarta los resultados del otro. Cada uno toma este
+lock exclusivo mientras corre y se niega a arrancar si lo tiene el otro.
+
+Usa `fcntl.flock`, que el sistema libera aunque el proceso muera; donde no
+existe (Windows) el lock no se aplica.
+"""
+import os
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCK_FILE = "data_files.lock"
+
+_handle = None
+
+
+def acquire_data_lock(owner: str) -> bool:
+    """Toma el lock para este proceso; False si otro proceso lo tiene."""
+    global _handle
+    if fcntl is None or _handle is not None:
+        return True
+    handle = open(LOCK_FILE, "a+", encoding="utf-8")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    handle.seek(0)
+    handle.truncate()
+    handle.write(f"{owner} (pid {os.getpid()})\n")
+    handle.flush()
+    _handle = handle
+    return True
+
+
+def lock_owner() -> Optional[str]:
+    """Proceso que tiene (o tuvo por última vez) el lock, según el archivo."""
+    try:
+        with open(LOCK_FILE, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
@@ -3,7 +3,11 @@
 Cargador de FAQ (Preguntas Frecuentes) para el asistente bancario.
 """
 import csv
+from typing import Dict, List
 
+from .metrics import metrics
+
+@metrics.timed("stage_seconds", stage="knowledge_load")
 def get_faq_text() -> str:
     """Lee el CSV de FAQ y devuelve el texto formateado."""
     try:
@@ -25,4 +29,23 @@ def get_faq_text() -> str:
         
     except Exception as e:
         print(f"❌ Error cargando FAQ: {e}")
-        return ""
\ No newline at end of file
+        return ""
+
+
+@metrics.timed("stage_seconds", stage="knowledge_load")
+def get_faq_entries(faq_file: str = 'data/faq.csv') -> List[Dict[str, str]]:
+    """Lee el CSV de FAQ y devuelve las filas con pregunta y respuesta."""
+    try:
+        with open(faq_file, 'r', encoding='utf-8') as file:
+            return [
+                {
+                    "pregunta": row.get('pregunta', '').strip(),
+                    "respuesta": row.get('respuesta', '').strip(),
+                    "categoria": row.get('categoria', '').strip(),
+                }
+                for row in csv.DictReader(file)
+                if row.get('pregunta', '').strip() and row.get('respuesta', '').strip()
+            ]
+    except Exception as e:
+        print(f"❌ Error cargando FAQ: {e}")
+        return []
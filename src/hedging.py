@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Hedged requests para las llamadas a Bedrock.
+
+Si la llamada principal no terminó después de un retraso adaptativo (el
+percentil observado de su latencia, p90 por defecto), se envía una segunda
+llamada idéntica, opcionalmente a otro endpoint o región, y se usa la primera
+que termine bien. La otra se cancela si aún no empezó; una llamada HTTP ya en
+curso no se puede interrumpir, así que su resultado simplemente se descarta.
+
+La proporción de llamadas con hedge se limita para acotar el costo extra.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+from .config import CONFIG
+
+
+class Hedger:
+    """Envía una segunda llamada cuando la primera tarda más que el percentil observado."""
+
+    def __init__(self, percentile: float = 0.9, default_delay: float = 2.0, min_delay: float = 0.05,
+                 max_hedge_rate: float = 0.1, min_samples: int = 20, window: int = 200, max_workers: int = 16):
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_hedge_rate = max_hedge_rate
+        self.min_samples = min_samples
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+        self._window = window
+        # Latencias de las llamadas principales por clave (modelo/endpoint)
+        self._latencies: Dict[str, deque] = {}
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "rate_limited": 0}
+
+    def delay(self, key: str) -> float:
+        """Retraso antes del hedge: percentil de latencia de la clave, o el default sin muestras."""
+        with self._lock:
+            samples = sorted(self._latencies.get(key, ()))
+        if len(samples) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, samples[min(len(samples) - 1, int(self.percentile * len(samples)))])
+
+    def _record_latency(self, key: str, started: float):
+        with self._lock:
+            latencies = self._latencies.get(key)
+            if latencies is None:
+                latencies = self._latencies[key] = deque(maxlen=self._window)
+            latencies.append(time.perf_counter() - started)
+
+    def _allow_hedge(self) -> bool:
+        # Se permite mientras las llamadas con hedge no superen max_hedge_rate del total
+        with self._lock:
+            if self.stats["hedged"] + 1 > self.max_hedge_rate * self.stats["calls"]:
+                self.stats["rate_limited"] += 1
+                return False
+            self.stats["hedged"] += 1
+            return True
+
+    def call(self, key: str, primary: Callable[[], Any], secondary: Optional[Callable[[], Any]] = None) -> Any:
+        """Ejecuta `primary` y, si tarda, también `secondary` (o `primary` de nuevo); devuelve el primer éxito."""
+        with self._lock:
+            self.stats["calls"] += 1
+        started = time.perf_counter()
+        # Cada llamada corre con su propia copia del contexto del turno (contextvars)
+        first = self._executor.submit(contextvars.copy_context().run, primary)
+        # La latencia de la principal se registra aunque pierda contra el hedge
+        first.add_done_callback(lambda _: self._record_latency(key, started))
+
+        delay = self.delay(key)
+        done, _ = wait([first], timeout=delay)
+        if done or not self._allow_hedge():
+            return first.result()
+
+        print(f"🪁 [Hedge] {key} sin respuesta tras {delay:.2f}s, enviando llamada de respaldo")
+        second = self._executor.submit(contextvars.copy_context().run, secondary or primary)
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    if future is second:
+                        with self._lock:
+                            self.stats["hedge_wins"] += 1
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Llamadas, hedges enviados/ganados y retraso actual por clave."""
+        with self._lock:
+            stats = dict(self.stats)
+            keys = list(self._latencies)
+        calls = stats["calls"]
+        stats["hedge_rate"] = stats["hedged"] / calls if calls else 0.0
+        stats["delay_ms"] = {key: 1000 * self.delay(key) for key in keys}
+        return stats
+
+
+# Instancia global para las llamadas a Bedrock
+bedrock_hedger = Hedger(
+    percentile=CONFIG["bedrock_hedge_percentile"],
+    default_delay=CONFIG["bedrock_hedge_default_delay_seconds"],
+    max_hedge_rate=CONFIG["bedrock_hedge_max_rate"],
+    max_workers=CONFIG["bedrock_max_concurrency"],
+)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Perfiles de inferencia por tipo de turno.
+
+Los tokens generados son el principal costo de latencia del modelo, así que
+cada llamada usa el `inferenceConfig` que corresponde a su turno:
+
+- `default`: respuestas abiertas (productos, comparaciones, dudas largas).
+- `short`: saludos y agradecimientos; pocas oraciones.
+- `faq`: preguntas que el router de intents asocia a una FAQ.
+- `tool`: turnos que probablemente llamen herramientas; casi deterministas.
+- `confirmation`: la respuesta tras recibir resultados de herramientas.
+
+Los modelos sin tool use nativo reciben además `</tool_calls>` como stop
+sequence, para que dejen de generar apenas cierran el bloque de herramientas.
+"""
+from typing import Any, Dict
+
+from .intent_router import FALLBACK_INTENT
+
+TOOL_CALLS_STOP = "</tool_calls>"
+
+INFERENCE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "default": {"maxTokens": 512, "temperature": 0.7, "topP": 0.9},
+    "short": {"maxTokens": 150, "temperature": 0.5, "topP": 0.9},
+    "faq": {"maxTokens": 384, "temperature": 0.3, "topP": 0.9},
+    "tool": {"maxTokens": 512, "temperature": 0.1, "topP": 0.9},
+    "confirmation": {"maxTokens": 256, "temperature": 0.1, "topP": 0.9},
+}
+
+# Intents cuya respuesta es de una o dos oraciones
+SHORT_INTENTS = {"saludo", "agradecimiento"}
+
+# Confianza mínima del router de intents para usar los perfiles `short` y `faq`
+MIN_INTENT_CONFIDENCE = 0.5
+
+
+def select_profile(intent: str, intent_confidence: float, tool_likely: bool, after_tool_results: bool) -> str:
+    """Nombre del perfil para la próxima llamada del turno."""
+    if after_tool_results:
+        return "confirmation"
+    if tool_likely:
+        return "tool"
+    if intent != FALLBACK_INTENT and intent_confidence >= MIN_INTENT_CONFIDENCE:
+        if intent in SHORT_INTENTS:
+            return "short"
+        if intent.startswith("faq:"):
+            return "faq"
+    return "default"
+
+
+def inference_config(profile: str, native_tools: bool) -> Dict[str, Any]:
+    """`inferenceConfig` de Converse para el perfil."""
+    config = dict(INFERENCE_PROFILES[profile])
+    if not native_tools:
+        config["stopSequences"] = [TOOL_CALLS_STOP]
+    return config
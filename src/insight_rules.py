@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Declarative insight rules for conversation analyses.
+
+Rules are loaded from `data/insight_rules.json` (or `DEFAULT_RULES` when the
+file does not exist) and compiled once into lookup tables: sentiment and
+sentiment-trend thresholds are sorted per label, entity-count thresholds are
+sorted per entity type, and every keyword of every rule is merged into a
+single lookahead regex that finds each keyword independently, overlapping
+ones included. Evaluating an analysis is then one pass over its entities and
+key phrases plus a bisect per table, no matter how many rules are loaded.
+An invalid rule raises `ValueError` instead of silently disabling insights.
+
+Supported rule types:
+- `sentiment`: `sentiment` label with `confidence_above`
+- `entity_count`: `entity_type` with `min_count`
+- `keywords`: `keywords` matched as substrings of key phrases
+- `sentiment_trend`: `trends` list with optional `min_changes`
+"""
+import json
+import os
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .colors import print_warning
+
+RULE_TYPES = ("sentiment", "entity_count", "keywords", "sentiment_trend")
+
+# The insights the analyzer produced before rules became configurable
+DEFAULT_RULES: List[Dict[str, Any]] = [
+    {
+        "id": "high_negative_sentiment",
+        "type": "sentiment",
+        "sentiment": "NEGATIVE",
+        "confidence_above": 0.8,
+        "message": "High negative sentiment detected - consider immediate follow-up",
+    },
+    {
+        "id": "high_positive_sentiment",
+        "type": "sentiment",
+        "sentiment": "POSITIVE",
+        "confidence_above": 0.8,
+        "message": "Very positive interaction - good customer experience",
+    },
+    {
+        "id": "person_mentions",
+        "type": "entity_count",
+        "entity_type": "PERSON",
+        "min_count": 1,
+        "message": "Customer mentioned {count} person(s) - potential family/business context",
+    },
+    {
+        "id": "urgent_keywords",
+        "type": "keywords",
+        "keywords": ["urgente", "problema", "error", "queja", "reclamo", "emergencia"],
+        "message": "Urgent keywords detected - prioritize this conversation",
+    },
+]
+
+
+class InsightRuleEngine:
+    """Compiles insight rules and evaluates them over analysis results."""
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = rules
+        self._compile()
+
+    @classmethod
+    def from_file(cls, rules_file: str) -> "InsightRuleEngine":
+        """Load rules from a JSON file with a top-level `rules` list.
+
+        A missing file falls back to `DEFAULT_RULES`; a malformed file or rule
+        raises `ValueError`.
+        """
+        if not os.path.exists(rules_file):
+            print_warning(f"Insight rules file {rules_file} not found, using the default rules")
+            return cls(DEFAULT_RULES)
+        try:
+            with open(rules_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid insight rules file {rules_file}: {e}") from e
+        if not isinstance(data, dict) or not isinstance(data.get("rules"), list):
+            raise ValueError(f"Invalid insight rules file {rules_file}: expected an object with a 'rules' list")
+        return cls(data["rules"])
+
+    def _compile(self):
+        """Build the per-type lookup tables."""
+        # label -> (sorted thresholds, rule indexes in the same order)
+        sentiment: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
+        entity_count: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        trend: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        keyword_rules: Dict[str, set] = defaultdict(set)
+
+        for i, rule in enumerate(self.rules):
+            if not isinstance(rule, dict):
+                raise ValueError(f"Invalid insight rule {i}: expected an object")
+            rule_type = rule.get("type")
+            if rule_type not in RULE_TYPES:
+                raise ValueError(f"Unknown insight rule type '{rule_type}' in rule {rule.get('id', i)}")
+            try:
+                if rule_type == "sentiment":
+                    sentiment[rule["sentiment"].upper()].append((float(rule.get("confidence_above", 0.0)), i))
+                elif rule_type == "entity_count":
+                    entity_count[rule["entity_type"].upper()].append((int(rule.get("min_count", 1)), i))
+                elif rule_type == "keywords":
+                    if not isinstance(rule["keywords"], list):
+                        raise TypeError("'keywords' must be a list")
+                    for keyword in rule["keywords"]:
+                        if keyword:
+                            keyword_rules[keyword.lower()].add(i)
+                elif rule_type == "sentiment_trend":
+                    if not isinstance(rule["trends"], list):
+                        raise TypeError("'trends' must be a list")
+                    for trend_name in rule["trends"]:
+                        trend[trend_name].append((int(rule.get("min_changes", 0)), i))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                raise ValueError(f"Invalid insight rule {rule.get('id', i)}: {e!r}") from e
+
+        def split(table):
+            compiled = {}
+            for key, entries in table.items():
+                entries.sort()
+                compiled[key] = ([value for value, _ in entries], [index for _, index in entries])
+            return compiled
+
+        self._sentiment = split(sentiment)
+        self._entity_count = split(entity_count)
+        self._trend = split(trend)
+
+        # The lookahead consumes no text, so the regex tries every position and
+        # overlapping keywords ("abc", "bcd" in "abcd") are all found. At each
+        # position it reports the longest keyword, which also fires the rules of
+        # the shorter keywords that start there (its prefixes).
+        self._keyword_rules: Dict[str, List[int]] = {}
+        for keyword in keyword_rules:
+            fired = set()
+            for other, indexes in keyword_rules.items():
+                if keyword.startswith(other):
+                    fired |= indexes
+            self._keyword_rules[keyword] = sorted(fired)
+        if keyword_rules:
+            alternatives = sorted(keyword_rules, key=len, reverse=True)
+            self._keyword_re: Optional[re.Pattern] = re.compile(
+                "(?=(" + "|".join(re.escape(k) for k in alternatives) + "))"
+            )
+        else:
+            self._keyword_re = None
+
+    def _match(self, analysis: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+        """Return the fired rule indexes with the values used to format their messages."""
+        fired: Dict[int, Dict[str, Any]] = {}
+
+        sentiment = analysis.get("sentiment") or {}
+        label = (sentiment.get("overall") or "").upper()
+        if label in self._sentiment:
+            confidence = sentiment.get("confidence", 0.0)
+            thresholds, indexes = self._sentiment[label]
+            for i in indexes[:bisect_left(thresholds, confidence)]:
+                fired[i] = {"confidence": confidence}
+
+        if self._entity_count:
+            type_counts = Counter((entity.get("type") or "").upper() for entity in analysis.get("entities", []))
+            for entity_type, count in type_counts.items():
+                if entity_type in self._entity_count:
+                    thresholds, indexes = self._entity_count[entity_type]
+                    for i in indexes[:bisect_right(thresholds, count)]:
+                        fired[i] = {"count": count}
+
+        if self._keyword_re is not None:
+            text = "\n".join((phrase.get("text") or "").lower() for phrase in analysis.get("key_phrases", []))
+            for match in self._keyword_re.finditer(text):
+                for i in self._keyword_rules[match.group(1)]:
+                    fired.setdefault(i, {"keyword": match.group(1)})
+
+        trend = analysis.get("user_sentiment_trend") or {}
+        if trend.get("trend") in self._trend:
+            changes = trend.get("sentiment_changes", 0)
+            thresholds, indexes = self._trend[trend["trend"]]
+            for i in indexes[:bisect_right(thresholds, changes)]:
+                fired[i] = {"count": changes}
+
+        return fired
+
+    def evaluate(self, analysis: Dict[str, Any]) -> List[str]:
+        """Return the insight messages for an analysis, in rule-file order."""
+        fired = self._match(analysis)
+        insights = []
+        for i in sorted(fired):
+            message = self.rules[i].get("message", self.rules[i].get("id", ""))
+            try:
+                insights.append(message.format(**fired[i]))
+            except (KeyError, IndexError):
+                insights.append(message)
+        return insights
+
+    def backtest(self, analyses: Iterable[Dict[str, Any]], samples: int = 5) -> Dict[str, Any]:
+        """Evaluate the rules over stored analyses and report hits per rule."""
+        hits = Counter()
+        examples: Dict[int, List[str]] = defaultdict(list)
+        total = 0
+        for analysis in analyses:
+            total += 1
+            for i in self._match(analysis):
+                hits[i] += 1
+                if len(examples[i]) < samples:
+                    examples[i].append(analysis.get("session_id", ""))
+        return {
+            "analyses": total,
+            "rules": [
+                {
+                    "id": rule.get("id", str(i)),
+                    "type": rule.get("type"),
+                    "hits": hits[i],
+                    "hit_rate": hits[i] / total if total else 0.0,
+                    "sample_sessions": examples[i],
+                }
+                for i, rule in enumerate(self.rules)
+            ],
+        }
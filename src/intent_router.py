@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Router local de intents antes de Bedrock.
+
+Un clasificador lineal pequeño (regresión logística multiclase sobre
+unigramas, bigramas y prefijos de palabras) se entrena al iniciar con las
+preguntas de `data/faq.csv`, los ejemplos de `data/intents.json` y los
+mensajes de usuario registrados en memoria. Los intents con confianza sobre
+el umbral se responden con su plantilla en microsegundos; el resto (clase
+`otros` o baja confianza) sigue hacia el modelo.
+
+El intent se asigna al mensaje completo, así que solo se usa la plantilla si
+el intent cubre todo el mensaje: los mensajes con contraste ("pero", "no me")
+van al modelo, y los saludos y agradecimientos deben ser cortos y usar solo
+palabras de sus ejemplos ("gracias, ¿cuál es la tasa?" no es solo un
+agradecimiento).
+"""
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .config import CONFIG
+from .faq_loader import get_faq_entries
+
+FALLBACK_INTENT = "otros"
+
+_TOKEN_RE = re.compile(r"\w+")
+# Palabras sin contenido; se mantienen en los bigramas ("a que", "que hora")
+_STOPWORDS = {
+    "el", "la", "los", "las", "de", "del", "un", "una", "unos", "unas", "y", "o",
+    "en", "mi", "mis", "tu", "tus", "su", "sus", "por", "al", "lo", "me", "se", "es",
+}
+# Longitud de prefijo que agrupa variantes y errores de tipeo (prestamo/prestamos/prestamps)
+_PREFIX_LENGTH = 5
+# Intents sociales: su plantilla no responde nada más que el saludo o el agradecimiento
+SOCIAL_INTENTS = {"saludo", "agradecimiento"}
+SOCIAL_MAX_TOKENS = 6
+# Palabras (y bigramas) que agregan un reclamo o una condición al intent
+_CONTRAST_TERMS = {"pero", "aunque", "sino", "sin embargo", "no me"}
+
+
+def _tokens(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _TOKEN_RE.findall(text)
+
+
+def _has_contrast(tokens: List[str]) -> bool:
+    bigrams = {f"{first} {second}" for first, second in zip(tokens, tokens[1:])}
+    return any(term in _CONTRAST_TERMS for term in itertools.chain(tokens, bigrams))
+
+
+def extract_features(text: str) -> List[str]:
+    """Features del mensaje: unigramas, prefijos y bigramas normalizados."""
+    tokens = _tokens(text)
+    features = set()
+    for token in tokens:
+        if token in _STOPWORDS:
+            continue
+        features.add(f"w:{token}")
+        if len(token) > _PREFIX_LENGTH:
+            features.add(f"p:{token[:_PREFIX_LENGTH]}")
+    for first, second in zip(tokens, tokens[1:]):
+        features.add(f"b:{first}_{second}")
+    return sorted(features)
+
+
+class IntentRouter:
+    """Clasificador de intents con respuestas por plantilla."""
+
+    def __init__(self, responses: Dict[str, str], examples: List[Tuple[str, str]],
+                 threshold: float = 0.7, epochs: int = 30, learning_rate: float = 0.5, l2: float = 1e-4):
+        self.responses = responses
+        self.threshold = threshold
+        self.labels = sorted(set(label for _, label in examples) | set(responses) | {FALLBACK_INTENT})
+        self._label_index = {label: i for i, label in enumerate(self.labels)}
+        # feature -> pesos por clase
+        self._weights: Dict[str, List[float]] = {}
+        self._bias = [0.0] * len(self.labels)
+        self._lock = threading.Lock()
+        self.stats = {"messages": 0, "fast_path": 0, "not_covered": 0, "classify_seconds": 0.0}
+        self._by_intent: Counter = Counter()
+        self.training_examples = len(examples)
+        # Palabras de los ejemplos de cada intent social
+        self._social_vocabulary: Dict[str, Set[str]] = {intent: set() for intent in SOCIAL_INTENTS}
+        for text, label in examples:
+            if label in SOCIAL_INTENTS:
+                self._social_vocabulary[label].update(_tokens(text))
+        self._train(examples, epochs, learning_rate, l2)
+
+    @classmethod
+    def from_sources(cls, intents_file: str, faq_file: str = 'data/faq.csv',
+                     logged_messages: Iterable[str] = (), threshold: float = 0.7) -> "IntentRouter":
+        """Construye el router desde la FAQ, el archivo de intents y los mensajes registrados.
+
+        Los mensajes registrados se etiquetan con el modelo entrenado sobre los
+        ejemplos semilla: los de alta confianza refuerzan su intent y el resto
+        se usa como ejemplo de `otros`.
+        """
+        try:
+            with open(intents_file, 'r', encoding='utf-8') as f:
+                spec = json.load(f)
+        except Exception as e:
+            print(f"❌ Error cargando intents desde {intents_file}: {e}")
+            spec = {}
+
+        responses: Dict[str, str] = {}
+        examples: List[Tuple[str, str]] = []
+        faq_labels: Dict[str, str] = {}
+        for i, entry in enumerate(get_faq_entries(faq_file), 1):
+            label = f"faq:{i}"
+            faq_labels[entry["pregunta"]] = label
+            responses[label] = entry["respuesta"]
+            examples.append((entry["pregunta"], label))
+        for question, paraphrases in spec.get("faq_examples", {}).items():
+            label = faq_labels.get(question)
+            if label:
+                examples.extend((text, label) for text in paraphrases)
+        for intent in spec.get("intents", []):
+            responses[intent["name"]] = intent["response"]
+            examples.extend((text, intent["name"]) for text in intent.get("examples", []))
+        examples.extend((text, FALLBACK_INTENT) for text in spec.get("fallback_examples", []))
+
+        router = cls(responses, examples, threshold=threshold)
+
+        # Etiquetado débil de los mensajes registrados (auto-entrenamiento de una pasada)
+        seen = {text.lower() for text, _ in examples}
+        weak: List[Tuple[str, str]] = []
+        for message in logged_messages:
+            if not message or message.lower() in seen or not extract_features(message):
+                continue
+            seen.add(message.lower())
+            label, confidence = router.classify(message)
+            weak.append((message, label if confidence >= 0.9 else FALLBACK_INTENT))
+        if weak:
+            router = cls(responses, examples + weak, threshold=threshold)
+        return router
+
+    def _train(self, examples: List[Tuple[str, str]], epochs: int, learning_rate: float, l2: float):
+        """Descenso de gradiente estocástico sobre la pérdida logística multiclase."""
+        data = [(extract_features(text), self._label_index[label]) for text, label in examples]
+        data = [(features, label) for features, label in data if features]
+        # Orden fijo para que el modelo sea reproducible entre procesos
+        rng = random.Random(13)
+        n_labels = len(self.labels)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1 + 0.1 * epoch)
+            for features, label in data:
+                probabilities = self._probabilities(features)
+                for k in range(n_labels):
+                    gradient = probabilities[k] - (1.0 if k == label else 0.0)
+                    if gradient == 0.0:
+                        continue
+                    self._bias[k] -= rate * gradient
+                    for feature in features:
+                        weights = self._weights.get(feature)
+                        if weights is None:
+                            weights = self._weights[feature] = [0.0] * n_labels
+                        weights[k] -= rate * (gradient + l2 * weights[k])
+
+    def _probabilities(self, features: List[str]) -> List[float]:
+        scores = list(self._bias)
+        for feature in features:
+            weights = self._weights.get(feature)
+            if weights is not None:
+                for k, weight in enumerate(weights):
+                    scores[k] += weight
+        top = max(scores)
+        exps = [math.exp(score - top) for score in scores]
+        total = sum(exps)
+        return [value / total for value in exps]
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        """Intent más probable y su confianza; `otros` si no hay features conocidas."""
+        features = [feature for feature in extract_features(text) if feature in self._weights]
+        if not features:
+            return FALLBACK_INTENT, 0.0
+        probabilities = self._probabilities(features)
+        best = max(range(len(probabilities)), key=probabilities.__getitem__)
+        return self.labels[best], probabilities[best]
+
+    def covers(self, intent: str, text: str) -> bool:
+        """Indica si la plantilla del intent responde todo el mensaje (no solo una parte)."""
+        tokens = _tokens(text)
+        if _has_contrast(tokens):
+            return False
+        if intent in SOCIAL_INTENTS:
+            # Una pregunta o cualquier palabra ajena a los ejemplos es contenido que la plantilla ignoraría
+            return len(tokens) <= SOCIAL_MAX_TOKENS and set(tokens) <= self._social_vocabulary[intent]
+        return True
+
+    def route(self, text: str) -> Optional[Dict[str, Any]]:
+        """Respuesta por plantilla si el intent supera el umbral y cubre el mensaje; None para usar el modelo."""
+        started = time.perf_counter()
+        intent, confidence = self.classify(text)
+        confident = intent != FALLBACK_INTENT and confidence >= self.threshold and intent in self.responses
+        fast_path = confident and self.covers(intent, text)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.stats["messages"] += 1
+            self.stats["classify_seconds"] += elapsed
+            if confident and not fast_path:
+                self.stats["not_covered"] += 1
+            if fast_path:
+                self.stats["fast_path"] += 1
+                self._by_intent[intent] += 1
+
+        if not fast_path:
+            return None
+        return {"intent": intent, "confidence": confidence, "message": self.responses[intent]}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Fracción de mensajes resueltos por el router y latencia de clasificación."""
+        with self._lock:
+            messages = self.stats["messages"]
+            return {
+                "messages": messages,
+                "fast_path": self.stats["fast_path"],
+                "fast_path_ratio": self.stats["fast_path"] / messages if messages else 0.0,
+                "not_covered": self.stats["not_covered"],
+                "avg_classify_us": 1e6 * self.stats["classify_seconds"] / messages if messages else 0.0,
+                "threshold": self.threshold,
+                "training_examples": self.training_examples,
+                "by_intent": dict(self._by_intent.most_common()),
+            }
+
+
+def _logged_user_messages() -> List[str]:
+    """Mensajes de usuario de las conversaciones guardadas."""
+    from .memory import memory
+    return [
+        message.get("content", "")
+        for conversation in memory.conversations.values()
+        for message in conversation.get("messages", [])
+        if message.get("role") == "user"
+    ]
+
+
+# Instancia global del router
+intent_router = IntentRouter.from_sources(
+    CONFIG["intent_router_file"],
+    logged_messages=_logged_user_messages(),
+    threshold=CONFIG["intent_router_threshold"],
+)
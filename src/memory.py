@@ -4,8 +4,51 @@ Sistema de memoria para conversaciones del asistente bancario.
 """
 import json
 import os
+import threading
 from typing import Dict, List, Any
 from datetime import datetime
+from .analytics_rollups import rollups
+from .config import CONFIG
+from .metrics import metrics
+from .conversation_summarizer import conversation_summarizer, extractive_summary
+
+def normalize_conversation(conversation: Any) -> Dict[str, Any]:
+    """Convierte conversaciones del formato antiguo (lista de turnos) al formato actual."""
+    if isinstance(conversation, dict):
+        return conversation
+    
+    messages = []
+    for turn in conversation or []:
+        messages.append({
+            "timestamp": turn.get("timestamp"),
+            "role": "user",
+            "content": turn.get("user_message", ""),
+            "source": turn.get("source", "unknown")
+        })
+        messages.append({
+            "timestamp": turn.get("timestamp"),
+            "role": "assistant",
+            "content": turn.get("bot_response", ""),
+            "source": turn.get("source", "unknown")
+        })
+    timestamps = [m["timestamp"] for m in messages if m.get("timestamp")]
+    return {
+        "messages": messages,
+        "metadata": {
+            "created_at": timestamps[0] if timestamps else None,
+            "last_activity": timestamps[-1] if timestamps else None,
+            "analyzed_by_comprehend": False,
+            "analysis_timestamp": None,
+            "message_count": len(messages)
+        }
+    }
+
+def converse_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Mensaje guardado en formato de Bedrock Converse."""
+    return {
+        "role": message.get("role", "user"),
+        "content": [{"text": message.get("content") or "(sin contenido)"}]
+    }
 
 class ConversationMemory:
     """Maneja la memoria de conversaciones."""
@@ -14,14 +57,23 @@ class ConversationMemory:
         self.max_conversations = max_conversations
         self.max_messages_per_session = max_messages_per_session
         self.memory_file = "conversation_memory.json"
+        # Mensajes sin resumir que disparan un resumen y mensajes recientes que se dejan sin resumir
+        self.summary_trigger_messages = CONFIG["summary_trigger_messages"]
+        self.summary_keep_messages = CONFIG["summary_keep_messages"]
+        # Los resúmenes se aplican desde un hilo de fondo
+        self._lock = threading.RLock()
+        # session_id -> {"created_at": ..., "dropped": n, "messages": [...]} mensajes ya convertidos
+        # al formato Converse; `created_at` evita reutilizarlos si la sesión se vuelve a crear
+        self._converse_cache: Dict[str, Dict[str, Any]] = {}
         self.conversations = self._load_memory()
     
-    def _load_memory(self) -> Dict[str, List[Dict]]:
+    def _load_memory(self) -> Dict[str, Dict[str, Any]]:
         """Carga la memoria desde archivo."""
         if os.path.exists(self.memory_file):
             try:
                 with open(self.memory_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    stored = json.load(f)
+                return {session_id: normalize_conversation(conversation) for session_id, conversation in stored.items()}
             except:
                 return {}
         return {}
@@ -29,13 +81,19 @@ class ConversationMemory:
     def _save_memory(self):
         """Guarda la memoria en archivo."""
         try:
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
+            with metrics.timer("stage_seconds", stage="memory_persist"), self._lock, open(self.memory_file, 'w', encoding='utf-8') as f:
                 json.dump(self.conversations, f, ensure_ascii=False, indent=2)
         except Exception as e:
             print(f"Error guardando memoria: {e}")
+            metrics.inc("errors_total", component="memory")
     
     def add_message(self, session_id: str, message: str, response: str, source: str = "unknown"):
         """Agrega un mensaje a la conversación."""
+        with self._lock:
+            self._add_message(session_id, message, response, source)
+        self._maybe_summarize(session_id)
+    
+    def _add_message(self, session_id: str, message: str, response: str, source: str):
         if session_id not in self.conversations:
             self.conversations[session_id] = {
                 "messages": [],
@@ -63,21 +121,130 @@ class ConversationMemory:
             "source": source
         })
         
+        rollups.record_message()
+
         # Update metadata
         self.conversations[session_id]["metadata"]["last_activity"] = datetime.now().isoformat()
         self.conversations[session_id]["metadata"]["message_count"] = len(self.conversations[session_id]["messages"])
         
-        # Limitar el número de mensajes por sesión
-        if len(self.conversations[session_id]["messages"]) > self.max_messages_per_session:
+        # Limitar el número de mensajes por sesión; lo que se recorta sin resumir se resume antes
+        overflow = len(self.conversations[session_id]["messages"]) - self.max_messages_per_session
+        if overflow > 0:
+            self._fold_dropped_messages(self.conversations[session_id], overflow)
             self.conversations[session_id]["messages"] = self.conversations[session_id]["messages"][-self.max_messages_per_session:]
         
         # Limitar el número de conversaciones
         if len(self.conversations) > self.max_conversations:
             oldest_session = min(self.conversations.keys())
             del self.conversations[oldest_session]
+            self._converse_cache.pop(oldest_session, None)
         
         self._save_memory()
     
+    def _fold_dropped_messages(self, conversation: Dict[str, Any], count: int):
+        """Integra al resumen (extractivo) los primeros `count` mensajes si aún no están resumidos."""
+        metadata = conversation["metadata"]
+        dropped = metadata.get("dropped_messages", 0)
+        covered = metadata.get("summary_until", 0) - dropped
+        if covered < count:
+            metadata["summary"] = extractive_summary(
+                metadata.get("summary", ""), conversation["messages"][max(covered, 0):count], conversation_summarizer.max_chars
+            )
+            metadata["summary_until"] = dropped + count
+        metadata["dropped_messages"] = dropped + count
+    
+    def _maybe_summarize(self, session_id: str):
+        """Programa un resumen en segundo plano si hay demasiados mensajes sin resumir."""
+        with self._lock:
+            conversation = self.conversations.get(session_id)
+            if not conversation:
+                return
+            metadata = conversation["metadata"]
+            messages = conversation["messages"]
+            # Posiciones absolutas: dropped_messages cuenta los mensajes ya recortados
+            dropped = metadata.get("dropped_messages", 0)
+            summary_until = metadata.get("summary_until", 0)
+            start = max(summary_until - dropped, 0)
+            if len(messages) - start <= self.summary_trigger_messages:
+                return
+            end = len(messages) - self.summary_keep_messages
+            pending = list(messages[start:end])
+            previous_summary = metadata.get("summary", "")
+            target = dropped + end
+        
+        def job():
+            summary = conversation_summarizer.summarize(previous_summary, pending)
+            self._apply_summary(session_id, summary_until, target, summary)
+        
+        conversation_summarizer.schedule(session_id, job)
+    
+    def _apply_summary(self, session_id: str, expected_until: int, target: int, summary: str):
+        """Guarda el resumen si nadie resumió la sesión mientras se generaba."""
+        with self._lock:
+            conversation = self.conversations.get(session_id)
+            if not conversation or conversation["metadata"].get("summary_until", 0) != expected_until:
+                return
+            conversation["metadata"]["summary"] = summary
+            conversation["metadata"]["summary_until"] = target
+            conversation["metadata"]["summary_updated_at"] = datetime.now().isoformat()
+            self._save_memory()
+    
+    def get_summary(self, session_id: str) -> str:
+        """Resumen acumulado de los mensajes anteriores de la sesión."""
+        return self.conversations.get(session_id, {}).get("metadata", {}).get("summary", "")
+    
+    def get_unsummarized_messages(self, session_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Últimos mensajes que todavía no forman parte del resumen."""
+        with self._lock:
+            conversation = self.conversations.get(session_id)
+            if not conversation:
+                return []
+            metadata = conversation.get("metadata", {})
+            start = max(metadata.get("summary_until", 0) - metadata.get("dropped_messages", 0), 0)
+            return conversation.get("messages", [])[start:][-limit:]
+    
+    def get_converse_messages(self, session_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Mensajes sin resumir en formato Converse, alternando roles y empezando por el usuario.
+        
+        Los mensajes convertidos se guardan por sesión; en cada turno solo se
+        convierten los nuevos y se descartan los recortados por la memoria.
+        """
+        with self._lock:
+            conversation = self.conversations.get(session_id)
+            if not conversation:
+                self._converse_cache.pop(session_id, None)
+                return []
+            messages = conversation.get("messages", [])
+            metadata = conversation.get("metadata", {})
+            dropped = metadata.get("dropped_messages", 0)
+            created_at = metadata.get("created_at")
+            
+            cached = self._converse_cache.get(session_id)
+            converted = None
+            if cached is not None and cached["created_at"] == created_at and cached["dropped"] <= dropped:
+                converted = cached["messages"][dropped - cached["dropped"]:]
+                if len(converted) > len(messages):
+                    converted = None
+            if converted is None:
+                converted = [converse_message(message) for message in messages]
+            else:
+                converted.extend(converse_message(message) for message in messages[len(converted):])
+            self._converse_cache[session_id] = {"created_at": created_at, "dropped": dropped, "messages": converted}
+            
+            start = max(metadata.get("summary_until", 0) - dropped, 0)
+            selected = converted[start:][-limit:] if limit > 0 else []
+        
+        # Converse exige alternar roles y empezar por el usuario
+        result: List[Dict[str, Any]] = []
+        for message in selected:
+            if not result and message["role"] != "user":
+                continue
+            if result and result[-1]["role"] == message["role"]:
+                result[-1] = {"role": message["role"], "content": result[-1]["content"] + message["content"]}
+            else:
+                result.append(message)
+        return result
+    
     def get_conversation_history(self, session_id: str, limit: int = 20) -> List[Dict]:
         """Obtiene el historial de conversación."""
         if session_id not in self.conversations:
@@ -85,17 +252,23 @@ class ConversationMemory:
         
         return self.conversations[session_id][-limit:]
     
+    def has_history(self, session_id: str) -> bool:
+        """Indica si la sesión ya tiene mensajes previos."""
+        return bool(self.conversations.get(session_id, {}).get("messages"))
+    
     def get_context_summary(self, session_id: str) -> str:
         """Obtiene un resumen del contexto de la conversación."""
         if session_id not in self.conversations:
             return ""
         
-        messages = self.conversations[session_id].get("messages", [])
-        if not messages:
+        summary = self.get_summary(session_id)
+        messages = self.get_unsummarized_messages(session_id, 10)
+        if not messages and not summary:
             return ""
         
-        context = "Contexto de conversación anterior:\n"
-        for msg in messages[-10:]:  # Last 10 messages
+        context = f"Resumen de la conversación:\n{summary}\n\n" if summary else ""
+        context += "Contexto de conversación anterior:\n"
+        for msg in messages:
             if msg.get('role') == 'user':
                 context += f"Usuario: {msg['content']}\n"
             elif msg.get('role') == 'assistant':
@@ -125,6 +298,15 @@ class ConversationMemory:
             self.conversations[session_id]["metadata"]["analysis_timestamp"] = datetime.now().isoformat()
             self._save_memory()
     
+    def mark_conversations_analyzed(self, session_ids: List[str]):
+        """Mark several conversations as analyzed with a single write."""
+        timestamp = datetime.now().isoformat()
+        for session_id in session_ids:
+            if session_id in self.conversations:
+                self.conversations[session_id]["metadata"]["analyzed_by_comprehend"] = True
+                self.conversations[session_id]["metadata"]["analysis_timestamp"] = timestamp
+        self._save_memory()
+    
     def get_unanalyzed_conversations(self) -> List[str]:
         """Get list of session IDs that haven't been analyzed yet."""
         unanalyzed = []
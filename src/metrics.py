@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas del pipeline en formato de texto de Prometheus.
+
+Histogramas de latencia (con `time.perf_counter`, monótono) por etapa:
+sentimiento, carga de conocimiento (catálogo y FAQ), armado del prompt, cada
+llamada a converse, herramientas, persistencia de memoria, escritura en el
+CRM, análisis por inactividad y demora de la cola de timers. Además,
+contadores de turnos, tokens, búsquedas en caché, herramientas y errores.
+`/api/metrics` los expone con `render()`.
+
+Cada hilo escribe en su propio shard (dicts locales del hilo), así registrar
+una métrica no toma locks ni compite con otros hilos. El lock solo se usa la
+primera vez que un hilo registra algo y al leer (`render`), que suma todos
+los shards; los de hilos terminados se acumulan en uno solo.
+
+Con `METRICS_ENABLED=false` los métodos de registro vuelven de inmediato.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from .config import CONFIG
+
+# Límites superiores (segundos) de los buckets de los histogramas
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# nombre -> (tipo, descripción); los nombres se publican con el prefijo del namespace
+METRIC_DEFINITIONS: Dict[str, Tuple[str, str]] = {
+    "stage_seconds": ("histogram", "Duración de cada etapa del pipeline"),
+    "turn_seconds": ("histogram", "Duración total de cada turno por origen de la respuesta"),
+    "converse_seconds": ("histogram", "Duración de cada llamada a converse (una por iteración del loop)"),
+    "timer_queue_lag_seconds": ("histogram", "Demora entre el vencimiento del timer de inactividad y el inicio del análisis"),
+    "turns_total": ("counter", "Turnos procesados por origen de la respuesta"),
+    "tokens_total": ("counter", "Tokens de Bedrock por modelo y tipo"),
+    "cache_lookups_total": ("counter", "Búsquedas en caché por resultado"),
+    "tool_calls_total": ("counter", "Ejecuciones de herramientas por estado"),
+    "converse_errors_total": ("counter", "Llamadas a converse fallidas por código de error"),
+    "errors_total": ("counter", "Errores por componente"),
+    "timer_queue_depth": ("gauge", "Sesiones con timer de inactividad pendiente"),
+    "analyses_in_flight": ("gauge", "Sesiones en análisis por inactividad"),
+    "analysis_batches_in_flight": ("gauge", "Lotes de análisis por inactividad en ejecución"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metrics:
+    """Contadores e histogramas con un shard por hilo."""
+
+    def __init__(self, enabled: bool = True, namespace: str = "assistant", buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # (hilo, contadores, histogramas) de cada hilo que registró algo
+        self._shards: List[Tuple[threading.Thread, Dict, Dict]] = []
+        self._retired_counters: Dict[Tuple[str, Labels], float] = {}
+        self._retired_histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]] = []
+
+    def _shard(self) -> Tuple[Dict, Dict]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = ({}, {})
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append((threading.current_thread(), *shard))
+        return shard
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        """Suma `value` al contador."""
+        if not self.enabled:
+            return
+        counters = self._shard()[0]
+        key = (name, tuple(sorted(labels.items())))
+        counters[key] = counters.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Registra una duración en el histograma."""
+        if not self.enabled:
+            return
+        histograms = self._shard()[1]
+        key = (name, tuple(sorted(labels.items())))
+        entry = histograms.get(key)
+        if entry is None:
+            # Un contador por bucket, el de +Inf y la suma
+            entry = histograms[key] = [0.0] * (len(self.buckets) + 2)
+        entry[bisect_left(self.buckets, seconds)] += 1
+        entry[-1] += seconds
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Mide el bloque y lo registra en el histograma `name`."""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def timed(self, name: str, **labels):
+        """Decorador: mide cada llamada de la función."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]):
+        """Registra una función que devuelve gauges `(nombre, labels, valor)` al leer las métricas."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def _merged(self) -> Tuple[Dict[Tuple[str, Labels], float], Dict[Tuple[str, Labels], List[float]]]:
+        """Suma de todos los shards; los de hilos terminados pasan al acumulado (con el lock tomado)."""
+        counters = dict(self._retired_counters)
+        histograms = {key: list(entry) for key, entry in self._retired_histograms.items()}
+        alive = []
+        for thread, shard_counters, shard_histograms in self._shards:
+            retired = not thread.is_alive()
+            if retired:
+                counters_target, histograms_target = self._retired_counters, self._retired_histograms
+            else:
+                alive.append((thread, shard_counters, shard_histograms))
+            for key, value in list(shard_counters.items()):
+                counters[key] = counters.get(key, 0.0) + value
+                if retired:
+                    counters_target[key] = counters_target.get(key, 0.0) + value
+            for key, entry in list(shard_histograms.items()):
+                entry = list(entry)
+                total = histograms.setdefault(key, [0.0] * len(entry))
+                for index, value in enumerate(entry):
+                    total[index] += value
+                if retired:
+                    target = histograms_target.setdefault(key, [0.0] * len(entry))
+                    for index, value in enumerate(entry):
+                        target[index] += value
+        self._shards = alive
+        return counters, histograms
+
+    def render(self) -> str:
+        """Todas las métricas en el formato de texto de Prometheus (0.0.4)."""
+        with self._lock:
+            counters, histograms = self._merged()
+            collectors = list(self._collectors)
+
+        gauges: Dict[Tuple[str, Labels], float] = {}
+        for collector in collectors:
+            try:
+                for name, labels, value in collector():
+                    gauges[(name, tuple(sorted(labels.items())))] = value
+            except Exception as e:
+                print(f"⚠️ [Metrics] Error en un collector: {e}")
+
+        series: Dict[str, List[str]] = {}
+        for (name, labels), value in sorted(counters.items()):
+            series.setdefault(name, []).append(f"{self.namespace}_{name}{_format_labels(labels)} {_format_number(value)}")
+        for (name, labels), value in sorted(gauges.items()):
+            series.setdefault(name, []).append(f"{self.namespace}_{name}{_format_labels(labels)} {_format_number(value)}")
+        for (name, labels), entry in sorted(histograms.items()):
+            lines = series.setdefault(name, [])
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), entry[:-1]):
+                cumulative += count
+                le = 'le="' + ("+Inf" if bound == float("inf") else _format_number(bound)) + '"'
+                lines.append(f"{self.namespace}_{name}_bucket{_format_labels(labels, le)} {_format_number(cumulative)}")
+            lines.append(f"{self.namespace}_{name}_sum{_format_labels(labels)} {repr(float(entry[-1]))}")
+            lines.append(f"{self.namespace}_{name}_count{_format_labels(labels)} {_format_number(cumulative)}")
+
+        output = []
+        for name in sorted(series):
+            kind, help_text = METRIC_DEFINITIONS.get(name, ("untyped", name))
+            output.append(f"# HELP {self.namespace}_{name} {help_text}")
+            output.append(f"# TYPE {self.namespace}_{name} {kind}")
+            output.extend(series[name])
+        return "\n".join(output) + "\n"
+
+
+# Instancia global de métricas
+metrics = Metrics(enabled=CONFIG["metrics_enabled"])
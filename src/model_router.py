@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Router de modelos de Bedrock por turno.
+
+Cada turno se clasifica en un nivel (`small`, `medium`, `large`) según la
+complejidad estimada: intent detectado, probabilidad de usar herramientas
+(apertura de cuenta, consulta de casos) y tamaño del prompt. Dentro del
+nivel se elige el modelo sano con menor p50 observado; si ningún modelo del
+nivel está sano se escala al siguiente nivel y, por último, a los inferiores.
+Un modelo se considera degradado cuando su tasa de error o su p95 reciente
+superan los límites configurados, y vuelve a probarse tras un enfriamiento.
+
+Cada decisión se escribe como una línea JSON (con la latencia y el resultado
+del turno) para evaluarla offline.
+"""
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .config import CONFIG
+
+TIERS = ("small", "medium", "large")
+
+_CASE_RE = re.compile(r"\b(?:caso|solicitud|ticket|tr[aá]mite)\b", re.IGNORECASE)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ModelHealth:
+    """Latencias y errores recientes de un modelo."""
+
+    def __init__(self, window: int = 50):
+        self.samples = deque(maxlen=window)  # (latencia en s, ok)
+        self.calls = 0
+        self.errors = 0
+        self.degraded_since: Optional[float] = None
+
+    def record(self, latency: float, ok: bool):
+        self.samples.append((latency, ok))
+        self.calls += 1
+        self.errors += not ok
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = [latency for latency, ok in self.samples if ok]
+        failures = sum(1 for _, ok in self.samples if not ok)
+        return {
+            "samples": len(self.samples),
+            "p50_ms": 1000 * _percentile(latencies, 0.5),
+            "p95_ms": 1000 * _percentile(latencies, 0.95),
+            "error_rate": failures / len(self.samples) if self.samples else 0.0,
+        }
+
+
+class RouteDecision:
+    """Modelo elegido para un turno y alternativas para failover."""
+
+    def __init__(self, decision_id: str, tier: str, candidates: List[str], features: Dict[str, Any], reason: str):
+        self.decision_id = decision_id
+        self.tier = tier
+        self.candidates = candidates
+        self.features = features
+        self.reason = reason
+        self.attempt = 0
+        self.started = time.perf_counter()
+
+    @property
+    def model_id(self) -> str:
+        return self.candidates[self.attempt]
+
+    def has_fallback(self) -> bool:
+        return self.attempt + 1 < len(self.candidates)
+
+    def next(self) -> "RouteDecision":
+        """Pasa al siguiente candidato (failover)."""
+        self.attempt += 1
+        return self
+
+
+class ModelRouter:
+    """Elige el modelo de cada turno según complejidad y salud observada."""
+
+    def __init__(self, pool: Dict[str, List[str]], log_file: Optional[str] = None, max_error_rate: float = 0.3,
+                 max_p95_seconds: float = 10.0, cooldown_seconds: float = 30.0, min_samples: int = 5):
+        self.pool = {tier: list(pool.get(tier, [])) for tier in TIERS}
+        self.log_file = log_file
+        self.max_error_rate = max_error_rate
+        self.max_p95_seconds = max_p95_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._health: Dict[str, ModelHealth] = {}
+        self._decisions: Counter = Counter()
+        self._failovers = 0
+
+    def classify(self, features: Dict[str, Any]) -> str:
+        """Nivel de complejidad del turno."""
+        if features.get("tool_likely"):
+            return "large"
+        if (features.get("history_messages", 0) > 6 or features.get("has_summary")
+                or features.get("message_tokens", 0) > 60):
+            return "medium"
+        if features.get("intent") != "otros" and features.get("intent_confidence", 0.0) >= 0.5:
+            return "small"
+        return "small" if features.get("message_tokens", 0) <= 20 else "medium"
+
+    @staticmethod
+    def turn_features(text: str, intent: str, intent_confidence: float, slot_state: Dict[str, Any],
+                      history_messages: int, has_summary: bool, message_tokens: int) -> Dict[str, Any]:
+        """Features de complejidad de un turno."""
+        return {
+            "intent": intent,
+            "intent_confidence": round(intent_confidence, 3),
+            "tool_likely": bool(slot_state.get("active") or slot_state.get("slots") or _CASE_RE.search(text or "")),
+            "history_messages": history_messages,
+            "has_summary": has_summary,
+            "message_tokens": message_tokens,
+        }
+
+    def _health_for(self, model_id: str) -> ModelHealth:
+        health = self._health.get(model_id)
+        if health is None:
+            health = self._health[model_id] = ModelHealth()
+        return health
+
+    def _is_healthy(self, model_id: str, now: float) -> bool:
+        health = self._health_for(model_id)
+        if health.degraded_since is not None:
+            if now - health.degraded_since < self.cooldown_seconds:
+                return False
+            # Tras el enfriamiento el modelo vuelve a probarse con una ventana limpia
+            health.degraded_since = None
+            health.samples.clear()
+        return True
+
+    def _check_degraded(self, model_id: str, health: ModelHealth):
+        if len(health.samples) < self.min_samples or health.degraded_since is not None:
+            return
+        snapshot = health.snapshot()
+        if snapshot["error_rate"] > self.max_error_rate or snapshot["p95_ms"] > 1000 * self.max_p95_seconds:
+            health.degraded_since = time.monotonic()
+            print(f"⚠️ [Router] {model_id} degradado (error_rate={snapshot['error_rate']:.2f}, p95={snapshot['p95_ms']:.0f} ms)")
+
+    def route(self, features: Dict[str, Any]) -> RouteDecision:
+        """Elige modelo y alternativas para el turno."""
+        tier = self.classify(features)
+        index = TIERS.index(tier)
+        # Primero el nivel pedido, luego los superiores y por último los inferiores
+        tier_order = list(TIERS[index:]) + list(reversed(TIERS[:index]))
+        now = time.monotonic()
+        with self._lock:
+            healthy, degraded = [], []
+            for candidate_tier in tier_order:
+                models = sorted(self.pool[candidate_tier], key=lambda m: self._health_for(m).snapshot()["p50_ms"])
+                for model_id in models:
+                    if model_id in healthy or model_id in degraded:
+                        continue
+                    (healthy if self._is_healthy(model_id, now) else degraded).append(model_id)
+            # Si todo está degradado se intenta igual en el orden preferido
+            candidates = healthy + degraded
+            reason = "preferred" if candidates and candidates[0] in self.pool[tier] else "failover"
+            self._decisions[tier] += 1
+        return RouteDecision(uuid.uuid4().hex, tier, candidates, features, reason)
+
+    def record_call(self, model_id: str, latency: float, ok: bool):
+        """Registra la latencia y el resultado de una llamada a converse."""
+        with self._lock:
+            health = self._health_for(model_id)
+            health.record(latency, ok)
+            self._check_degraded(model_id, health)
+
+    def record_failover(self):
+        """Cuenta un turno que pasó al siguiente modelo candidato."""
+        with self._lock:
+            self._failovers += 1
+
+    def log_decision(self, decision: RouteDecision, session_id: str, ok: bool):
+        """Escribe la decisión y su resultado en el log JSONL."""
+        if not self.log_file:
+            return
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "decision_id": decision.decision_id,
+            "session_id": session_id,
+            "tier": decision.tier,
+            "model_id": decision.model_id,
+            "attempts": decision.attempt + 1,
+            "reason": decision.reason,
+            "features": decision.features,
+            "latency_ms": round(1000 * (time.perf_counter() - decision.started), 1),
+            "ok": ok,
+        }
+        try:
+            with self._log_lock, open(self.log_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"❌ [Router] Error escribiendo log de decisiones: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Salud por modelo y decisiones por nivel."""
+        now = time.monotonic()
+        with self._lock:
+            models = {}
+            for tier in TIERS:
+                for model_id in self.pool[tier]:
+                    health = self._health_for(model_id)
+                    models[model_id] = dict(
+                        health.snapshot(),
+                        tier=tier,
+                        calls=health.calls,
+                        errors=health.errors,
+                        degraded=health.degraded_since is not None and now - health.degraded_since < self.cooldown_seconds,
+                    )
+            return {"models": models, "decisions_by_tier": dict(self._decisions), "failovers": self._failovers}
+
+
+# Instancia global del router de modelos
+model_router = ModelRouter(
+    CONFIG["bedrock_model_pool"],
+    log_file=CONFIG["model_router_log_file"],
+    max_error_rate=CONFIG["model_router_max_error_rate"],
+    max_p95_seconds=CONFIG["model_router_max_p95_seconds"],
+    cooldown_seconds=CONFIG["model_router_cooldown_seconds"],
+)
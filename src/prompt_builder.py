@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Constructor del prompt del sistema en bloques ordenados.
+
+El prompt del sistema es un prefijo estático (persona, catálogo de productos,
+FAQ, instrucciones y herramientas) seguido, si existe, del resumen acumulado
+de la sesión. El prefijo se construye una vez y se reutiliza byte a byte
+mientras no cambien la FAQ ni las herramientas; en los modelos que lo
+soportan va seguido de un `cachePoint` para que Bedrock no vuelva a
+procesarlo en cada llamada. El historial viaja como mensajes de Converse y el
+contexto propio del turno (apertura de cuenta en curso, recomendaciones) se
+agrega al mensaje actual del usuario.
+
+Antes de armar los bloques, el planificador de tokens verifica que todo quepa
+en el presupuesto de entrada. Si no cabe, se conservan los productos y
+preguntas frecuentes más relevantes para el mensaje y el historial más
+reciente; ese prefijo reducido no lleva `cachePoint`.
+"""
+import os
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .analysis_index import normalize_terms
+from .config import CONFIG
+from .faq_loader import get_faq_entries, get_faq_text
+from .prompt_planner import PromptPlanner
+from .tools import base_model_id
+
+PERSONA = "Eres un asistente bancario de Banesco Panamá. Eres amigable, profesional y experto en productos bancarios."
+
+FAQ_INTRO = (
+    "Esta es una lista de preguntas frecuentes que puedes usar para responder las consultas del usuario, "
+    "las preguntas no tienen que ser necesariamente las mismas que las preguntas frecuentes, "
+    "puedes usar las preguntas frecuentes como base para tu respuesta."
+)
+
+INSTRUCTIONS = """Instrucciones:
+- Responde en español de manera clara y útil
+- Usa la información de productos proporcionada para dar respuestas precisas
+- Si el usuario pregunta sobre productos específicos, proporciona detalles de requisitos, beneficios y tarifas
+- Usa las preguntas frecuentes (FAQ) proporcionadas para responder consultas comunes
+- Si encuentras una FAQ relevante, úsala como base para tu respuesta
+- Si no tienes información específica, deriva al usuario a un representante
+- Mantén un tono profesional pero amigable"""
+
+CACHE_POINT_BLOCK: Dict[str, Any] = {"cachePoint": {"type": "default"}}
+
+# Etiquetas del formato de productos y FAQ; no cuentan para la relevancia
+_LABEL_TERMS = {"descripcion", "requisitos", "beneficios", "tarifa", "categoria"}
+
+# Mensajes de historial que se consideran; los más recientes tienen prioridad
+HISTORY_MESSAGES = 10
+RECENT_MESSAGES = 4
+
+
+def supports_prompt_caching(model_id: str) -> bool:
+    """Indica si el modelo acepta bloques `cachePoint` en Converse."""
+    base_id = base_model_id(model_id)
+    return any(base_id.startswith(prefix) for prefix in CONFIG["bedrock_prompt_cache_models"])
+
+
+class PromptBuilder:
+    """Arma los bloques `system` de Converse con el prefijo estático primero."""
+
+    def __init__(self, context: str, products: List[Dict[str, str]], faq_file: str = 'data/faq.csv',
+                 budget_tokens: Optional[int] = None):
+        self.context = context
+        self.products = products
+        self._product_terms = [set(normalize_terms(f"{p['categoria']} {p['text']}")) - _LABEL_TERMS for p in products]
+        self.faq_file = faq_file
+        self.planner = PromptPlanner(budget_tokens or CONFIG["prompt_token_budget"])
+        self._lock = threading.Lock()
+        self._faq_mtime: Optional[float] = None
+        self._faq_text = ""
+        self._faq_items: List[str] = []
+        self._faq_terms: List[set] = []
+        # tool_instructions -> prefijo estático ya armado
+        self._prefixes: Dict[str, str] = {}
+        self.stats = {"calls": 0, "trimmed_calls": 0}
+        self._tokens_by_section: Counter = Counter()
+
+    def _current_faq(self) -> str:
+        """Texto de la FAQ; el CSV solo se relee cuando cambia su mtime."""
+        mtime = os.path.getmtime(self.faq_file) if os.path.exists(self.faq_file) else None
+        if mtime != self._faq_mtime:
+            self._faq_mtime = mtime
+            self._faq_text = get_faq_text()
+            entries = get_faq_entries(self.faq_file)
+            # Mismo formato que get_faq_text, una pregunta por item
+            self._faq_items = [
+                f"{i}. P: {entry['pregunta']}\n   R: {entry['respuesta']}\n   Categoría: {entry['categoria']}\n\n"
+                for i, entry in enumerate(entries, 1)
+            ]
+            self._faq_terms = [set(normalize_terms(item)) - _LABEL_TERMS for item in self._faq_items]
+            self._prefixes.clear()
+        return self._faq_text
+
+    def static_prefix(self, tool_instructions: str) -> str:
+        """Prefijo estático; el mismo objeto mientras no cambien la FAQ ni las herramientas."""
+        with self._lock:
+            faq_text = self._current_faq()
+            prefix = self._prefixes.get(tool_instructions)
+            if prefix is None:
+                prefix = f"""{PERSONA}
+
+{self.context}
+
+{FAQ_INTRO}
+
+
+{faq_text}
+
+{INSTRUCTIONS}
+
+{tool_instructions}"""
+                self._prefixes[tool_instructions] = prefix
+            return prefix
+
+    def build(self, model_id: str, tool_instructions: str, message: str, history: List[Dict[str, Any]],
+              account_opening_status: str = "", product_recommendations: str = "",
+              summary: str = "") -> Dict[str, Any]:
+        """Arma el prompt del turno dentro del presupuesto de tokens.
+
+        Devuelve `system` (bloques), `history_messages` (cuántos de los
+        mensajes más recientes del historial enviar), `turn_context` (texto
+        para el mensaje actual) y `report` (tokens por sección).
+        """
+        with self._lock:
+            self._current_faq()
+            faq_items, faq_terms = self._faq_items, self._faq_terms
+        query = set(normalize_terms(message)) - _LABEL_TERMS
+        relevant_products, other_products = _split_relevant(self._product_terms, query)
+        relevant_faq, other_faq = _split_relevant(faq_terms, query)
+
+        # Historial del más reciente al más antiguo
+        recent = [msg.get('content', '') for msg in reversed(history[-HISTORY_MESSAGES:])]
+
+        kept, report = self.planner.plan([
+            {"name": "instructions", "priority": 0, "required": True,
+             "items": [PERSONA, FAQ_INTRO, INSTRUCTIONS, tool_instructions]},
+            {"name": "account_opening", "priority": 0, "required": True, "items": [account_opening_status]},
+            {"name": "products", "priority": 1, "items": [self.products[i]["text"] for i in relevant_products]},
+            {"name": "faq", "priority": 1, "items": [faq_items[i] for i in relevant_faq]},
+            {"name": "recommendations", "priority": 1, "items": [product_recommendations]},
+            {"name": "recent_history", "priority": 2, "items": recent[:RECENT_MESSAGES]},
+            {"name": "summary", "priority": 2, "items": [summary]},
+            {"name": "older_history", "priority": 3, "items": recent[RECENT_MESSAGES:]},
+            # El resto del catálogo y la FAQ completan el prefijo estático si hay espacio
+            {"name": "other_products", "priority": 4, "items": [self.products[i]["text"] for i in other_products]},
+            {"name": "other_faq", "priority": 4, "items": [faq_items[i] for i in other_faq]},
+        ])
+
+        trimmed = any(entry["kept"] < entry["items"] for entry in report.values())
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["trimmed_calls"] += trimmed
+            for name, entry in report.items():
+                self._tokens_by_section[name] += entry["tokens"]
+
+        # El historial antiguo solo cuenta si el reciente entró completo (se mantiene contiguo)
+        history_messages = report["recent_history"]["kept"]
+        if history_messages == report["recent_history"]["items"]:
+            history_messages += report["older_history"]["kept"]
+        summary_text = f"Resumen de la conversación anterior:\n{summary}" if kept["summary"] else ""
+        turn_context = "\n\n".join(
+            section for section in (account_opening_status, product_recommendations if kept["recommendations"] else "") if section
+        )
+        plan = {"history_messages": history_messages, "turn_context": turn_context, "report": report}
+
+        knowledge = ("products", "faq", "other_products", "other_faq")
+        if all(report[name]["kept"] == report[name]["items"] for name in knowledge):
+            plan["system"] = self.system_blocks(model_id, tool_instructions, [summary_text])
+            return plan
+
+        # El catálogo o la FAQ no caben: prefijo con lo más relevante, sin cachePoint
+        kept_products = set(kept["products"] + kept["other_products"])
+        product_texts = [product["text"] for product in self.products if product["text"] in kept_products]
+        others = [product["producto"] for product in self.products if product["text"] not in kept_products]
+        catalog = "Información de productos bancarios de Banesco Panamá (selección para esta consulta):\n\n" + "".join(product_texts)
+        if others:
+            catalog += f"Otros productos disponibles: {', '.join(others)}\n"
+        kept_faq = set(kept["faq"] + kept["other_faq"])
+        faq_text = "\n\nPREGUNTAS FRECUENTES (FAQ):\n" + "".join(item for item in faq_items if item in kept_faq)
+        prefix = f"""{PERSONA}
+
+{catalog}
+
+{FAQ_INTRO}
+
+
+{faq_text}
+
+{INSTRUCTIONS}
+
+{tool_instructions}"""
+        plan["system"] = [{"text": prefix}]
+        if summary_text:
+            plan["system"].append({"text": summary_text})
+        return plan
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Llamadas recortadas y tokens promedio por sección."""
+        with self._lock:
+            calls = self.stats["calls"]
+            return {
+                "calls": calls,
+                "trimmed_calls": self.stats["trimmed_calls"],
+                "token_budget": self.planner.budget_tokens,
+                "avg_tokens_by_section": {
+                    name: tokens / calls for name, tokens in self._tokens_by_section.items()
+                } if calls else {},
+            }
+
+    def system_blocks(self, model_id: str, tool_instructions: str, dynamic_sections: Sequence[str]) -> List[Dict[str, Any]]:
+        """Bloques `system`: prefijo estático, `cachePoint` si aplica y las secciones de la sesión."""
+        blocks: List[Dict[str, Any]] = [{"text": self.static_prefix(tool_instructions)}]
+        if supports_prompt_caching(model_id):
+            blocks.append(CACHE_POINT_BLOCK)
+        dynamic = "\n\n".join(section for section in dynamic_sections if section)
+        if dynamic:
+            blocks.append({"text": dynamic})
+        return blocks
+
+    @staticmethod
+    def layout(blocks: List[Dict[str, Any]]) -> List[Tuple[str, int]]:
+        """Resumen (tipo, caracteres) de los bloques, para logs."""
+        return [("cachePoint", 0) if "cachePoint" in block else ("text", len(block["text"])) for block in blocks]
+
+
+def _split_relevant(item_terms: List[set], query: set) -> Tuple[List[int], List[int]]:
+    """Índices de items con términos del mensaje (de más a menos en común) y del resto."""
+    overlap = [len(terms & query) for terms in item_terms]
+    relevant = sorted((i for i, count in enumerate(overlap) if count), key=lambda i: -overlap[i])
+    return relevant, [i for i, count in enumerate(overlap) if not count]
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Planificador de tokens del prompt.
+
+Estima los tokens de cada sección con una aproximación local (sin tokenizer
+del modelo) y reparte un presupuesto de entrada por prioridad: primero las
+secciones obligatorias (instrucciones y herramientas), luego productos y FAQ
+relevantes, luego el historial reciente y por último el historial antiguo.
+Cada sección es una lista de items ordenados por preferencia; de las
+secciones que no caben completas se conservan los primeros items.
+"""
+import re
+from functools import lru_cache
+from itertools import groupby
+from typing import Any, Dict, List, Tuple
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=4096)
+def estimate_tokens(text: str) -> int:
+    """Aproximación rápida: un token por signo y por cada 5 caracteres de palabra."""
+    return sum(1 + (len(piece) - 1) // 5 for piece in _PIECE_RE.findall(text or ""))
+
+
+class PromptPlanner:
+    """Reparte el presupuesto de tokens de entrada entre secciones del prompt."""
+
+    def __init__(self, budget_tokens: int):
+        self.budget_tokens = budget_tokens
+
+    def plan(self, sections: List[Dict[str, Any]]) -> Tuple[Dict[str, List[str]], Dict[str, Dict[str, int]]]:
+        """Elige los items de cada sección que caben en el presupuesto.
+
+        Cada sección es `{"name", "priority", "items", "required"}`; menor
+        prioridad se atiende primero. Las secciones con la misma prioridad se
+        llenan item por item en turnos, para que ninguna acapare el presupuesto.
+        Una sección deja de crecer en su primer item que no cabe, así el
+        historial se mantiene contiguo.
+
+        Devuelve los items conservados por sección y un reporte con los
+        tokens pedidos y usados.
+        """
+        remaining = self.budget_tokens
+        kept: Dict[str, List[str]] = {section["name"]: [] for section in sections}
+        report: Dict[str, Dict[str, int]] = {}
+        items: Dict[str, List[str]] = {}
+        costs: Dict[str, List[int]] = {}
+        for section in sections:
+            name = section["name"]
+            items[name] = [item for item in section["items"] if item]
+            costs[name] = [estimate_tokens(item) for item in items[name]]
+            report[name] = {"requested": sum(costs[name]), "tokens": 0, "items": len(items[name]), "kept": 0}
+
+        ordered = sorted(sections, key=lambda section: section["priority"])
+        for _, group in groupby(ordered, key=lambda section: section["priority"]):
+            group = list(group)
+            for section in group:
+                if section.get("required"):
+                    name = section["name"]
+                    kept[name] = list(items[name])
+                    report[name]["tokens"] = report[name]["requested"]
+                    report[name]["kept"] = len(items[name])
+                    remaining -= report[name]["requested"]
+
+            # Turnos entre las secciones opcionales de esta prioridad
+            open_names = [section["name"] for section in group if not section.get("required")]
+            position = 0
+            while open_names:
+                still_open = []
+                for name in open_names:
+                    if position >= len(items[name]) or costs[name][position] > remaining:
+                        continue
+                    remaining -= costs[name][position]
+                    kept[name].append(items[name][position])
+                    report[name]["tokens"] += costs[name][position]
+                    report[name]["kept"] += 1
+                    still_open.append(name)
+                open_names = still_open
+                position += 1
+
+        return kept, report
+
+    @staticmethod
+    def format_report(report: Dict[str, Dict[str, int]]) -> str:
+        """Línea de log con tokens usados por sección y items conservados."""
+        parts = [
+            f"{name}={entry['tokens']}" + (f"({entry['kept']}/{entry['items']})" if entry["kept"] < entry["items"] else "")
+            for name, entry in report.items()
+        ]
+        total = sum(entry["tokens"] for entry in report.values())
+        return f"{' '.join(parts)} total={total}"
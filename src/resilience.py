@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+Resiliencia de las llamadas a Bedrock.
+
+- `Deadline`: tiempo límite de un turno, compartido por todas las llamadas e
+  iteraciones del loop del agente.
+- Reintentos con backoff exponencial y jitter completo para errores de
+  throttling, sin superar el deadline.
+- Un circuit breaker por modelo y endpoint: tras varias fallas seguidas deja
+  de llamar al modelo durante un tiempo y luego deja pasar una llamada de
+  prueba.
+
+Cada llamada corre en un pool propio y se espera solo lo que queda del
+deadline; una llamada lenta deja de bloquear el turno (el hilo termina en
+segundo plano, acotado por el timeout del cliente). Si el deadline vence
+con la llamada todavía en la cola del pool, se cancela y cuenta como
+`saturated`, no como falla del modelo.
+"""
+import contextvars
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict
+
+from .config import CONFIG
+
+# Códigos de error de Bedrock que vale la pena reintentar
+RETRYABLE_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+# Errores del request (no del servicio); no cuentan para el breaker
+CLIENT_ERROR_CODES = {
+    "ValidationException",
+    "AccessDeniedException",
+    "ResourceNotFoundException",
+}
+
+
+class ResilienceError(Exception):
+    """Error de una llamada protegida que el agente puede degradar."""
+
+
+class DeadlineExceeded(ResilienceError):
+    """No queda tiempo del turno para (re)intentar la llamada."""
+
+
+class CircuitOpenError(ResilienceError):
+    """El circuit breaker del modelo está abierto."""
+
+
+class RetriesExhausted(ResilienceError):
+    """Throttling persistente tras todos los reintentos."""
+
+
+def error_code(error: Exception) -> str:
+    """Código de error de botocore (`ClientError.response`), o el nombre de la excepción."""
+    code = getattr(error, "response", {}).get("Error", {}).get("Code", "")
+    return code or type(error).__name__
+
+
+def is_retryable(error: Exception) -> bool:
+    return error_code(error) in RETRYABLE_ERROR_CODES
+
+
+class Deadline:
+    """Tiempo límite absoluto de un turno."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+
+class CircuitBreaker:
+    """Circuit breaker clásico: closed → open → half_open → closed."""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Indica si se puede llamar; en half_open pasa una sola llamada de prueba."""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    return False
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open":
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opens += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Libera la llamada de prueba de half_open sin registrar resultado (la llamada no llegó a hacerse)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self.opened_at < self.reset_seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures, "opens": self.opens}
+
+
+class ResilientCaller:
+    """Ejecuta llamadas con deadline, reintentos con jitter y circuit breaker por clave."""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0,
+                 failure_threshold: int = 5, reset_seconds: float = 30.0, max_workers: int = 16):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bedrock")
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self.stats: Counter = Counter()
+
+    def breaker(self, key: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+            return breaker
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def call(self, key: str, fn: Callable[[], Any], deadline: Deadline) -> Any:
+        """Llama `fn` protegida por el breaker de `key` y el deadline del turno.
+
+        Los errores de throttling se reintentan; el resto se propaga tal cual
+        (el agente decide si son recuperables).
+        """
+        breaker = self.breaker(key)
+        for attempt in range(1, self.max_attempts + 1):
+            if deadline.expired():
+                self._count("deadline_exceeded")
+                raise DeadlineExceeded(f"Sin tiempo para llamar a {key}")
+            if not breaker.allow():
+                self._count("short_circuited")
+                raise CircuitOpenError(f"Circuit breaker abierto para {key}")
+
+            self._count("calls")
+            # El contexto del turno (contextvars) acompaña a la llamada en el hilo del executor
+            future = self._executor.submit(contextvars.copy_context().run, fn)
+            try:
+                result = future.result(timeout=deadline.remaining())
+            except FutureTimeoutError:
+                self._count("deadline_exceeded")
+                # cancel() solo funciona si la llamada sigue en la cola, es decir, si nunca empezó
+                if future.cancel():
+                    # Se venció esperando un worker libre: es saturación local, no una falla del modelo
+                    breaker.release()
+                    self._count("saturated")
+                    raise DeadlineExceeded(f"{key}: sin workers libres dentro del deadline ({deadline.seconds:.0f}s)")
+                breaker.record_failure()
+                raise DeadlineExceeded(f"{key} no respondió dentro del deadline ({deadline.seconds:.0f}s)")
+            except Exception as e:
+                if error_code(e) in CLIENT_ERROR_CODES:
+                    breaker.record_success()
+                    self._count("errors")
+                    raise
+                breaker.record_failure()
+                if not is_retryable(e):
+                    self._count("errors")
+                    raise
+                self._count("throttled")
+                if attempt == self.max_attempts:
+                    raise RetriesExhausted(f"{key}: {error_code(e)} tras {attempt} intentos") from e
+                # Backoff exponencial con jitter completo, sin pasar el deadline
+                delay = self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                if delay >= deadline.remaining():
+                    self._count("deadline_exceeded")
+                    raise DeadlineExceeded(f"{key}: sin tiempo para reintentar tras {error_code(e)}") from e
+                self._count("retries")
+                print(f"🔁 [Resilience] {error_code(e)} en {key}, reintento {attempt} en {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            breaker.record_success()
+            return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores de llamadas/reintentos y estado de cada breaker."""
+        with self._lock:
+            breakers = dict(self._breakers)
+            stats = dict(self.stats)
+        stats["breakers"] = {key: breaker.snapshot() for key, breaker in breakers.items()}
+        return stats
+
+
+# Instancia global para las llamadas a Bedrock
+bedrock_caller = ResilientCaller(
+    max_attempts=CONFIG["bedrock_max_attempts"],
+    base_delay=CONFIG["bedrock_retry_base_seconds"],
+    max_delay=CONFIG["bedrock_retry_max_seconds"],
+    failure_threshold=CONFIG["bedrock_breaker_failures"],
+    reset_seconds=CONFIG["bedrock_breaker_reset_seconds"],
+    max_workers=CONFIG["bedrock_max_concurrency"],
+)
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Caché semántica de respuestas del modelo.
+
+Las preguntas se normalizan y se vectorizan localmente con TF-IDF sobre
+n-gramas de caracteres y palabras proyectados con hashing a un espacio fijo.
+Los vectores (normalizados L2) viven en una matriz NumPy, así que una búsqueda
+es un producto matriz-vector. La IDF se ajusta con la FAQ y el catálogo de
+productos; si cualquiera de esos archivos cambia, la caché se vacía.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .config import CONFIG
+
+_TOKEN_RE = re.compile(r"\w+")
+# Palabras que no cambian la pregunta ("¿cuáles son los horarios?" == "horarios")
+_STOPWORDS = {
+    "el", "la", "los", "las", "de", "del", "un", "una", "unos", "unas", "y", "o", "a",
+    "en", "mi", "mis", "su", "sus", "por", "para", "al", "lo", "me", "se", "es", "son",
+    "que", "cual", "cuales", "como", "hay", "tienen", "puedo", "quisiera", "saber",
+}
+# Archivos cuyo contenido determina las respuestas; un cambio invalida la caché
+SNAPSHOT_FILES = ("data/faq.csv", "data/banesco_context.csv")
+
+
+def normalize_question(text: str) -> str:
+    """Minúsculas, sin acentos, puntuación ni palabras vacías."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(token for token in _TOKEN_RE.findall(text) if token not in _STOPWORDS)
+
+
+class HashedTfidfVectorizer:
+    """TF-IDF sobre n-gramas proyectados con hashing (sin vocabulario)."""
+
+    def __init__(self, dim: int = 2 ** 12, char_ngrams: Sequence[int] = (3, 4)):
+        self.dim = dim
+        self.char_ngrams = char_ngrams
+        self.idf = np.ones(dim, dtype=np.float32)
+
+    def _buckets(self, normalized: str) -> List[int]:
+        features = [f"w:{word}" for word in normalized.split()]
+        padded = f" {normalized} "
+        for n in self.char_ngrams:
+            features.extend(f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1))
+        return [zlib.crc32(feature.encode("utf-8")) % self.dim for feature in features]
+
+    def fit(self, documents: Sequence[str]):
+        """Ajusta la IDF; los buckets no vistos reciben la IDF máxima."""
+        df = np.zeros(self.dim, dtype=np.float32)
+        for document in documents:
+            df[np.unique(self._buckets(normalize_question(document)))] += 1
+        self.idf = (np.log((1 + len(documents)) / (1 + df)) + 1).astype(np.float32)
+
+    def transform(self, normalized: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        buckets = self._buckets(normalized)
+        if not buckets:
+            return vector
+        np.add.at(vector, buckets, 1.0)
+        nonzero = vector > 0
+        vector[nonzero] = (1 + np.log(vector[nonzero])) * self.idf[nonzero]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SemanticResponseCache:
+    """Caché de respuestas con búsqueda por similitud coseno."""
+
+    def __init__(self, threshold: float = 0.9, max_entries: int = 2000, ttl_seconds: float = 86400,
+                 snapshot_files: Sequence[str] = SNAPSHOT_FILES, dim: int = 2 ** 12):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.snapshot_files = tuple(snapshot_files)
+        self.vectorizer = HashedTfidfVectorizer(dim)
+        self._lock = threading.Lock()
+        # La matriz crece por duplicación hasta max_entries filas
+        self._matrix = np.zeros((min(64, max_entries), dim), dtype=np.float32)
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * max_entries
+        self._rows_by_question: Dict[str, int] = {}
+        # Las filas se reutilizan en orden circular: la entrada más antigua sale primero
+        self._next_row = 0
+        self._size = 0
+        self._snapshot_mtimes: Dict[str, float] = {}
+        self._snapshot = None
+        self.stats = {
+            "lookups": 0, "hits": 0, "stores": 0, "invalidations": 0,
+            "lookup_seconds": 0.0, "saved_seconds": 0.0,
+        }
+        self._refresh_snapshot()
+
+    def _snapshot_digest(self) -> str:
+        digest = hashlib.sha256()
+        for path in self.snapshot_files:
+            try:
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+            except OSError:
+                digest.update(b"-")
+        return digest.hexdigest()
+
+    def _refresh_snapshot(self):
+        """Vacía la caché y reajusta la IDF si la FAQ o el catálogo cambiaron.
+
+        Solo se relee el contenido cuando cambia el mtime de algún archivo.
+        """
+        mtimes = {path: os.path.getmtime(path) if os.path.exists(path) else 0.0 for path in self.snapshot_files}
+        if mtimes == self._snapshot_mtimes:
+            return
+        self._snapshot_mtimes = mtimes
+        snapshot = self._snapshot_digest()
+        if snapshot == self._snapshot:
+            return
+
+        documents = []
+        for path in self.snapshot_files:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    documents.extend(line for line in f if line.strip())
+            except OSError:
+                continue
+        self.vectorizer.fit(documents)
+
+        if self._snapshot is not None:
+            self.stats["invalidations"] += 1
+            print(f"🗑️ [Cache] FAQ/catálogo modificados: se descartan {self._size} respuestas en caché")
+        self._snapshot = snapshot
+        self._reset()
+
+    def _reset(self):
+        self._matrix = np.zeros((min(64, self.max_entries), self.vectorizer.dim), dtype=np.float32)
+        self._entries = [None] * self.max_entries
+        self._rows_by_question = {}
+        self._next_row = 0
+        self._size = 0
+
+    def lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        """Respuesta en caché para una pregunta similar, o None."""
+        started = time.perf_counter()
+        normalized = normalize_question(question)
+        with self._lock:
+            self._refresh_snapshot()
+            self.stats["lookups"] += 1
+            hit = None
+            if normalized and self._size:
+                row = self._rows_by_question.get(normalized)
+                similarity = 1.0
+                if row is None:
+                    scores = self._matrix[:self._size] @ self.vectorizer.transform(normalized)
+                    row = int(np.argmax(scores))
+                    similarity = float(scores[row])
+                entry = self._entries[row]
+                if similarity >= self.threshold and time.time() - entry["created_at"] <= self.ttl_seconds:
+                    entry["hits"] += 1
+                    self.stats["hits"] += 1
+                    self.stats["saved_seconds"] += entry["latency_seconds"]
+                    hit = {"message": entry["response"], "similarity": similarity, "question": entry["question"]}
+            self.stats["lookup_seconds"] += time.perf_counter() - started
+        return hit
+
+    def store(self, question: str, response: str, latency_seconds: float = 0.0):
+        """Guarda la respuesta del modelo para una pregunta sin contexto de sesión."""
+        normalized = normalize_question(question)
+        if not normalized or not response:
+            return
+        vector = self.vectorizer.transform(normalized)
+        with self._lock:
+            row = self._rows_by_question.get(normalized)
+            if row is None:
+                row = self._next_row
+                self._next_row = (self._next_row + 1) % self.max_entries
+                if row >= len(self._matrix):
+                    grown = np.zeros((min(2 * len(self._matrix), self.max_entries), self.vectorizer.dim), dtype=np.float32)
+                    grown[:len(self._matrix)] = self._matrix
+                    self._matrix = grown
+                self._size = min(self._size + 1, self.max_entries)
+                previous = self._entries[row]
+                if previous is not None:
+                    self._rows_by_question.pop(previous["normalized"], None)
+            self._matrix[row] = vector
+            self._entries[row] = {
+                "question": question,
+                "normalized": normalized,
+                "response": response,
+                "latency_seconds": latency_seconds,
+                "created_at": time.time(),
+                "hits": 0,
+            }
+            self._rows_by_question[normalized] = row
+            self.stats["stores"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Tasa de aciertos, latencia de búsqueda y latencia de modelo ahorrada."""
+        with self._lock:
+            lookups = self.stats["lookups"]
+            return {
+                "entries": self._size,
+                "lookups": lookups,
+                "hits": self.stats["hits"],
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "stores": self.stats["stores"],
+                "invalidations": self.stats["invalidations"],
+                "avg_lookup_ms": 1000 * self.stats["lookup_seconds"] / lookups if lookups else 0.0,
+                "saved_model_seconds": self.stats["saved_seconds"],
+                "threshold": self.threshold,
+            }
+
+
+# Instancia global de la caché
+response_cache = SemanticResponseCache(
+    threshold=CONFIG["response_cache_threshold"],
+    max_entries=CONFIG["response_cache_max_entries"],
+    ttl_seconds=CONFIG["response_cache_ttl_seconds"],
+)
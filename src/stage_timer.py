@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Tiempos por etapa de cada turno del agente.
+
+El agente marca las etapas del turno (sentimiento, slots, router de intents,
+caché, lectura de memoria, armado del prompt, converse, herramientas y
+escritura de memoria) y devuelve los milisegundos acumulados de cada una en
+`timings_ms`. El servidor web los expone en el header `Server-Timing`, que es
+lo que lee la prueba de carga (`benchmarks/load_test.py`).
+
+Los tiempos se guardan por hilo: cada request del servidor corre en su propio
+hilo y no hace falta pasar el temporizador por todas las funciones.
+
+Cada etapa medida también se registra en el histograma `stage_seconds` de
+`src/metrics.py`, dentro o fuera de un turno.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from .metrics import metrics
+
+
+class StageTimer:
+    """Acumula el tiempo de cada etapa del turno en curso del hilo."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def begin(self):
+        """Empieza un turno nuevo en este hilo."""
+        self._local.stages = {}
+        self._local.started = time.perf_counter()
+
+    def add(self, name: str, seconds: float):
+        """Suma tiempo a una etapa; fuera de un turno solo lo registra en las métricas."""
+        metrics.observe("stage_seconds", seconds, stage=name)
+        stages = getattr(self._local, "stages", None)
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mide el bloque como parte de la etapa `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def end(self) -> Dict[str, float]:
+        """Termina el turno y devuelve los milisegundos por etapa, con el total."""
+        stages = getattr(self._local, "stages", None) or {}
+        started = getattr(self._local, "started", None)
+        timings = {name: round(1000 * seconds, 2) for name, seconds in stages.items()}
+        if started is not None:
+            timings["total"] = round(1000 * (time.perf_counter() - started), 2)
+        self._local.stages = None
+        self._local.started = None
+        return timings
+
+    @staticmethod
+    def server_timing(timings: Dict[str, float]) -> str:
+        """Valor del header `Server-Timing` (`etapa;dur=ms, ...`)."""
+        return ", ".join(f"{name};dur={ms}" for name, ms in timings.items())
+
+
+# Instancia global del temporizador
+stage_timer = StageTimer()
@@ -1,110 +1,262 @@
 # -*- coding: utf-8 -*-
 """
 Timer manager for handling conversation inactivity analysis.
+
+Instead of one `threading.Timer` per session, deadlines live in a heap served
+by a single scheduler thread. Due sessions are coalesced into batches of up to
+`max_batch_size` that are analyzed as one job with the Comprehend batch APIs
+(one round trip per metric for the whole batch), each deadline gets a random
+jitter so traffic spikes don't turn into a synchronized analysis wave, and a
+worker pool caps how many batch jobs run at once (`max_in_flight`).
 """
-import asyncio
+import heapq
+import random
 import threading
 import time
-from typing import Dict, Optional
-from datetime import datetime, timedelta
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
 from .memory import memory
 from .comprehend_analyzer import comprehend_analyzer
+from .config import CONFIG
+from .metrics import metrics
 from .colors import print_timer, print_success, print_warning, print_error
 
 class ConversationTimerManager:
     """Manages timers for conversation inactivity analysis."""
-    
-    def __init__(self, inactivity_minutes: int = 1):
+
+    def __init__(self, inactivity_minutes: int = 1, jitter_seconds: float = 15.0,
+                 batch_window_seconds: float = 2.0, max_batch_size: int = 25,
+                 max_in_flight: int = 4):
         self.inactivity_minutes = inactivity_minutes
-        self.active_timers: Dict[str, threading.Timer] = {}
+        self.jitter_seconds = jitter_seconds
+        self.batch_window_seconds = batch_window_seconds
+        self.max_batch_size = max_batch_size
+        self.max_in_flight = max_in_flight
         self.running = False
         self._lock = threading.Lock()
-    
+        self._wakeup = threading.Condition(self._lock)
+        # session_id -> deadline (time.monotonic); the heap may hold stale entries
+        self._deadlines: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        # Sessions being analyzed and batch jobs running
+        self._in_flight: Set[str] = set()
+        self._batches_in_flight = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        # Metrics
+        self._lag_samples: deque = deque(maxlen=1000)
+        self._analyses_completed = 0
+        self._batches_dispatched = 0
+        metrics.add_collector(self._collect_gauges)
+
+    def _ensure_running(self):
+        """Start the scheduler thread on first use (caller holds the lock)."""
+        if self.running:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="analysis")
+        self._thread = threading.Thread(target=self._scheduler_loop, name="analysis-scheduler", daemon=True)
+        self.running = True
+        self._thread.start()
+
     def start_timer(self, session_id: str):
         """Start or restart timer for a session."""
+        delay = self.inactivity_minutes * 60 + random.uniform(0, self.jitter_seconds)
+        deadline = time.monotonic() + delay
         with self._lock:
-            # Cancel existing timer if any
-            if session_id in self.active_timers:
-                self.active_timers[session_id].cancel()
-            
-            # Create new timer
-            timer = threading.Timer(
-                self.inactivity_minutes * 60,  # Convert to seconds
-                self._analyze_conversation,
-                args=[session_id]
-            )
-            timer.daemon = True
-            timer.start()
-            
-            self.active_timers[session_id] = timer
-            print_timer(f"Timer started for session {session_id} ({self.inactivity_minutes} min)")
-    
+            self._ensure_running()
+            self._deadlines[session_id] = deadline
+            heapq.heappush(self._heap, (deadline, session_id))
+            self._wakeup.notify()
+        print_timer(f"Timer started for session {session_id} ({delay:.0f}s)")
+
     def cancel_timer(self, session_id: str):
         """Cancel timer for a session."""
         with self._lock:
-            if session_id in self.active_timers:
-                self.active_timers[session_id].cancel()
-                del self.active_timers[session_id]
+            if session_id in self._deadlines:
+                # The heap entry becomes stale and is skipped by the scheduler
+                del self._deadlines[session_id]
                 print_timer(f"Timer cancelled for session {session_id}")
-    
-    def _analyze_conversation(self, session_id: str):
-        """Analyze conversation after inactivity period."""
+
+    def _scheduler_loop(self):
+        """Wait for the earliest deadline and dispatch due sessions in batches."""
+        while True:
+            with self._lock:
+                batch = self._collect_due_batch()
+                while not batch:
+                    self._wakeup.wait(timeout=self._next_wait())
+                    batch = self._collect_due_batch()
+                self._batches_dispatched += 1
+
+            print_timer(f"Dispatching analysis batch of {len(batch)} session(s)")
+            self._executor.submit(self._run_batch, batch)
+
+    def _next_wait(self) -> Optional[float]:
+        """Seconds until the scheduler should look at the heap again (caller holds the lock)."""
+        self._drop_stale_heads()
+        if not self._heap:
+            return None
+        if self._batches_in_flight >= self.max_in_flight:
+            # Saturated: a finishing batch will notify us
+            return None
+        return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def _drop_stale_heads(self):
+        """Pop heap entries superseded by a restart or a cancellation."""
+        while self._heap:
+            deadline, session_id = self._heap[0]
+            if self._deadlines.get(session_id) == deadline:
+                return
+            heapq.heappop(self._heap)
+
+    def _collect_due_batch(self) -> List[Tuple[str, float]]:
+        """Pop due sessions, coalescing those due within the batch window (caller holds the lock)."""
+        batch = []
+        if self._batches_in_flight >= self.max_in_flight:
+            return batch
+        horizon = time.monotonic() + self.batch_window_seconds
+
+        self._drop_stale_heads()
+        if not self._heap or self._heap[0][0] > time.monotonic():
+            return batch
+
+        while self._heap and len(batch) < self.max_batch_size:
+            deadline, session_id = self._heap[0]
+            if self._deadlines.get(session_id) != deadline:
+                heapq.heappop(self._heap)
+                continue
+            if deadline > horizon:
+                break
+            heapq.heappop(self._heap)
+            if session_id in self._in_flight:
+                # Still analyzing the previous inactivity period; retry shortly
+                retry_at = time.monotonic() + self.batch_window_seconds
+                self._deadlines[session_id] = retry_at
+                heapq.heappush(self._heap, (retry_at, session_id))
+                continue
+            del self._deadlines[session_id]
+            self._in_flight.add(session_id)
+            batch.append((session_id, deadline))
+        if batch:
+            self._batches_in_flight += 1
+        return batch
+
+    def _run_batch(self, batch: List[Tuple[str, float]]):
+        """Worker wrapper that records lag and frees the batch's in-flight slots."""
+        now = time.monotonic()
+        lags = [max(0.0, now - deadline) for _, deadline in batch]
+        for lag in lags:
+            metrics.observe("timer_queue_lag_seconds", lag)
+        try:
+            with metrics.timer("stage_seconds", stage="analysis_job"):
+                self._analyze_batch([session_id for session_id, _ in batch])
+        finally:
+            with self._lock:
+                for session_id, _ in batch:
+                    self._in_flight.discard(session_id)
+                self._lag_samples.extend(lags)
+                self._analyses_completed += len(batch)
+                self._batches_in_flight -= 1
+                self._wakeup.notify()
+
+    def _analyze_batch(self, session_ids: List[str]):
+        """Analyze conversations after their inactivity period, in one bulk Comprehend job."""
         try:
-            print_timer(f"Analyzing conversation {session_id} after {self.inactivity_minutes} min inactivity")
-            
-            # Get conversation data
-            conversation_data = memory.get_conversation_for_analysis(session_id)
-            
-            if not conversation_data or not conversation_data.get('messages'):
-                print_warning(f"No conversation data found for session {session_id}")
+            print_timer(f"Analyzing {len(session_ids)} conversation(s) after {self.inactivity_minutes} min inactivity")
+
+            conversations = []
+            for session_id in session_ids:
+                conversation_data = memory.get_conversation_for_analysis(session_id)
+                if not conversation_data or not conversation_data.get('messages'):
+                    print_warning(f"No conversation data found for session {session_id}")
+                    continue
+                conversations.append(conversation_data)
+            if not conversations:
                 return
-            
-            # Analyze with Comprehend
-            analysis_result = comprehend_analyzer.analyze_conversation_batch(conversation_data)
-            
-            if 'error' not in analysis_result:
-                # Mark as analyzed
-                memory.mark_conversation_analyzed(session_id)
-                print_success(f"Conversation {session_id} analyzed successfully")
-                
-                # Log insights
+
+            # Batch APIs accept 25 documents per call; analyze_conversations_bulk splits larger batches
+            results = comprehend_analyzer.analyze_conversations_bulk(conversations)
+            analyzed = []
+            for conversation_data, analysis_result in zip(conversations, results):
+                session_id = conversation_data['session_id']
+                if 'error' in analysis_result:
+                    print_error(f"Error analyzing conversation {session_id}: {analysis_result.get('error')}")
+                    metrics.inc("errors_total", component="analysis")
+                    continue
+                analyzed.append(analysis_result)
                 insights = analysis_result.get('conversation_insights', [])
                 if insights:
                     print_success(f"Key insights for {session_id}: {', '.join(insights)}")
-            else:
-                print_error(f"Error analyzing conversation {session_id}: {analysis_result.get('error')}")
-                
+
+            if analyzed:
+                comprehend_analyzer.store_analyses(analyzed)
+                memory.mark_conversations_analyzed([result['session_id'] for result in analyzed])
+                print_success(f"{len(analyzed)} conversation(s) analyzed successfully")
+
         except Exception as e:
-            print_error(f"Error in timer analysis for {session_id}: {e}")
-        finally:
-            # Clean up timer
-            with self._lock:
-                if session_id in self.active_timers:
-                    del self.active_timers[session_id]
-    
+            print_error(f"Error in timer analysis for {', '.join(session_ids)}: {e}")
+            metrics.inc("errors_total", component="analysis")
+
     def get_active_timers(self) -> Dict[str, float]:
         """Get list of active timers with remaining time."""
-        active = {}
-        
+        now = time.monotonic()
+        with self._lock:
+            return {
+                session_id: round(max(0.0, deadline - now), 1)
+                for session_id, deadline in self._deadlines.items()
+            }
+
+    def _collect_gauges(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """Queue gauges for /api/metrics, read at scrape time."""
         with self._lock:
-            for session_id, timer in self.active_timers.items():
-                if timer.is_alive():
-                    # Just return the configured timeout time
-                    active[session_id] = self.inactivity_minutes * 60
-        
-        return active
-    
+            return [
+                ("timer_queue_depth", {}, len(self._deadlines)),
+                ("analyses_in_flight", {}, len(self._in_flight)),
+                ("analysis_batches_in_flight", {}, self._batches_in_flight),
+            ]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get scheduler metrics: queue depth, in-flight analyses and lag past deadline."""
+        now = time.monotonic()
+        with self._lock:
+            overdue = sum(1 for deadline in self._deadlines.values() if deadline <= now)
+            lags = sorted(self._lag_samples)
+            metrics = {
+                "queue_depth": len(self._deadlines),
+                "overdue": overdue,
+                "in_flight": len(self._in_flight),
+                "batches_in_flight": self._batches_in_flight,
+                "max_in_flight": self.max_in_flight,
+                "max_batch_size": self.max_batch_size,
+                "analyses_completed": self._analyses_completed,
+                "batches_dispatched": self._batches_dispatched,
+            }
+
+        if lags:
+            metrics["lag_seconds"] = {
+                "p50": lags[len(lags) // 2],
+                "p95": lags[min(len(lags) - 1, int(len(lags) * 0.95))],
+                "max": lags[-1],
+                "samples": len(lags),
+            }
+        return metrics
+
     def cleanup_expired_timers(self):
-        """Clean up expired or dead timers."""
+        """Clean up stale heap entries left by restarted or cancelled timers."""
         with self._lock:
-            expired_sessions = []
-            for session_id, timer in self.active_timers.items():
-                if not timer.is_alive():
-                    expired_sessions.append(session_id)
-            
-            for session_id in expired_sessions:
-                del self.active_timers[session_id]
-                print_timer(f"Cleaned up expired timer for {session_id}")
+            live = [(deadline, session_id) for deadline, session_id in self._heap
+                    if self._deadlines.get(session_id) == deadline]
+            removed = len(self._heap) - len(live)
+            heapq.heapify(live)
+            self._heap = live
+        if removed:
+            print_timer(f"Cleaned up {removed} stale timer entries")
 
 # Global timer manager instance
-timer_manager = ConversationTimerManager(inactivity_minutes=1)
+timer_manager = ConversationTimerManager(
+    inactivity_minutes=1,
+    jitter_seconds=CONFIG["analysis_jitter_seconds"],
+    batch_window_seconds=CONFIG["analysis_batch_window_seconds"],
+    max_batch_size=CONFIG["analysis_max_batch_size"],
+    max_in_flight=CONFIG["analysis_max_in_flight"],
+)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Registro de herramientas del agente.
+
+Cada herramienta se registra por nombre con su descripción, su esquema JSON de
+entrada y su handler. El mismo registro genera el `toolConfig` de Bedrock
+Converse para modelos con tool use nativo y la descripción en texto para el
+formato `<tool_calls>` de los modelos que no lo soportan.
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import CONFIG
+from .metrics import metrics
+
+# handler(arguments, session_id) -> texto del resultado
+ToolHandler = Callable[[Dict[str, Any], str], str]
+
+# Prefijos de perfiles de inferencia entre regiones (p. ej. `us.anthropic...`)
+_INFERENCE_PROFILE_PREFIXES = ("us.", "eu.", "apac.", "us-gov.")
+
+
+def base_model_id(model_id: str) -> str:
+    """Id del modelo sin el prefijo del perfil de inferencia."""
+    for prefix in _INFERENCE_PROFILE_PREFIXES:
+        if model_id.startswith(prefix):
+            return model_id[len(prefix):]
+    return model_id
+
+
+def supports_native_tools(model_id: str) -> bool:
+    """Indica si el modelo soporta `toolConfig` en la API Converse."""
+    base_id = base_model_id(model_id)
+    return any(base_id.startswith(prefix) for prefix in CONFIG["bedrock_tool_models"])
+
+
+class Tool:
+    """Herramienta registrada."""
+
+    def __init__(self, name: str, description: str, input_schema: Dict[str, Any], handler: ToolHandler,
+                 terminal: bool = False, merge_model_text: bool = True, timeout_seconds: Optional[float] = None,
+                 side_effects: bool = False):
+        self.name = name
+        self.description = description
+        self.input_schema = input_schema
+        self.handler = handler
+        # Un resultado terminal se devuelve directamente al cliente, sin otra llamada al modelo
+        self.terminal = terminal
+        # Anteponer el texto que el modelo escribió antes de llamar la herramienta
+        self.merge_model_text = merge_model_text
+        self.timeout_seconds = timeout_seconds or CONFIG["tool_timeout_seconds"]
+        # Con efectos (p. ej. crear un caso en el CRM) no se abandona por timeout: el
+        # handler seguiría corriendo y el modelo, creyendo que falló, la repetiría
+        self.side_effects = side_effects
+
+
+class ToolRegistry:
+    """Registro de herramientas disponibles para el agente."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self._tools: Dict[str, Tool] = {}
+        self._tool_config: Optional[Dict[str, Any]] = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or CONFIG["tool_max_workers"], thread_name_prefix="tool")
+
+    def register(self, name: str, description: str, input_schema: Dict[str, Any], handler: ToolHandler,
+                 terminal: bool = False, merge_model_text: bool = True, timeout_seconds: Optional[float] = None,
+                 side_effects: bool = False):
+        """Registra (o reemplaza) una herramienta."""
+        self._tools[name] = Tool(name, description, input_schema, handler, terminal, merge_model_text, timeout_seconds,
+                                 side_effects)
+        self._tool_config = None
+
+    def get(self, name: str) -> Optional[Tool]:
+        return self._tools.get(name)
+
+    def names(self) -> List[str]:
+        return list(self._tools)
+
+    def to_tool_config(self) -> Dict[str, Any]:
+        """`toolConfig` para Bedrock Converse (se construye una sola vez)."""
+        if self._tool_config is None:
+            self._tool_config = {
+                "tools": [
+                    {
+                        "toolSpec": {
+                            "name": tool.name,
+                            "description": tool.description,
+                            "inputSchema": {"json": tool.input_schema},
+                        }
+                    }
+                    for tool in self._tools.values()
+                ]
+            }
+        return self._tool_config
+
+    def prompt_description(self) -> str:
+        """Descripción en texto de las herramientas para el formato `<tool_calls>`."""
+        lines = ["HERRAMIENTAS DISPONIBLES:"]
+        for tool in self._tools.values():
+            arguments = ", ".join(tool.input_schema.get("properties", {}))
+            lines.append(f"- {tool.name}: {tool.description}")
+            lines.append(f"  Argumentos: {arguments}")
+        return "\n".join(lines)
+
+    def execute(self, name: str, arguments: Dict[str, Any], session_id: str) -> str:
+        """Ejecuta una herramienta por nombre."""
+        tool = self._tools.get(name)
+        if tool is None:
+            return f"Tool call '{name}' no reconocida"
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments)
+            except json.JSONDecodeError:
+                arguments = {}
+        return tool.handler(arguments or {}, session_id)
+
+    def execute_many(self, calls: List[Tuple[str, Dict[str, Any]]], session_id: str,
+                     max_seconds: Optional[float] = None) -> List[Tuple[str, str]]:
+        """Ejecuta varias herramientas en paralelo, cada una con su timeout.
+        
+        Devuelve `(texto, status)` por llamada, en el mismo orden, con status
+        `success` o `error`. La latencia total es la de la herramienta más lenta.
+        `max_seconds` acota los timeouts (p. ej. al tiempo que queda del turno).
+        Las herramientas con efectos se esperan hasta que terminen, sin timeout.
+        """
+        started = time.monotonic()
+        futures = [self._executor.submit(self.execute, name, arguments, session_id) for name, arguments in calls]
+        outcomes = []
+        for (name, _), future in zip(calls, futures):
+            tool = self._tools.get(name)
+            if tool is None:
+                outcomes.append((future.result(), "error"))
+                metrics.inc("tool_calls_total", tool="unknown", status="error")
+                continue
+            try:
+                # Cada timeout cuenta desde el envío, no desde que se espera esa herramienta
+                timeout = tool.timeout_seconds if max_seconds is None else min(tool.timeout_seconds, max_seconds)
+                remaining = None if tool.side_effects else max(0.0, started + timeout - time.monotonic())
+                outcomes.append((future.result(timeout=remaining), "success"))
+                metrics.inc("tool_calls_total", tool=name, status="success")
+            except FutureTimeoutError:
+                print(f"⚠️ [Tools] {name} superó el timeout de {timeout:.1f}s")
+                outcomes.append((f"La herramienta '{name}' no respondió a tiempo", "error"))
+                metrics.inc("tool_calls_total", tool=name, status="timeout")
+            except Exception as e:
+                print(f"❌ [Tools] Error ejecutando {name}: {e}")
+                outcomes.append((f"Error ejecutando la herramienta '{name}'", "error"))
+                metrics.inc("tool_calls_total", tool=name, status="error")
+        return outcomes
+
+
+ACCOUNT_OPENING_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "nombre": {"type": "string", "description": "Nombre completo del cliente"},
+        "documento_identidad": {"type": "string", "description": "Cédula o pasaporte"},
+        "fecha_nacimiento": {"type": "string", "description": "Fecha de nacimiento"},
+        "direccion_residencia": {"type": "string", "description": "Dirección de residencia"},
+        "comprobante_ingresos": {"type": "string", "description": "Comprobante de ingresos (si corresponde)"},
+        "registro_mercantil": {"type": "string", "description": "Registro mercantil (cuentas empresariales)"},
+        "telefono": {"type": "string", "description": "Teléfono de contacto"},
+        "correo_electronico": {"type": "string", "description": "Correo electrónico"},
+    },
+    "required": ["nombre", "documento_identidad", "fecha_nacimiento", "direccion_residencia", "telefono", "correo_electronico"],
+}
+
+CASE_STATUS_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "numero_caso": {"type": "string", "description": "Número de caso entregado al cliente"},
+    },
+    "required": ["numero_caso"],
+}
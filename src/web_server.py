@@ -3,8 +3,9 @@
 Servidor web FastAPI para el Asistente Bancario Banesco Panamá.
 """
 import os
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from pydantic import BaseModel
 from .agent import Agent
 import json
@@ -12,6 +13,10 @@ from .config import CONFIG
 from .colors import *
 from .comprehend_analyzer import comprehend_analyzer
 from .timer_manager import timer_manager
+from .analytics_rollups import rollups
+from .stage_timer import StageTimer
+from .metrics import metrics
+from .data_lock import acquire_data_lock, lock_owner
 
 # Crear instancia de FastAPI
 app = FastAPI(title="Banesco Panamá - Asistente Virtual", version="1.0.0")
@@ -19,6 +24,13 @@ app = FastAPI(title="Banesco Panamá - Asistente Virtual", version="1.0.0")
 # Inicializar agente
 agent = Agent()
 
+@app.on_event("startup")
+def lock_data_files():
+    """Impide correr junto a reanalyze.py: ambos reescriben los mismos archivos de datos."""
+    if not acquire_data_lock("web_server"):
+        print_error(f"Los archivos de datos están en uso por otro proceso ({lock_owner()}); deténlo antes de iniciar el servidor")
+        raise RuntimeError("Archivos de datos en uso por otro proceso")
+
 class MessageRequest(BaseModel):
     message: str
     session_id: str
@@ -26,6 +38,7 @@ class MessageRequest(BaseModel):
     customer_email: str = None
     customer_phone: str = None
     account_type: str = None
+    bedrock_model_id: str = None
 
 @app.get("/", response_class=HTMLResponse)
 async def get_chat_interface():
@@ -485,22 +498,41 @@ async def get_chat_interface():
     </html>
     """
 
+def _allowed_model_ids() -> set:
+    """Modelos que un cliente puede pedir explícitamente."""
+    allowed = {CONFIG["bedrock_model_id"]}
+    for models in CONFIG["bedrock_model_pool"].values():
+        allowed.update(models)
+    return allowed
+
 @app.post("/api/chat")
-async def chat_endpoint(request: MessageRequest):
-    """Endpoint para procesar mensajes del chat."""
+def chat_endpoint(request: MessageRequest, response: Response):
+    """Endpoint para procesar mensajes del chat.
+
+    Es síncrono a propósito: FastAPI lo ejecuta en su pool de hilos y las
+    llamadas bloqueantes del agente (Comprehend, Bedrock, CSV) no detienen
+    el event loop ni serializan los requests concurrentes.
+    Los tiempos de cada etapa del turno van en el header `Server-Timing`.
+    Un `bedrock_model_id` explícito debe estar en `BEDROCK_MODEL_POOL` (o ser
+    `BEDROCK_MODEL_ID`); cualquier otro se rechaza con 400.
+    """
+    if request.bedrock_model_id and request.bedrock_model_id not in _allowed_model_ids():
+        raise HTTPException(status_code=400, detail=f"Modelo no permitido: {request.bedrock_model_id}")
     try:
         print_user(f"Usuario: {request.message}")
         # Preparar evento para el agente
         event = {
             'text': request.message,
             'session_id': request.session_id,
-            'bedrock_model_id': 'ai21.jamba-1-5-large-v1:0'
+            # Sin modelo explícito el router de modelos elige uno por turno
+            'bedrock_model_id': request.bedrock_model_id
         }
         
         # Procesar mensaje con el agente (incluye tool calls automáticamente)
         result = agent.handle_message(event)
 
         print(json.dumps(result, ensure_ascii=False, indent=2))
+        response.headers["Server-Timing"] = StageTimer.server_timing(result.get("timings_ms", {}))
         
         return {
             'success': True,
@@ -510,6 +542,16 @@ async def chat_endpoint(request: MessageRequest):
         
     except Exception as e:
         print_error(f"Error en chat endpoint: {e}")
+        metrics.inc("errors_total", component="api")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@app.get("/api/agent/stats")
+async def get_agent_stats():
+    """Get agent statistics."""
+    try:
+        return {"success": True, "data": agent.get_stats()}
+    except Exception as e:
+        print_error(f"Error getting agent stats: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
 @app.get("/api/analysis/sentiment")
@@ -535,6 +577,54 @@ async def get_conversation_analysis(session_id: str):
         print_error(f"Error getting conversation analysis: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
+@app.get("/api/analysis/search")
+async def search_conversation_analyses(
+    entity: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    phrase: Optional[str] = None,
+    sentiment: Optional[str] = None,
+    insight: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=500),
+):
+    """Search analyzed conversations by entity, key phrase, sentiment, insight or date."""
+    try:
+        result = comprehend_analyzer.search_conversation_analyses(
+            entity=entity,
+            entity_type=entity_type,
+            phrase=phrase,
+            sentiment=sentiment,
+            insight=insight,
+            date_from=date_from,
+            date_to=date_to,
+            page=page,
+            page_size=page_size,
+        )
+        return {"success": True, "data": result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Parámetros inválidos: {e}")
+    except Exception as e:
+        print_error(f"Error searching analyses: {e}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@app.get("/api/analysis/rollups")
+async def get_analysis_rollups(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    granularity: str = "hour",
+):
+    """Get precomputed hourly/daily analytics rollups."""
+    try:
+        data = rollups.query(date_from=date_from, date_to=date_to, granularity=granularity)
+        return {"success": True, "data": data}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Parámetros inválidos: {e}")
+    except Exception as e:
+        print_error(f"Error getting rollups: {e}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
 @app.get("/api/analysis/timers")
 async def get_active_timers():
     """Get active conversation timers."""
@@ -545,6 +635,23 @@ async def get_active_timers():
         print_error(f"Error getting timers: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
+@app.get("/api/analysis/scheduler")
+async def get_scheduler_metrics():
+    """Get inactivity analysis scheduler metrics (queue depth, lag)."""
+    try:
+        metrics = timer_manager.get_metrics()
+        return {"success": True, "data": metrics}
+    except Exception as e:
+        print_error(f"Error getting scheduler metrics: {e}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@app.get("/api/metrics")
+def get_prometheus_metrics():
+    """Métricas del pipeline en el formato de texto de Prometheus."""
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Métricas desactivadas (METRICS_ENABLED=false)")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/api/analysis/analyze/{session_id}")
 async def force_analyze_conversation(session_id: str):
     """Force analysis of a specific conversation."""
@@ -10,6 +10,7 @@ Opciones:
     --port: Puerto para el servidor (default: 5000)
     --host: Host para el servidor (default: 0.0.0.0)
     --mock: Usar modo mock sin AWS (para desarrollo)
+    --stub: Usar los stubs locales de Bedrock y Comprehend (camino completo del agente, sin AWS)
 """
 import argparse
 import sys
@@ -25,6 +26,7 @@ def main():
     parser.add_argument('--port', type=int, default=5000, help='Puerto del servidor')
     parser.add_argument('--host', default='0.0.0.0', help='Host del servidor')
     parser.add_argument('--mock', action='store_true', help='Usar modo mock (sin AWS)')
+    parser.add_argument('--stub', action='store_true', help='Usar stubs locales de Bedrock y Comprehend')
     
     args = parser.parse_args()
     
@@ -33,6 +35,9 @@ def main():
     if args.mock:
         os.environ['MOCK_MODE'] = 'true'
         print_warning("Modo mock activado - Sin conexión a AWS")
+    elif args.stub:
+        os.environ['AWS_STUB_MODE'] = 'true'
+        print_warning("Modo stub activado - Bedrock y Comprehend locales")
     else:
         # Verificar credenciales AWS
         if os.getenv('AWS_ACCESS_KEY_ID') and os.getenv('AWS_SECRET_ACCESS_KEY'):
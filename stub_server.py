@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor HTTP local que imita Bedrock Runtime y Comprehend.
+
+Expone los stubs de `src/aws_stubs.py` con los mismos protocolos que usa
+boto3, así el asistente (u otro proceso) puede apuntar sus clientes al
+servidor y ejercitar el camino HTTP completo sin red:
+
+    BEDROCK_ENDPOINT=http://127.0.0.1:8787 COMPREHEND_ENDPOINT=http://127.0.0.1:8787 \\
+    AWS_ACCESS_KEY_ID=stub AWS_SECRET_ACCESS_KEY=stub python start_bot.py
+
+- Bedrock (REST-JSON): `POST /model/{modelId}/converse` y
+  `POST /model/{modelId}/converse-stream` (respuesta en formato
+  `application/vnd.amazon.eventstream`).
+- Comprehend (JSON 1.1): `POST /` con `X-Amz-Target: Comprehend_20171127.<Operación>`.
+
+Las firmas de los requests no se validan.
+
+Uso:
+    python stub_server.py
+    python stub_server.py --port 8787 --median-ms 300 --throttle-rate 0.05
+
+Opciones:
+    --host: Host (default: 127.0.0.1)
+    --port: Puerto (default: 8787)
+    --median-ms: Mediana de latencia de Bedrock (default: STUB_BEDROCK_MEDIAN_MS)
+    --comprehend-median-ms: Mediana de latencia de Comprehend (default: STUB_COMPREHEND_MEDIAN_MS)
+    --error-rate: Proporción de errores internos (default: STUB_ERROR_RATE)
+    --throttle-rate: Proporción de throttling (default: STUB_THROTTLE_RATE)
+    --script: JSON con reglas de respuesta `{"rules": [...]}` (default: STUB_SCRIPT_FILE)
+"""
+import argparse
+import binascii
+import json
+import re
+import struct
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+from src.aws_stubs import stub_client
+from src.colors import print_header, print_info, print_system
+
+_CONVERSE_PATH = re.compile(r"^/model/(?P<model>[^/]+)/(?P<operation>converse|converse-stream)$")
+# Comprehend_20171127.DetectSentiment -> detect_sentiment
+_CAMEL_RE = re.compile(r"(?<!^)(?=[A-Z])")
+_ERROR_STATUS = {"ThrottlingException": 429, "ValidationException": 400}
+
+
+def encode_event(event_type: str, payload: dict) -> bytes:
+    """Mensaje de AWS event stream: preludio, headers, payload JSON y CRC32."""
+    headers = b""
+    for name, value in ((":event-type", event_type), (":content-type", "application/json"), (":message-type", "event")):
+        name_bytes, value_bytes = name.encode(), value.encode()
+        headers += struct.pack(">B", len(name_bytes)) + name_bytes + struct.pack(">BH", 7, len(value_bytes)) + value_bytes
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    total_length = 12 + len(headers) + len(body) + 4
+    prelude = struct.pack(">II", total_length, len(headers))
+    prelude += struct.pack(">I", binascii.crc32(prelude) & 0xFFFFFFFF)
+    message = prelude + headers + body
+    return message + struct.pack(">I", binascii.crc32(message) & 0xFFFFFFFF)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Atiende requests de Bedrock Runtime y Comprehend con los stubs."""
+
+    protocol_version = "HTTP/1.1"
+    bedrock = None
+    comprehend = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, content_type: str = "application/json", headers: dict = None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, error: Exception, json_protocol: bool):
+        code = getattr(error, "response", {}).get("Error", {}).get("Code", "InternalServerException")
+        message = str(error)
+        status = _ERROR_STATUS.get(code, 500)
+        if json_protocol:
+            # Comprehend usa JSON 1.1: el tipo de error va en el cuerpo
+            self._send_json(400 if status == 429 else status, {"__type": code, "message": message}, "application/x-amz-json-1.1")
+        else:
+            self._send_json(status, {"message": message}, headers={"x-amzn-ErrorType": code})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        match = _CONVERSE_PATH.match(self.path.split("?")[0])
+        if match:
+            self._handle_bedrock(unquote(match.group("model")), match.group("operation"), body)
+            return
+
+        target = self.headers.get("X-Amz-Target", "")
+        if target.startswith("Comprehend_"):
+            self._handle_comprehend(target.split(".", 1)[-1], body)
+            return
+
+        self._send_json(404, {"message": f"Ruta no soportada: {self.path}"})
+
+    def _handle_bedrock(self, model_id: str, operation: str, body: dict):
+        try:
+            if operation == "converse":
+                self._send_json(200, self.bedrock.converse(modelId=model_id, **body))
+                return
+            stream = self.bedrock.converse_stream(modelId=model_id, **body)["stream"]
+        except Exception as e:
+            self._send_error(e, json_protocol=False)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for event in stream:
+            (event_type, payload), = event.items()
+            chunk = encode_event(event_type, payload)
+            self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _handle_comprehend(self, operation: str, body: dict):
+        method = getattr(self.comprehend, _CAMEL_RE.sub("_", operation).lower(), None)
+        if method is None:
+            self._send_json(400, {"__type": "UnknownOperationException", "message": operation}, "application/x-amz-json-1.1")
+            return
+        try:
+            self._send_json(200, method(**body), "application/x-amz-json-1.1")
+        except Exception as e:
+            self._send_error(e, json_protocol=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita Bedrock Runtime y Comprehend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--median-ms", type=float)
+    parser.add_argument("--comprehend-median-ms", type=float)
+    parser.add_argument("--error-rate", type=float)
+    parser.add_argument("--throttle-rate", type=float)
+    parser.add_argument("--script")
+    args = parser.parse_args()
+
+    faults = {name: value for name, value in (("error_rate", args.error_rate), ("throttle_rate", args.throttle_rate)) if value is not None}
+    bedrock_overrides = dict(faults)
+    if args.median_ms is not None:
+        bedrock_overrides["median_ms"] = args.median_ms
+    if args.script:
+        bedrock_overrides["script_file"] = args.script
+    comprehend_overrides = dict(faults)
+    if args.comprehend_median_ms is not None:
+        comprehend_overrides["median_ms"] = args.comprehend_median_ms
+
+    StubHandler.bedrock = stub_client("bedrock-runtime", **bedrock_overrides)
+    StubHandler.comprehend = stub_client("comprehend", **comprehend_overrides)
+
+    print_header("Stub de Bedrock y Comprehend")
+    print_system(f"Escuchando en http://{args.host}:{args.port}")
+    print_info("Para detener el servidor: Ctrl+C")
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Pruebas del extractor de datos de apertura de cuenta (src/account_slots.py)."""
+from src.account_slots import AccountSlotStore, extract_slots
+
+
+def test_full_message():
+    slots = extract_slots(
+        "Me llamo Ana Pérez, cédula 8-AV-12-345, nací el 3 de mayo de 1985, "
+        "vivo en Vía España, teléfono 6123-4567, correo ana@example.com"
+    )
+    assert slots == {
+        "nombre": "Ana Pérez",
+        "documento_identidad": "8-AV-12-345",
+        "fecha_nacimiento": "3 de mayo de 1985",
+        "direccion_residencia": "Vía España",
+        "telefono": "6123-4567",
+        "correo_electronico": "ana@example.com",
+    }
+
+
+def test_unlabeled_cedula_and_mobile():
+    assert extract_slots("8-123-456 y 6123-4567") == {"documento_identidad": "8-123-456", "telefono": "6123-4567"}
+
+
+def test_dashed_birth_date_is_not_a_cedula():
+    assert extract_slots("Mi fecha de nacimiento es 12-05-1990") == {"fecha_nacimiento": "12-05-1990"}
+
+
+def test_dashed_date_is_not_a_cedula():
+    assert "documento_identidad" not in extract_slots("tengo 2 cuentas y 3-10-2020 fue mi ultimo pago")
+
+
+def test_cedula_next_to_birth_date():
+    slots = extract_slots("8-123-456, nací el 12-05-1990")
+    assert slots["documento_identidad"] == "8-123-456"
+    assert slots["fecha_nacimiento"] == "12-05-1990"
+
+
+def test_labeled_document_needs_a_digit():
+    assert extract_slots("mi cédula todavía no la tengo") == {}
+
+
+def test_address_keeps_abbreviations():
+    assert extract_slots("Vivo en Ave. Balboa, Torre 2")["direccion_residencia"] == "Ave. Balboa, Torre 2"
+    assert extract_slots("Vivo en P.H. Torre Mar, mi teléfono es 6123-4567")["direccion_residencia"] == "P.H. Torre Mar"
+
+
+def test_address_ends_at_new_sentence():
+    slots = extract_slots("Vivo en Calle 50. Mi correo es a@example.com")
+    assert slots["direccion_residencia"] == "Calle 50"
+    assert slots["correo_electronico"] == "a@example.com"
+    assert extract_slots("vivo en calle 50.")["direccion_residencia"] == "calle 50"
+
+
+def test_unlabeled_value_does_not_overwrite_slot():
+    store = AccountSlotStore()
+    store.update("s1", "quiero abrir una cuenta, mi cédula es 8-123-456")
+    assert store.update("s1", "E-8-123456")["slots"]["documento_identidad"] == "8-123-456"
+    assert store.update("s1", "tengo 2 cuentas y 3-10-2020 fue mi ultimo pago")["slots"]["documento_identidad"] == "8-123-456"
+
+
+def test_labeled_value_overwrites_slot():
+    store = AccountSlotStore()
+    store.update("s1", "quiero abrir una cuenta, mi cédula es 8-123-456")
+    assert store.update("s1", "perdón, mi cédula es E-8-123456")["slots"]["documento_identidad"] == "E-8-123456"
+
+
+def test_missing_fields_prompt():
+    assert AccountSlotStore.missing_fields({"nombre": "Ana"})[0] == "documento_identidad"
+    assert AccountSlotStore.missing_fields_prompt({field: "x" for field in AccountSlotStore.missing_fields({})}) == ""
+
+
+def test_long_name_is_kept():
+    assert extract_slots("Mi nombre es María José de la Cruz Fernández López")["nombre"] == \
+        "María José de la Cruz Fernández López"
+
+
+def test_overlong_name_is_truncated():
+    slots = extract_slots("me llamo Uno Dos Tres Cuatro Cinco Seis Siete Ocho Nueve Diez")
+    assert slots["nombre"] == "Uno Dos Tres Cuatro Cinco Seis Siete Ocho"
+
+
+def test_unlabeled_values_need_an_account_opening():
+    store = AccountSlotStore()
+    assert store.update("s1", "quiero transferir 8-123-4567 balboas") == {"active": False, "slots": {}}
+    assert store.get("s1") == {"active": False, "slots": {}}
+    store.update("s1", "quiero abrir una cuenta")
+    assert store.update("s1", "8-123-456")["slots"] == {"documento_identidad": "8-123-456"}
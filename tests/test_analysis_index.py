@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Pruebas del índice invertido de análisis (src/analysis_index.py)."""
+import pytest
+
+from src.analysis_index import AnalysisIndex, normalize_terms
+
+
+def make_analysis(session_id, timestamp, sentiment="NEUTRAL", entities=(), phrases=(), insights=(),
+                  last_message_timestamp=None):
+    return {
+        "session_id": session_id,
+        "analysis_timestamp": timestamp,
+        "last_message_timestamp": last_message_timestamp,
+        "sentiment": {"overall": sentiment},
+        "entities": [{"text": text, "type": entity_type} for text, entity_type in entities],
+        "key_phrases": [{"text": phrase} for phrase in phrases],
+        "conversation_insights": list(insights),
+    }
+
+
+@pytest.fixture
+def index():
+    index = AnalysisIndex()
+    index.build([
+        make_analysis("s2", "2024-03-02T10:00:00", "NEGATIVE", [("José Pérez", "PERSON")],
+                      ["problema con la tarjeta"], ["Urgent keywords detected - prioritize this conversation"]),
+        make_analysis("s1", "2024-03-01T09:00:00", "POSITIVE", [("Banco General", "ORGANIZATION")],
+                      ["cuenta de ahorro"]),
+        make_analysis("s3", "2024-03-05T12:00:00", "NEGATIVE", [("Jose", "PERSON")], ["tarjeta de crédito"]),
+    ])
+    return index
+
+
+def test_normalize_terms():
+    assert normalize_terms("La Tarjeta de CRÉDITO, y mi cuenta") == ["tarjeta", "credito", "cuenta"]
+
+
+def test_no_filters_returns_most_recent_first(index):
+    assert index.search() == {"total": 3, "page": 1, "page_size": 20, "session_ids": ["s3", "s2", "s1"]}
+
+
+def test_filters_are_combined(index):
+    assert index.search(phrase="tarjeta")["session_ids"] == ["s3", "s2"]
+    assert index.search(entity="jose", entity_type="person")["session_ids"] == ["s3", "s2"]
+    assert index.search(entity="josé pérez")["session_ids"] == ["s2"]
+    assert index.search(phrase="tarjeta", sentiment="negative", insight="urgent")["session_ids"] == ["s2"]
+    assert index.search(phrase="hipoteca")["total"] == 0
+
+
+def test_date_range(index):
+    assert index.search(date_from="2024-03-02")["session_ids"] == ["s3", "s2"]
+    assert index.search(date_to="2024-03-01")["session_ids"] == ["s1"]
+    assert index.search(phrase="tarjeta", date_to="2024-03-04")["session_ids"] == ["s2"]
+    with pytest.raises(ValueError):
+        index.search(date_from="03/02/2024")
+
+
+def test_pagination(index):
+    result = index.search(page=2, page_size=2)
+    assert result["session_ids"] == ["s1"]
+    assert result["total"] == 3
+    assert index.search(sentiment="NEGATIVE", page=2, page_size=1)["session_ids"] == ["s2"]
+
+
+def test_reanalysis_replaces_terms_and_order(index):
+    index.add(make_analysis("s1", "2024-03-06T08:00:00", "NEGATIVE", phrases=["tarjeta bloqueada"]))
+    assert len(index) == 3
+    assert index.search(phrase="tarjeta")["session_ids"] == ["s1", "s3", "s2"]
+    assert index.search(phrase="ahorro")["total"] == 0
+    assert index.search(sentiment="POSITIVE")["total"] == 0
+
+
+def test_remove(index):
+    index.remove("s2")
+    assert index.search(phrase="tarjeta")["session_ids"] == ["s3"]
+    assert index.search(insight="urgent")["total"] == 0
+
+
+def test_dates_follow_the_conversation_not_the_analysis():
+    index = AnalysisIndex()
+    # Re-análisis masivo del 10 de marzo de conversaciones de enero y febrero
+    index.build([
+        make_analysis("feb", "2024-03-10T08:00:01", "NEGATIVE", last_message_timestamp="2024-02-20T15:00:00"),
+        make_analysis("jan", "2024-03-10T08:00:00", "NEGATIVE", last_message_timestamp="2024-01-05T09:00:00"),
+        make_analysis("mar", "2024-03-10T09:00:00", "NEGATIVE"),
+    ])
+    assert index.search(sentiment="NEGATIVE", date_from="2024-03-04")["session_ids"] == ["mar"]
+    assert index.search(date_from="2024-02-01", date_to="2024-02-29")["session_ids"] == ["feb"]
+    assert index.search(sentiment="NEGATIVE", date_to="2024-02-29")["session_ids"] == ["feb", "jan"]
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de los rollups por hora y día (src/analytics_rollups.py)."""
+import json
+from datetime import datetime
+
+import pytest
+
+from src.analytics_rollups import AnalyticsRollups
+
+
+@pytest.fixture
+def rollups(tmp_path):
+    return AnalyticsRollups(str(tmp_path / "rollups.json"), save_interval_seconds=3600)
+
+
+def test_events_fall_in_their_buckets(rollups):
+    rollups.record_message(datetime(2024, 3, 1, 9, 15))
+    rollups.record_message(datetime(2024, 3, 1, 9, 59, 59))
+    rollups.record_message(datetime(2024, 3, 1, 10, 0))
+    # Fuera de orden: el bucket se inserta en su lugar
+    rollups.record_message(datetime(2024, 3, 1, 8, 30))
+
+    hourly = rollups.query("2024-03-01T00:00:00", "2024-03-01T23:59:59", "hour")
+    assert hourly["buckets"] == ["2024-03-01T08:00:00", "2024-03-01T09:00:00", "2024-03-01T10:00:00"]
+    assert hourly["messages"] == [1, 2, 1]
+
+    daily = rollups.query("2024-02-01T00:00:00", "2024-03-31T00:00:00", "day")
+    assert daily["buckets"] == ["2024-03-01T00:00:00"]
+    assert daily["messages"] == [4]
+
+
+def test_query_range_is_inclusive_by_bucket(rollups):
+    for day in (1, 2, 3):
+        rollups.record_crm_case(datetime(2024, 3, day, 12))
+    result = rollups.query("2024-03-02T23:00:00", "2024-03-03T00:00:00", "day")
+    assert result["crm_cases"] == [1, 1]
+    assert rollups.query("2024-04-01T00:00:00", "2024-04-02T00:00:00", "day")["buckets"] == []
+
+
+def test_sentiment_and_analysis_columns(rollups):
+    moment = datetime(2024, 3, 1, 9)
+    rollups.record_sentiment("NEGATIVE", 0.9, moment)
+    rollups.record_sentiment("POSITIVE", 0.6, moment)
+    rollups.record_conversation_analysis({
+        "entities": [{"text": "Ana"}, {"text": "Ana"}, {"text": "Banesco"}],
+        "conversation_insights": ["Urgent"],
+    }, moment)
+
+    result = rollups.query("2024-03-01T09:00:00", "2024-03-01T09:00:00", "hour")
+    assert result["sentiment_distribution"] == {"POSITIVE": [1], "NEGATIVE": [1], "NEUTRAL": [0], "MIXED": [0]}
+    assert result["average_confidence"] == [0.75]
+    assert result["conversations_analyzed"] == [1]
+    assert result["insight_counts"] == [{"Urgent": 1}]
+    assert result["top_entities"] == [[("Ana", 2), ("Banesco", 1)]]
+
+
+def test_invalid_granularity(rollups):
+    with pytest.raises(ValueError):
+        rollups.query(granularity="week")
+
+
+def test_flush_and_reload(tmp_path, rollups):
+    rollups.record_message(datetime(2024, 3, 1, 9))
+    rollups.flush()
+    assert not (tmp_path / "rollups.json.tmp").exists()
+    reloaded = AnalyticsRollups(rollups.rollups_file)
+    assert reloaded.query("2024-03-01T00:00:00", "2024-03-02T00:00:00", "day")["messages"] == [1]
+
+
+def test_corrupt_file_is_kept_aside(tmp_path):
+    rollups_file = tmp_path / "rollups.json"
+    rollups_file.write_text('{"hour": {"bucket_ids": [1', encoding="utf-8")
+    rollups = AnalyticsRollups(str(rollups_file))
+    rollups.record_message(datetime(2024, 3, 1, 9))
+    rollups.flush()
+    assert (tmp_path / "rollups.json.corrupt").read_text(encoding="utf-8") == '{"hour": {"bucket_ids": [1'
+    assert json.loads(rollups_file.read_text(encoding="utf-8"))["day"]["columns"]["messages"] == [1]
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de los perfiles de inferencia (src/inference_profiles.py)."""
+import pytest
+
+from src.inference_profiles import INFERENCE_PROFILES, TOOL_CALLS_STOP, inference_config, select_profile
+from src.intent_router import FALLBACK_INTENT
+
+
+@pytest.mark.parametrize("intent, confidence, tool_likely, after_tool_results, expected", [
+    ("saludo", 0.9, False, False, "short"),
+    ("agradecimiento", 0.5, False, False, "short"),
+    ("saludo", 0.4, False, False, "default"),
+    ("faq:horarios", 0.8, False, False, "faq"),
+    ("faq:horarios", 0.2, False, False, "default"),
+    (FALLBACK_INTENT, 1.0, False, False, "default"),
+    ("productos", 0.9, False, False, "default"),
+    ("saludo", 0.9, True, False, "tool"),
+    ("faq:horarios", 0.9, True, True, "confirmation"),
+])
+def test_select_profile(intent, confidence, tool_likely, after_tool_results, expected):
+    assert select_profile(intent, confidence, tool_likely, after_tool_results) == expected
+
+
+def test_inference_config_stop_sequence():
+    assert inference_config("tool", native_tools=True) == INFERENCE_PROFILES["tool"]
+    config = inference_config("tool", native_tools=False)
+    assert config["stopSequences"] == [TOOL_CALLS_STOP]
+    assert "stopSequences" not in INFERENCE_PROFILES["tool"]
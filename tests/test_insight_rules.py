@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Pruebas del motor de reglas de insights (src/insight_rules.py)."""
+import itertools
+import json
+
+import pytest
+
+from src.insight_rules import DEFAULT_RULES, InsightRuleEngine
+
+URGENT_KEYWORDS = ['urgente', 'problema', 'error', 'queja', 'reclamo', 'emergencia']
+
+
+def legacy_insights(analysis):
+    """Insights del analizador antes de que las reglas fueran configurables."""
+    insights = []
+    sentiment = analysis["sentiment"]["overall"]
+    confidence = analysis["sentiment"]["confidence"]
+    if sentiment == 'NEGATIVE' and confidence > 0.8:
+        insights.append("High negative sentiment detected - consider immediate follow-up")
+    elif sentiment == 'POSITIVE' and confidence > 0.8:
+        insights.append("Very positive interaction - good customer experience")
+    person_entities = [e for e in analysis["entities"] if e['type'] == 'PERSON']
+    if person_entities:
+        insights.append(f"Customer mentioned {len(person_entities)} person(s) - potential family/business context")
+    if any(any(keyword in kp['text'].lower() for keyword in URGENT_KEYWORDS) for kp in analysis["key_phrases"]):
+        insights.append("Urgent keywords detected - prioritize this conversation")
+    return insights
+
+
+def make_analysis(sentiment="NEUTRAL", confidence=0.5, entities=(), phrases=(), trend=None):
+    return {
+        "session_id": "s1",
+        "sentiment": {"overall": sentiment, "confidence": confidence},
+        "entities": [{"text": f"e{i}", "type": entity_type} for i, entity_type in enumerate(entities)],
+        "key_phrases": [{"text": phrase} for phrase in phrases],
+        "user_sentiment_trend": trend or {"trend": "stable", "sentiment_changes": 0},
+    }
+
+
+def test_rules_file_matches_legacy_insights():
+    engine = InsightRuleEngine.from_file("data/insight_rules.json")
+    cases = itertools.product(
+        [("NEGATIVE", 0.9), ("NEGATIVE", 0.8), ("POSITIVE", 0.95), ("NEUTRAL", 0.99), ("MIXED", 0.9)],
+        [(), ("PERSON",), ("PERSON", "PERSON", "LOCATION"), ("ORGANIZATION",)],
+        [(), ("cuenta de ahorro",), ("Un PROBLEMA con mi tarjeta",), ("errores", "quejarme"), ("reclamo urgente",)],
+    )
+    for (sentiment, confidence), entities, phrases in cases:
+        analysis = make_analysis(sentiment, confidence, entities, phrases)
+        assert engine.evaluate(analysis) == legacy_insights(analysis)
+
+
+def test_rules_file_matches_defaults():
+    with open("data/insight_rules.json", encoding="utf-8") as f:
+        assert json.load(f)["rules"] == DEFAULT_RULES
+
+
+def test_overlapping_keywords_are_all_found():
+    engine = InsightRuleEngine([
+        {"id": "a", "type": "keywords", "keywords": ["abc"], "message": "a"},
+        {"id": "b", "type": "keywords", "keywords": ["bcd"], "message": "b"},
+        {"id": "c", "type": "keywords", "keywords": ["ab"], "message": "c"},
+        {"id": "d", "type": "keywords", "keywords": ["d"], "message": "d"},
+    ])
+    assert engine.evaluate(make_analysis(phrases=["xabcdx"])) == ["a", "b", "c", "d"]
+    assert engine.evaluate(make_analysis(phrases=["bc"])) == []
+
+
+def test_sentiment_trend_rule():
+    engine = InsightRuleEngine([{
+        "id": "volatile", "type": "sentiment_trend", "trends": ["highly_variable"], "min_changes": 2,
+        "message": "changed {count} times",
+    }])
+    assert engine.evaluate(make_analysis(trend={"trend": "highly_variable", "sentiment_changes": 3})) == ["changed 3 times"]
+    assert engine.evaluate(make_analysis(trend={"trend": "highly_variable", "sentiment_changes": 1})) == []
+
+
+def test_missing_file_uses_defaults(tmp_path):
+    engine = InsightRuleEngine.from_file(str(tmp_path / "missing.json"))
+    assert engine.rules == DEFAULT_RULES
+
+
+@pytest.mark.parametrize("content", [
+    "{not json",
+    '{"rules": {}}',
+    '{"rules": [{"id": "x", "type": "sentimiento"}]}',
+    '{"rules": [{"id": "x", "type": "sentiment"}]}',
+    '{"rules": [{"id": "x", "type": "keywords", "keywords": "urgente"}]}',
+    '{"rules": [{"id": "x", "type": "entity_count", "entity_type": "PERSON", "min_count": "uno"}]}',
+])
+def test_invalid_rules_raise(tmp_path, content):
+    rules_file = tmp_path / "rules.json"
+    rules_file.write_text(content, encoding="utf-8")
+    with pytest.raises(ValueError):
+        InsightRuleEngine.from_file(str(rules_file))
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Pruebas del router local de intents (src/intent_router.py)."""
+import pytest
+
+from src.intent_router import IntentRouter
+
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter.from_sources("data/intents.json", "data/faq.csv")
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("hola", "saludo"),
+    ("hola, ¿cómo estás?", "saludo"),
+    ("Buenos días!", "saludo"),
+    ("ok gracias", "agradecimiento"),
+    ("gracias por la ayuda", "agradecimiento"),
+])
+def test_social_messages_use_the_template(router, text, intent):
+    routed = router.route(text)
+    assert routed is not None and routed["intent"] == intent
+
+
+@pytest.mark.parametrize("text", [
+    "gracias, y cuál es la tasa del préstamo?",
+    "gracias, cuál es la tasa",
+    "gracias pero no me sirvió",
+    "muchas gracias, excelente servicio",
+    "hola, necesito abrir una cuenta",
+])
+def test_compound_messages_go_to_the_model(router, text):
+    assert router.route(text) is None
+
+
+def test_contrast_sends_faq_to_the_model(router):
+    intent, _ = router.classify("horario de atención pero los sábados")
+    assert intent.startswith("faq:")
+    assert router.route("horario de atención pero los sábados") is None
+    assert router.route("horario de atención")["intent"] == intent
+
+
+def test_not_covered_is_counted():
+    router = IntentRouter.from_sources("data/intents.json", "data/faq.csv")
+    router.route("gracias pero no me sirvió")
+    router.route("gracias")
+    stats = router.get_stats()
+    assert stats["not_covered"] == 1
+    assert stats["fast_path"] == 1
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Pruebas del registro de métricas y su formato de Prometheus (src/metrics.py)."""
+import threading
+
+from src.metrics import Metrics
+
+
+def test_counters_and_labels():
+    metrics = Metrics(namespace="test")
+    metrics.inc("turns_total", source="bedrock")
+    metrics.inc("turns_total", 2, source="bedrock")
+    metrics.inc("errors_total", component='crm "sync"')
+    output = metrics.render()
+    assert "# TYPE test_turns_total counter" in output
+    assert 'test_turns_total{source="bedrock"} 3' in output
+    assert 'test_errors_total{component="crm \\"sync\\""} 1' in output
+    assert output.endswith("\n")
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = Metrics(namespace="test", buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 2.0):
+        metrics.observe("stage_seconds", seconds, stage="tools")
+    lines = metrics.render().splitlines()
+    assert "# TYPE test_stage_seconds histogram" in lines
+    assert 'test_stage_seconds_bucket{stage="tools",le="0.1"} 2' in lines
+    assert 'test_stage_seconds_bucket{stage="tools",le="1"} 3' in lines
+    assert 'test_stage_seconds_bucket{stage="tools",le="+Inf"} 4' in lines
+    assert 'test_stage_seconds_sum{stage="tools"} 2.65' in lines
+    assert 'test_stage_seconds_count{stage="tools"} 4' in lines
+
+
+def test_shards_of_finished_threads_are_kept():
+    metrics = Metrics(namespace="test")
+
+    def work():
+        for _ in range(100):
+            metrics.inc("cache_lookups_total", result="hit")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 'test_cache_lookups_total{result="hit"} 400' in metrics.render()
+    metrics.inc("cache_lookups_total", result="hit")
+    assert 'test_cache_lookups_total{result="hit"} 401' in metrics.render()
+
+
+def test_collectors_and_untyped_metrics():
+    metrics = Metrics(namespace="test")
+    metrics.add_collector(lambda: [("timer_queue_depth", {}, 5)])
+    metrics.add_collector(lambda: 1 / 0)
+    metrics.inc("custom_total")
+    output = metrics.render()
+    assert "# TYPE test_timer_queue_depth gauge\ntest_timer_queue_depth 5" in output
+    assert "# TYPE test_custom_total untyped" in output
+
+
+def test_disabled_records_nothing():
+    metrics = Metrics(enabled=False, namespace="test")
+    metrics.inc("turns_total")
+    with metrics.timer("stage_seconds", stage="prompt"):
+        pass
+    assert metrics.render() == "\n"
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Pruebas del circuit breaker y del ResilientCaller (src/resilience.py)."""
+import threading
+import time
+
+import pytest
+
+from src.resilience import (
+    CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded, ResilientCaller, RetriesExhausted,
+)
+
+
+class FakeClientError(Exception):
+    """Imita `botocore.exceptions.ClientError` con su `response`."""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.is_open()
+    assert not breaker.allow()
+    assert breaker.snapshot() == {"state": "open", "consecutive_failures": 3, "opens": 1}
+
+
+def test_breaker_success_resets_failures():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_breaker_half_open_allows_one_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_breaker_failed_probe_reopens():
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=0.01)
+    for _ in range(5):
+        breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.opens == 2
+
+
+def test_breaker_release_frees_the_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == "half_open" and breaker.allow()
+
+
+def test_caller_retries_throttling():
+    caller = ResilientCaller(max_attempts=3, base_delay=0.001, max_delay=0.001)
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise FakeClientError("ThrottlingException")
+        return "ok"
+
+    assert caller.call("m", fn, Deadline(5)) == "ok"
+    assert caller.stats["retries"] == 2
+    assert caller.breaker("m").state == "closed"
+
+
+def test_caller_gives_up_after_max_attempts():
+    caller = ResilientCaller(max_attempts=2, base_delay=0.001, max_delay=0.001)
+
+    def fn():
+        raise FakeClientError("ThrottlingException")
+
+    with pytest.raises(RetriesExhausted):
+        caller.call("m", fn, Deadline(5))
+
+
+def test_client_errors_do_not_open_the_breaker():
+    caller = ResilientCaller(failure_threshold=1)
+
+    def fn():
+        raise FakeClientError("ValidationException")
+
+    for _ in range(3):
+        with pytest.raises(FakeClientError):
+            caller.call("m", fn, Deadline(5))
+    assert caller.breaker("m").state == "closed"
+
+
+def test_open_breaker_short_circuits():
+    caller = ResilientCaller(failure_threshold=1, reset_seconds=60)
+
+    def fn():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        caller.call("m", fn, Deadline(5))
+    with pytest.raises(CircuitOpenError):
+        caller.call("m", lambda: "ok", Deadline(5))
+    assert caller.stats["short_circuited"] == 1
+
+
+def test_slow_model_counts_as_failure():
+    caller = ResilientCaller(failure_threshold=1, reset_seconds=60)
+    with pytest.raises(DeadlineExceeded):
+        caller.call("m", lambda: time.sleep(0.3), Deadline(0.05))
+    assert caller.breaker("m").state == "open"
+    assert caller.stats["saturated"] == 0
+
+
+def test_local_queueing_does_not_open_the_breaker():
+    caller = ResilientCaller(failure_threshold=5, max_workers=2)
+    executed = []
+    outcomes = []
+
+    def fn():
+        executed.append(1)
+        time.sleep(0.5)
+        return "ok"
+
+    def turn():
+        try:
+            outcomes.append(caller.call("m", fn, Deadline(0.7)))
+        except DeadlineExceeded:
+            outcomes.append("deadline")
+
+    threads = [threading.Thread(target=turn) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    caller._executor.shutdown(wait=True)
+
+    assert outcomes.count("ok") == 2
+    # Solo los 2 que empezaron y no terminaron a tiempo cuentan para el breaker
+    assert caller.breaker("m").snapshot()["consecutive_failures"] <= 2
+    assert caller.breaker("m").state == "closed"
+    assert caller.stats["saturated"] == 4
+    assert len(executed) == 4
@@ -6,13 +6,14 @@ View Comprehend analysis results.
 import json
 import os
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # Add src to path
 sys.path.append('src')
 
 from src.comprehend_analyzer import comprehend_analyzer
 from src.memory import memory
+from src.analytics_rollups import rollups
 from src.colors import print_header, print_success, print_info, print_warning
 
 def view_sentiment_summary():
@@ -119,13 +120,37 @@ def view_memory_status():
     except Exception as e:
         print_warning(f"Error loading memory status: {e}")
 
+def view_daily_rollups():
+    """View precomputed daily rollups."""
+    print_header("Daily Rollups (last 7 days)")
+    
+    try:
+        data = rollups.query(granularity="day", date_from=(datetime.now() - timedelta(days=7)).isoformat())
+        
+        if not data['buckets']:
+            print_info("No rollups recorded yet")
+            return
+        
+        for i, bucket in enumerate(data['buckets']):
+            distribution = {s: counts[i] for s, counts in data['sentiment_distribution'].items() if counts[i]}
+            confidence = data['average_confidence'][i]
+            print(f"\n📅 {bucket[:10]}")
+            print(f"  Messages: {data['messages'][i]}, analyzed conversations: {data['conversations_analyzed'][i]}, CRM cases: {data['crm_cases'][i]}")
+            print(f"  Sentiment: {distribution or '-'}" + (f" (avg confidence: {confidence:.2f})" if confidence is not None else ""))
+            if data['top_entities'][i]:
+                print(f"  Top entities: {', '.join(f'{text} ({count})' for text, count in data['top_entities'][i][:5])}")
+        
+    except Exception as e:
+        print_warning(f"Error loading rollups: {e}")
+
 def view_analysis_files():
     """View analysis files."""
     print_header("Analysis Files")
     
     files_to_check = [
         "conversation_memory.json",
-        "comprehend_analysis.json"
+        "comprehend_analysis.json",
+        "analytics_rollups.json"
     ]
     
     for filename in files_to_check:
@@ -146,6 +171,8 @@ def main():
         print()
         view_sentiment_summary()
         print()
+        view_daily_rollups()
+        print()
         view_conversation_analyses()
         
     except Exception as e: